@@ -64,18 +64,18 @@ INSERT INTO `recipe` VALUES
 
 -- Insert inventory
 INSERT INTO `inventory` VALUES 
-(1, 'ITM001', 50),
-(2, 'ITM002', 40),
-(3, 'ITM003', 30),
-(4, 'ITM004', 45),
-(5, 'ITM005', 35),
-(6, 'ITM006', 25),
-(7, 'ITM007', 40),
-(8, 'ITM008', 30),
-(9, 'ITM009', 20),
-(10, 'ITM010', 35),
-(11, 'ITM011', 25),
-(12, 'ITM012', 15);
+(1, 'ITM001', 50, 15, 2),
+(2, 'ITM002', 40, 12, 2),
+(3, 'ITM003', 30, 10, 2),
+(4, 'ITM004', 45, 15, 2),
+(5, 'ITM005', 35, 12, 2),
+(6, 'ITM006', 25, 10, 2),
+(7, 'ITM007', 40, 15, 2),
+(8, 'ITM008', 30, 12, 2),
+(9, 'ITM009', 20, 10, 2),
+(10, 'ITM010', 35, 15, 3),
+(11, 'ITM011', 25, 12, 3),
+(12, 'ITM012', 15, 10, 3);
 
 -- Insert staff
 INSERT INTO `staff` VALUES 
@@ -129,4 +129,8 @@ INSERT INTO `orders` VALUES
 (7, 'ORD007', '2025-05-20 14:15:00', 'ITM008', 4.99, 1, 2, 0, 2),
 (8, 'ORD008', '2025-05-20 16:50:00', 'ITM011', 5.99, 3, 3, 1, 3),
 (9, 'ORD009', '2025-05-21 10:20:00', 'ITM003', 5.99, 1, 4, 0, 4),
-(10, 'ORD010', '2025-05-21 11:55:00', 'ITM006', 5.99, 2, 5, 1, 5);
\ No newline at end of file
+(10, 'ORD010', '2025-05-21 11:55:00', 'ITM006', 5.99, 2, 5, 1, 5);
+
+-- Raise alerts for items already below their reorder point
+INSERT INTO `low_stock_alert` 
+SELECT inv_id, quantity, reorder_point, NOW() FROM `inventory` WHERE quantity < reorder_point;
\ No newline at end of file
@@ -2,6 +2,20 @@
 SET FOREIGN_KEY_CHECKS = 0;
 
 -- Drop all tables
+DROP TABLE IF EXISTS `delivery_run_orders`;
+DROP TABLE IF EXISTS `delivery_runs`;
+DROP TABLE IF EXISTS `applied_writes`;
+DROP TABLE IF EXISTS `tier_state`;
+DROP TABLE IF EXISTS `orders_archive`;
+DROP TABLE IF EXISTS `staff_availability`;
+DROP TABLE IF EXISTS `demand_model`;
+DROP TABLE IF EXISTS `item_daily_sales`;
+DROP TABLE IF EXISTS `analytics_state`;
+DROP TABLE IF EXISTS `customer_activity`;
+DROP TABLE IF EXISTS `customer_metrics`;
+DROP TABLE IF EXISTS `low_stock_alert`;
+DROP TABLE IF EXISTS `stock_snapshot`;
+DROP TABLE IF EXISTS `stock_movement`;
 DROP TABLE IF EXISTS `rotation`;
 DROP TABLE IF EXISTS `shift`;
 DROP TABLE IF EXISTS `staff`;
@@ -29,6 +43,37 @@ CREATE TABLE `orders` (
     PRIMARY KEY (`row_id`)
 );
 
+-- Orders from closed months, moved out of `orders` by the tiering maintenance.
+-- Same columns in the same order, without foreign keys, compressed on disk.
+CREATE TABLE `orders_archive` (
+    `row_id` INT NOT NULL,
+    `order_id` VARCHAR(10) NOT NULL,
+    `created_at` DATETIME NOT NULL,
+    `item_id` VARCHAR(10) NOT NULL,
+    `item_price` DECIMAL(5,2) NOT NULL,
+    `quantity` INT NOT NULL,
+    `cust_id` INT NOT NULL,
+    `delivery` BOOLEAN NOT NULL,
+    `add_id` INT NOT NULL,
+    PRIMARY KEY (`row_id`)
+) ROW_FORMAT=COMPRESSED;
+
+CREATE TABLE `applied_writes` (
+    `idempotency_key` VARCHAR(64) NOT NULL,
+    `kind` VARCHAR(20) NOT NULL,
+    `applied_at` DATETIME NOT NULL,
+    `result` VARCHAR(200) NULL,
+    PRIMARY KEY (`idempotency_key`)
+);
+
+CREATE TABLE `tier_state` (
+    `name` VARCHAR(50) NOT NULL,
+    `boundary` DATETIME NOT NULL,
+    `last_row_id` INT NOT NULL,
+    `updated_at` DATETIME NOT NULL,
+    PRIMARY KEY (`name`)
+);
+
 CREATE TABLE `customers` (
     `cust_id` INT NOT NULL,
     `cust_firstname` VARCHAR(50) NOT NULL,
@@ -76,6 +121,8 @@ CREATE TABLE `inventory` (
     `inv_id` INT NOT NULL,
     `item_id` VARCHAR(10) NOT NULL,
     `quantity` INT NOT NULL,
+    `reorder_point` INT NOT NULL DEFAULT 10,
+    `lead_time_days` INT NOT NULL DEFAULT 2,
     PRIMARY KEY (`inv_id`)
 );
 
@@ -105,15 +152,131 @@ CREATE TABLE `rotation` (
     PRIMARY KEY (`row_id`)
 );
 
-ALTER TABLE `orders` ADD INDEX `idx_cust_id` (`cust_id`);
-ALTER TABLE `orders` ADD INDEX `idx_item_id` (`item_id`);
+CREATE TABLE `staff_availability` (
+    `row_id` INT NOT NULL AUTO_INCREMENT,
+    `staff_id` VARCHAR(20) NOT NULL,
+    `day_of_week` VARCHAR(10) NOT NULL,
+    PRIMARY KEY (`row_id`)
+);
+
+CREATE TABLE `stock_movement` (
+    `movement_id` INT NOT NULL AUTO_INCREMENT,
+    `inv_id` INT NOT NULL,
+    `movement_type` VARCHAR(10) NOT NULL,
+    `delta` INT NOT NULL,
+    `created_at` DATETIME NOT NULL,
+    `note` VARCHAR(200) NULL,
+    PRIMARY KEY (`movement_id`)
+);
+
+CREATE TABLE `stock_snapshot` (
+    `inv_id` INT NOT NULL,
+    `last_movement_id` INT NOT NULL,
+    `snapshot_at` DATETIME NOT NULL,
+    `received` INT NOT NULL,
+    `sold` INT NOT NULL,
+    `wasted` INT NOT NULL,
+    `counted` INT NOT NULL,
+    `net_delta` INT NOT NULL,
+    PRIMARY KEY (`inv_id`, `last_movement_id`)
+);
+
+CREATE TABLE `low_stock_alert` (
+    `inv_id` INT NOT NULL,
+    `quantity` INT NOT NULL,
+    `reorder_point` INT NOT NULL,
+    `raised_at` DATETIME NOT NULL,
+    PRIMARY KEY (`inv_id`)
+);
+
+CREATE TABLE `customer_metrics` (
+    `cust_id` INT NOT NULL,
+    `first_order_at` DATETIME NOT NULL,
+    `last_order_at` DATETIME NOT NULL,
+    `order_count` INT NOT NULL,
+    `total_spent` DECIMAL(12,2) NOT NULL,
+    `updated_at` DATETIME NOT NULL,
+    PRIMARY KEY (`cust_id`)
+);
+
+CREATE TABLE `customer_activity` (
+    `cust_id` INT NOT NULL,
+    `activity_month` DATE NOT NULL,
+    PRIMARY KEY (`cust_id`, `activity_month`)
+);
+
+CREATE TABLE `analytics_state` (
+    `name` VARCHAR(50) NOT NULL,
+    `last_row_id` INT NOT NULL,
+    `updated_at` DATETIME NOT NULL,
+    PRIMARY KEY (`name`)
+);
+
+CREATE TABLE `item_daily_sales` (
+    `item_id` VARCHAR(10) NOT NULL,
+    `sale_date` DATE NOT NULL,
+    `quantity` INT NOT NULL,
+    PRIMARY KEY (`item_id`, `sale_date`)
+);
+
+CREATE TABLE `demand_model` (
+    `item_id` VARCHAR(10) NOT NULL,
+    `level` DOUBLE NOT NULL,
+    `season_0` DOUBLE NOT NULL,
+    `season_1` DOUBLE NOT NULL,
+    `season_2` DOUBLE NOT NULL,
+    `season_3` DOUBLE NOT NULL,
+    `season_4` DOUBLE NOT NULL,
+    `season_5` DOUBLE NOT NULL,
+    `season_6` DOUBLE NOT NULL,
+    `fitted_through` DATE NOT NULL,
+    `updated_at` DATETIME NOT NULL,
+    PRIMARY KEY (`item_id`)
+);
+
+-- Delivery orders grouped into runs by zipcode, city and time window.
+CREATE TABLE `delivery_runs` (
+    `run_id` INT NOT NULL,
+    `zipcode` VARCHAR(20) NOT NULL,
+    `city` VARCHAR(50) NOT NULL,
+    `window_start` DATETIME NOT NULL,
+    `window_end` DATETIME NOT NULL,
+    `status` VARCHAR(20) NOT NULL,
+    `order_count` INT NOT NULL,
+    `item_count` INT NOT NULL,
+    `created_at` DATETIME NOT NULL,
+    `dispatched_at` DATETIME NULL,
+    PRIMARY KEY (`run_id`)
+);
+
+CREATE TABLE `delivery_run_orders` (
+    `order_id` VARCHAR(10) NOT NULL,
+    `run_id` INT NOT NULL,
+    `assigned_at` DATETIME NOT NULL,
+    PRIMARY KEY (`order_id`)
+);
+
+ALTER TABLE `orders` ADD INDEX `idx_cust_created` (`cust_id`, `created_at`);
+ALTER TABLE `orders` ADD INDEX `idx_item_created` (`item_id`, `created_at`);
 ALTER TABLE `orders` ADD INDEX `idx_add_id` (`add_id`);
-ALTER TABLE `orders` ADD INDEX `idx_created_at` (`created_at`);
+ALTER TABLE `orders` ADD INDEX `idx_delivery_created` (`delivery`, `created_at`);
+ALTER TABLE `orders` ADD INDEX `idx_created_cover` (`created_at`, `item_id`, `quantity`, `item_price`);
+ALTER TABLE `orders_archive` ADD INDEX `idx_created_at` (`created_at`);
+ALTER TABLE `applied_writes` ADD INDEX `idx_applied_at` (`applied_at`);
+ALTER TABLE `orders_archive` ADD INDEX `idx_cust_created` (`cust_id`, `created_at`);
+ALTER TABLE `orders_archive` ADD INDEX `idx_item_created` (`item_id`, `created_at`);
+ALTER TABLE `item_daily_sales` ADD INDEX `idx_sale_date` (`sale_date`);
 ALTER TABLE `recipe` ADD INDEX `idx_recipe_id` (`recipe_id`);
 ALTER TABLE `recipe` ADD INDEX `idx_ing_id` (`ing_id`);
 ALTER TABLE `rotation` ADD INDEX `idx_shift_id` (`shift_id`);
 ALTER TABLE `rotation` ADD INDEX `idx_staff_id` (`staff_id`);
+ALTER TABLE `rotation` ADD INDEX `idx_date_shift` (`date`, `shift_id`);
+ALTER TABLE `staff_availability` ADD UNIQUE INDEX `idx_staff_day` (`staff_id`, `day_of_week`);
 ALTER TABLE `item` ADD UNIQUE INDEX `idx_sku` (`sku`);
+ALTER TABLE `stock_movement` ADD INDEX `idx_inv_id` (`inv_id`);
+ALTER TABLE `stock_movement` ADD INDEX `idx_created_at` (`created_at`);
+ALTER TABLE `delivery_runs` ADD INDEX `idx_status_window` (`status`, `window_start`);
+ALTER TABLE `delivery_run_orders` ADD INDEX `idx_run_id` (`run_id`);
 
 ALTER TABLE `orders` ADD CONSTRAINT `fk_orders_cust_id` FOREIGN KEY(`cust_id`) 
 REFERENCES `customers` (`cust_id`);
@@ -137,4 +300,28 @@ ALTER TABLE `rotation` ADD CONSTRAINT `fk_rotation_shift_id` FOREIGN KEY(`shift_
 REFERENCES `shift` (`shift_id`);
 
 ALTER TABLE `rotation` ADD CONSTRAINT `fk_rotation_staff_id` FOREIGN KEY(`staff_id`)
-REFERENCES `staff` (`staff_id`);
\ No newline at end of file
+REFERENCES `staff` (`staff_id`);
+
+ALTER TABLE `stock_movement` ADD CONSTRAINT `fk_stock_movement_inv_id` FOREIGN KEY(`inv_id`)
+REFERENCES `inventory` (`inv_id`);
+
+ALTER TABLE `stock_snapshot` ADD CONSTRAINT `fk_stock_snapshot_inv_id` FOREIGN KEY(`inv_id`)
+REFERENCES `inventory` (`inv_id`);
+
+ALTER TABLE `low_stock_alert` ADD CONSTRAINT `fk_low_stock_alert_inv_id` FOREIGN KEY(`inv_id`)
+REFERENCES `inventory` (`inv_id`) ON DELETE CASCADE;
+
+ALTER TABLE `customer_metrics` ADD CONSTRAINT `fk_customer_metrics_cust_id` FOREIGN KEY(`cust_id`)
+REFERENCES `customers` (`cust_id`);
+
+ALTER TABLE `item_daily_sales` ADD CONSTRAINT `fk_item_daily_sales_item_id` FOREIGN KEY(`item_id`)
+REFERENCES `item` (`item_id`);
+
+ALTER TABLE `demand_model` ADD CONSTRAINT `fk_demand_model_item_id` FOREIGN KEY(`item_id`)
+REFERENCES `item` (`item_id`);
+
+ALTER TABLE `staff_availability` ADD CONSTRAINT `fk_staff_availability_staff_id` FOREIGN KEY(`staff_id`)
+REFERENCES `staff` (`staff_id`);
+
+ALTER TABLE `delivery_run_orders` ADD CONSTRAINT `fk_delivery_run_orders_run_id` FOREIGN KEY(`run_id`)
+REFERENCES `delivery_runs` (`run_id`);
\ No newline at end of file
@@ -1,19 +1,70 @@
 import streamlit as st
 import pandas as pd
+import time
 from database import Database
+from customer_analytics import show_customer_analytics
+from forecasting import show_demand_forecast
+from rotation_generator import show_rotation_generator
+from index_advisor import show_index_advisor
+from order_tiers import TierMaintenance, show_order_tiers
+from dispatch import show_delivery_dispatch
+from pricing import show_price_simulator
+from write_journal import WriteJournal
+from metrics import PAGE_DURATION, start_metrics_server
+from profiler import start_profiling, stop_profiling, show_profile
+from live_refresh import show_live_controls, get_live_orders, reset_live_orders, schedule_refresh
 import datetime
+import uuid
+
+rerun_started = time.perf_counter()
+
+# Connection settings shared by the app and the background jobs
+def get_connection_settings():
+    return dict(
+        host=st.secrets.get("db_host", "localhost"),
+        user=st.secrets.get("db_user", "root"),
+        password=st.secrets.get("db_password", ""),  # Change this to your MySQL password
+        database=st.secrets.get("db_name", "icecream_shop"),
+        # Query results cache shared by every app process on this host
+        shared_cache_path=st.secrets.get("shared_cache_path", "shared_cache.db")
+    )
 
 # Initialize database connection
 @st.cache_resource
 def get_database_connection():
     db = Database(
-        host=st.secrets.get("db_host", "localhost"),
-        user=st.secrets.get("db_user", "root"),
-        password=st.secrets.get("db_password", ""),  # Change this to your MySQL password
-        database=st.secrets.get("db_name", "icecream_shop")
+        **get_connection_settings(),
+        # Optional read replicas for SELECTs, see .streamlit/secrets.toml
+        replicas=[dict(replica) for replica in st.secrets.get("db_replicas", [])],
+        max_replica_lag=st.secrets.get("db_max_replica_lag", 5),
+        # Statement timeouts and report concurrency, see .streamlit/secrets.toml
+        interactive_timeout_ms=st.secrets.get("db_interactive_timeout_ms", 5000),
+        report_timeout_ms=st.secrets.get("db_report_timeout_ms", 60000),
+        max_report_queries=st.secrets.get("db_max_report_queries", 2)
     )
     return db
 
+# Archive closed months of orders in the background, once per process
+@st.cache_resource
+def start_tier_maintenance():
+    maintenance = TierMaintenance(get_connection_settings(), hot_months=st.secrets.get("orders_hot_months", 3))
+    maintenance.start()
+    return maintenance
+
+# Local journal that takes POS writes and flushes them to MySQL in the background
+@st.cache_resource
+def get_write_journal():
+    return WriteJournal(st.secrets.get("journal_path", "pos_journal.db"), get_connection_settings()).start()
+
+# Prometheus metrics on a local port, once per process
+@st.cache_resource
+def start_metrics():
+    try:
+        return start_metrics_server(st.secrets.get("metrics_port", 9464))
+    except OSError as e:
+        print(f"Error starting metrics server: {e}")
+        return None
+
 # App configuration
 st.set_page_config(
     page_title="Ice Cream Shop Management",
@@ -27,6 +78,14 @@ st.title("🍦 Ice Cream Shop Management System")
 
 # Initialize database connection
 db = get_database_connection()
+tier_maintenance = start_tier_maintenance()
+journal = get_write_journal()
+start_metrics()
+
+# Tie reads to this browser session so it always sees its own writes
+if "session_key" not in st.session_state:
+    st.session_state.session_key = uuid.uuid4().hex
+db.set_session(st.session_state.session_key)
 
 # Get tables
 tables = db.get_tables()
@@ -34,18 +93,48 @@ tables = db.get_tables()
 # Sidebar for navigation
 st.sidebar.title("Navigation")
 selected_table = st.sidebar.radio("Select a table or view", 
-    ["Dashboard"] + tables + ["Order Management", "Inventory Management", "Staff Schedule", "Recipe Management"])
+    ["Dashboard"] + tables + ["Order Management", "Inventory Management", "Staff Schedule", "Recipe Management", "Customer Analytics", "Demand Forecast", "Index Advisor", "Order History Tiers", "Delivery Dispatch", "Price Simulator"])
+
+# Profile the page render when ?profile= or ICECREAM_PROFILE is set
+start_profiling(selected_table)
+
+# Writes waiting in the local journal
+pending_writes = journal.pending_count()
+if journal.connected is False:
+    st.sidebar.warning(f"Database unavailable. {pending_writes} write(s) are saved locally and will be sent when it is back.")
+elif pending_writes:
+    st.sidebar.info(f"{pending_writes} write(s) being sent to the database.")
+with st.sidebar.expander("Write Journal"):
+    entries = journal.get_entries()
+    st.dataframe(entries[['kind', 'created_at', 'status', 'result', 'error']], hide_index=True)
+    if (entries['status'] == 'failed').any() and st.button("Retry Failed Writes"):
+        journal.retry_failed()
 
 # CRUD operations
 crud_operation = None
 
-if selected_table != "Dashboard" and selected_table not in ["Order Management", "Inventory Management", "Staff Schedule", "Recipe Management"]:
-    crud_operation = st.sidebar.radio("Operation", ["View", "Add", "Edit", "Delete", "Search"])
+# Live mode refresh interval for the current page
+refresh_interval = None
+
+if selected_table != "Dashboard" and selected_table not in ["Order Management", "Inventory Management", "Staff Schedule", "Recipe Management", "Customer Analytics", "Demand Forecast", "Index Advisor", "Order History Tiers", "Delivery Dispatch", "Price Simulator"]:
+    crud_operation = st.sidebar.radio("Operation", ["View", "Add", "Edit", "Bulk Edit", "Delete", "Search"])
+
+# Analytics pages read as reports: queued and off the connection order entry uses
+db.set_priority("report" if selected_table in ["Customer Analytics", "Demand Forecast", "Index Advisor", "Order History Tiers", "Price Simulator"] else "interactive")
 
 # Dashboard
 if selected_table == "Dashboard":
     st.header("Dashboard")
     
+    # In live mode only orders newer than the last one seen are fetched
+    refresh_interval = show_live_controls("dashboard")
+    if refresh_interval:
+        recent_orders, new_orders = get_live_orders(db, "dashboard_orders")
+    else:
+        reset_live_orders("dashboard_orders")
+        st.session_state.pop("dashboard_counts", None)
+        recent_orders, new_orders = None, pd.DataFrame()
+    
     # Create layout with columns
     col1, col2 = st.columns(2)
     
@@ -53,20 +142,29 @@ if selected_table == "Dashboard":
     with col1:
         st.subheader("Overview")
         
-        # Get total number of orders
-        orders_count = db.fetch_data("SELECT COUNT(*) as count FROM orders").iloc[0, 0]
-        # Get total number of items
-        items_count = db.fetch_data("SELECT COUNT(*) as count FROM item").iloc[0, 0]
-        # Get total number of customers
-        customers_count = db.fetch_data("SELECT COUNT(*) as count FROM customers").iloc[0, 0]
-        # Get total number of staff
-        staff_count = db.fetch_data("SELECT COUNT(*) as count FROM staff").iloc[0, 0]
+        counts = st.session_state.get("dashboard_counts")
+        if counts is None:
+            counts = {
+                # Get total number of orders
+                'orders': db.count_orders(),
+                # Get total number of items
+                'items': db.fetch_data("SELECT COUNT(*) as count FROM item", cached=True).iloc[0, 0],
+                # Get total number of customers
+                'customers': db.fetch_data("SELECT COUNT(*) as count FROM customers", cached=True).iloc[0, 0],
+                # Get total number of staff
+                'staff': db.fetch_data("SELECT COUNT(*) as count FROM staff", cached=True).iloc[0, 0]
+            }
+            if refresh_interval:
+                st.session_state["dashboard_counts"] = counts
+        else:
+            # Keep the counts up to date from the new orders alone
+            counts['orders'] += len(new_orders)
         
         # Display statistics in a nice format
-        st.metric("Total Orders", orders_count)
-        st.metric("Total Items", items_count)
-        st.metric("Total Customers", customers_count)
-        st.metric("Total Staff", staff_count)
+        st.metric("Total Orders", counts['orders'], delta=len(new_orders) if not new_orders.empty else None)
+        st.metric("Total Items", counts['items'])
+        st.metric("Total Customers", counts['customers'])
+        st.metric("Total Staff", counts['staff'])
     
     with col2:
         st.subheader("Quick Links")
@@ -91,7 +189,9 @@ if selected_table == "Dashboard":
     
     # Recent orders
     st.subheader("Recent Orders")
-    recent_orders = db.get_orders_with_details().head(5)
+    if recent_orders is None:
+        recent_orders = db.get_orders_with_details(limit=5)
+    recent_orders = recent_orders.head(5)
     if not recent_orders.empty:
         st.dataframe(recent_orders)
     else:
@@ -99,12 +199,7 @@ if selected_table == "Dashboard":
     
     # Low stock alert
     st.subheader("Low Stock Alert")
-    low_stock = db.fetch_data("""
-        SELECT i.inv_id, t.item_name, i.quantity 
-        FROM inventory i 
-        JOIN item t ON i.item_id = t.item_id 
-        WHERE i.quantity < 10
-        """)
+    low_stock = db.get_low_stock()
     
     if not low_stock.empty:
         st.warning("The following items are running low on stock:")
@@ -124,9 +219,9 @@ elif selected_table in tables:
     if crud_operation == "View":
         st.subheader(f"View {selected_table}")
         
-        # Show the data
-        data = db.read_records(selected_table)
-        if not data.empty:
+        # Show the data as an Arrow table straight from the cursor
+        data = db.read_records(selected_table, arrow=True)
+        if data.num_rows > 0:
             st.dataframe(data)
         else:
             st.info(f"No records found in {selected_table}")
@@ -236,9 +331,16 @@ elif selected_table in tables:
                     # Get the selected record
                     condition = f"{pk} = %s"
                     params = [selected_id]
-                    selected_record = db.fetch_data(f"SELECT * FROM {selected_table} WHERE {condition}", params)
                     
-                    if not selected_record.empty:
+                    # Keep the row as it was first loaded so concurrent edits can be detected on submit
+                    original_key = f"edit_original_{selected_table}_{selected_id}"
+                    if original_key not in st.session_state:
+                        selected_record = db.get_record_by_pk(selected_table, pk, selected_id)
+                        if not selected_record.empty:
+                            st.session_state[original_key] = selected_record.iloc[0].to_dict()
+                    original = st.session_state.get(original_key)
+                    
+                    if original is not None:
                         with st.form(key=f"edit_{selected_table}"):
                             # Create input fields for each column
                             form_data = {}
@@ -246,7 +348,7 @@ elif selected_table in tables:
                             for _, row in columns_info.iterrows():
                                 field = row['Field']
                                 field_type = row['Type']
-                                current_value = selected_record.iloc[0][field]
+                                current_value = original[field]
                                 
                                 # Skip primary key fields (usually not editable)
                                 if field in primary_keys:
@@ -287,23 +389,32 @@ elif selected_table in tables:
                                         valid_input = False
                                         missing_fields.append(field)
                                 
-                                if valid_input:
+                                # Only write the fields that were actually changed
+                                changes = db.get_changed_fields(original, form_data)
+                                
+                                if valid_input and not changes:
+                                    st.info("No changes to save.")
+                                elif valid_input:
                                     # Process datetime fields
-                                    for field, value in form_data.items():
+                                    for field, value in changes.items():
                                         if isinstance(value, (datetime.date, datetime.time)) and not isinstance(value, datetime.datetime):
                                             if 'datetime' in columns_info[columns_info['Field'] == field]['Type'].iloc[0].lower():
                                                 # Convert date to datetime
                                                 if isinstance(value, datetime.date):
-                                                    form_data[field] = datetime.datetime.combine(value, datetime.time())
+                                                    changes[field] = datetime.datetime.combine(value, datetime.time())
                                                 # Convert time to datetime (using today's date)
                                                 elif isinstance(value, datetime.time):
-                                                    form_data[field] = datetime.datetime.combine(datetime.date.today(), value)
+                                                    changes[field] = datetime.datetime.combine(datetime.date.today(), value)
                                     
-                                    # Update record in the database
-                                    result = db.update_record(selected_table, form_data, condition)
+                                    # Update record in the database, checking it was not changed since it was loaded
+                                    result = db.update_record(selected_table, changes, condition, params, original=original)
                                     
                                     if result > 0:
+                                        del st.session_state[original_key]
                                         st.success(f"Record updated successfully in {selected_table}!")
+                                    elif result == 0:
+                                        del st.session_state[original_key]
+                                        st.warning("This record was changed by someone else since you loaded it. Review the latest values and try again.")
                                     else:
                                         st.error("Failed to update record. Please check your input.")
                                 else:
@@ -315,6 +426,68 @@ elif selected_table in tables:
         else:
             st.info(f"No records found in {selected_table}")
     
+    # Bulk edit operation
+    elif crud_operation == "Bulk Edit":
+        st.subheader(f"Bulk Edit {selected_table}")
+        
+        if primary_keys:
+            # Keep the rows as loaded so changed cells and concurrent edits can be detected
+            records_key = f"bulk_original_{selected_table}"
+            editor_key = f"bulk_editor_{selected_table}"
+            if records_key not in st.session_state:
+                st.session_state[records_key] = db.read_records(selected_table)
+                st.session_state[editor_key] = st.session_state.get(editor_key, 0) + 1
+            records = st.session_state[records_key]
+            
+            if not records.empty:
+                edited = st.data_editor(
+                    records,
+                    disabled=primary_keys,
+                    hide_index=True,
+                    key=f"{editor_key}_{st.session_state[editor_key]}"
+                )
+                
+                col1, col2 = st.columns(2)
+                save_button = col1.button("Save Changes", type="primary")
+                reload_button = col2.button("Reload")
+                
+                if save_button:
+                    # Collect the changed cells of every row
+                    changes = {}
+                    originals = {}
+                    for original, row in zip(records.to_dict('records'), edited.to_dict('records')):
+                        row_changes = db.get_changed_fields(original, row)
+                        if row_changes:
+                            key = tuple(original[pk] for pk in primary_keys)
+                            changes[key] = row_changes
+                            originals[key] = original
+                    
+                    if not changes:
+                        st.info("No changes to save.")
+                    else:
+                        # Apply all changes in one transaction
+                        result = db.bulk_update_records(selected_table, primary_keys, changes, originals)
+                        del st.session_state[records_key]
+                        
+                        updated = (result['status'] == 'updated').sum()
+                        conflicts = result[result['status'] == 'conflict']
+                        failed = result[result['status'] == 'failed']
+                        if updated > 0:
+                            st.success(f"{updated} record(s) updated successfully in {selected_table}!")
+                        if not conflicts.empty:
+                            st.warning("These records were changed by someone else since you loaded them and were not updated:")
+                            st.dataframe(conflicts, hide_index=True)
+                        if not failed.empty:
+                            st.error("Failed to update records. Please check your input.")
+                
+                if reload_button:
+                    del st.session_state[records_key]
+                    st.rerun()
+            else:
+                st.info(f"No records found in {selected_table}")
+        else:
+            st.error(f"No primary key found for table {selected_table}. Cannot edit records.")
+    
     # Delete operation
     elif crud_operation == "Delete":
         st.subheader(f"Delete from {selected_table}")
@@ -323,56 +496,44 @@ elif selected_table in tables:
         records = db.read_records(selected_table)
         
         if not records.empty:
-            # Create a selectbox to choose a record to delete
             if primary_keys:
-                # Create a display column for selection
-                if len(primary_keys) == 1:
-                    pk = primary_keys[0]
-                    display_col = pk
-                    
-                    # Try to get a more descriptive column if available
-                    name_cols = [col for col in records.columns if 'name' in col.lower()]
-                    if name_cols:
-                        records['_display_'] = records[pk].astype(str) + ' - ' + records[name_cols[0]].astype(str)
-                        display_col = '_display_'
-                    
-                    selected_record_display = st.selectbox(
-                        "Select a record to delete",
-                        options=records[display_col].tolist()
-                    )
+                # Label each row by its key, plus a descriptive column if available
+                labels = records[primary_keys].astype(str).agg(' / '.join, axis=1)
+                name_cols = [col for col in records.columns if 'name' in col.lower() and col not in primary_keys]
+                if name_cols:
+                    labels = labels + ' - ' + records[name_cols[0]].astype(str)
+                
+                selected_rows = st.multiselect(
+                    "Select records to delete",
+                    options=records.index.tolist(),
+                    format_func=lambda i: labels[i]
+                )
+                
+                if selected_rows:
+                    keys = [tuple(records.loc[i, pk] for pk in primary_keys) for i in selected_rows]
+                    st.write("Records to delete:")
+                    st.dataframe(records.loc[selected_rows])
                     
-                    # Get the selected record ID
-                    if display_col == '_display_':
-                        selected_id = records.loc[records['_display_'] == selected_record_display, pk].iloc[0]
-                    else:
-                        selected_id = selected_record_display
+                    # Rows in other tables that reference the selection, counted before deleting
+                    impact = db.get_delete_impact(selected_table, primary_keys, keys)
+                    if not impact.empty and (impact['referencing_rows'] > 0).any():
+                        st.write("Rows referencing the selected records:")
+                        st.dataframe(impact[impact['referencing_rows'] > 0], hide_index=True)
+                    blocking = impact[impact['blocks']] if not impact.empty else impact
                     
-                    # Get the selected record
-                    condition = f"{pk} = %s"
-                    params = [selected_id]
-                    selected_record = db.fetch_data(f"SELECT * FROM {selected_table} WHERE {condition}", params)
-                    
-                    if not selected_record.empty:
-                        st.write("Record to delete:")
-                        st.dataframe(selected_record)
-                        
-                        # Confirm deletion
-                        if st.button("Delete Record", type="primary"):
-                            # Check for foreign key constraints
-                            confirm_delete = True
-                            
-                            if confirm_delete:
-                                # Delete record from the database
-                                result = db.delete_record(selected_table, condition, params)
-                                
-                                if result > 0:
-                                    st.success(f"Record deleted successfully from {selected_table}!")
-                                else:
-                                    st.error("Failed to delete record. This record might be referenced by other tables.")
+                    if not blocking.empty:
+                        st.error(f"{blocking['referencing_rows'].sum()} row(s) in {', '.join(blocking['referencing_table'].unique())} "
+                                 "still reference the selected records. Delete or reassign them first.")
+                    elif st.button("Delete Records", type="primary"):
+                        # All selected rows go in one batched DELETE
+                        result = db.delete_records(selected_table, primary_keys, keys)
                         
-                        st.warning("⚠️ Warning: This action cannot be undone!")
-                else:
-                    st.warning(f"Deleting records with composite primary keys is not supported in this version.")
+                        if result > 0:
+                            st.success(f"{result} record(s) deleted successfully from {selected_table}!")
+                        else:
+                            st.error("Failed to delete records. Please try again.")
+                    
+                    st.warning("⚠️ Warning: This action cannot be undone!")
             else:
                 st.error(f"No primary key found for table {selected_table}. Cannot delete records.")
         else:
@@ -400,12 +561,46 @@ elif selected_table in tables:
 elif selected_table == "Order Management":
     st.header("Order Management")
     
+    refresh_interval = show_live_controls("orders")
+    
     tab1, tab2, tab3 = st.tabs(["View Orders", "Create Order", "Order Analytics"])
     
     with tab1:
         st.subheader("All Orders")
-        orders = db.get_orders_with_details()
-        if not orders.empty:
+        if refresh_interval:
+            # Only orders newer than the last one seen are fetched
+            orders, new_orders = get_live_orders(db, "orders_live")
+            if not new_orders.empty:
+                st.caption(f"{len(new_orders)} new order(s) since the last refresh")
+        else:
+            reset_live_orders("orders_live")
+            
+            # Filters are applied in the database rather than on the loaded rows
+            with st.expander("Filters"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    date_range = st.date_input("Date range", value=(), key="orders_date_range")
+                    cust_filter = st.number_input("Customer ID", min_value=0, value=0, step=1, help="0 for all customers")
+                    limit = st.number_input("Maximum rows", min_value=1, max_value=10000, value=100, step=50)
+                with col2:
+                    item_filter = st.text_input("Item ID")
+                    delivery_filter = st.selectbox("Delivery", options=["All", "Delivery", "Pickup"])
+            
+            start_date = end_date = None
+            if len(date_range) == 2:
+                start_date = date_range[0]
+                end_date = date_range[1] + datetime.timedelta(days=1)
+            orders = db.get_orders_with_details(
+                limit=limit,
+                start_date=start_date,
+                end_date=end_date,
+                cust_id=cust_filter or None,
+                item_id=item_filter or None,
+                delivery={"All": None, "Delivery": True, "Pickup": False}[delivery_filter],
+                arrow=True
+            )
+        # Live mode keeps a DataFrame, otherwise this is an Arrow table
+        if len(orders) > 0:
             st.dataframe(orders)
         else:
             st.info("No orders found.")
@@ -419,7 +614,7 @@ elif selected_table == "Order Management":
             customer_options = {row['cust_id']: row['name'] for _, row in customers.iterrows()}
             
             # Get items for dropdown
-            items = db.fetch_data("SELECT item_id, item_name, item_price, item_size FROM item")
+            items = db.fetch_statement("item_list", cached=True)
             item_options = {row['item_id']: f"{row['item_name']} ({row['item_size']}) - ${row['item_price']}" for _, row in items.iterrows()}
             
             # Get addresses for dropdown
@@ -433,51 +628,31 @@ elif selected_table == "Order Management":
             is_delivery = st.checkbox("Delivery")
             address_id = st.selectbox("Delivery Address", options=list(address_options.keys()), format_func=lambda x: address_options.get(x, ""))
             
-            # Get the price of the selected item
-            item_price = 0
-            if item_id:
-                selected_item = items[items['item_id'] == item_id]
-                if not selected_item.empty:
-                    item_price = selected_item.iloc[0]['item_price']
-            
             submit_button = st.form_submit_button(label="Create Order")
             
             if submit_button:
-                # Generate a new order ID
-                last_order = db.fetch_data("SELECT order_id FROM orders ORDER BY row_id DESC LIMIT 1")
-                if not last_order.empty:
-                    last_id = last_order.iloc[0]['order_id']
-                    # Extract the numeric part and increment
-                    numeric_part = int(last_id.replace('ORD', '')) + 1
-                    new_order_id = f"ORD{numeric_part:04d}"
-                else:
-                    new_order_id = "ORD0001"
-                
-                # Get the next row_id
-                last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM orders")
-                new_row_id = 1
-                if not last_row.empty and last_row.iloc[0]['max_id'] is not None:
-                    new_row_id = last_row.iloc[0]['max_id'] + 1
-                
-                # Create new order
-                order_data = {
-                    'row_id': new_row_id,
-                    'order_id': new_order_id,
+                # The order goes to the local journal and is numbered when it reaches
+                # the database, so a slow or unavailable database never holds up the counter
+                prices = dict(zip(items['item_id'], items['item_price'])) if not items.empty else {}
+                st.session_state.last_order_key = journal.submit('order', {
                     'created_at': datetime.datetime.now(),
                     'item_id': item_id,
-                    'item_price': item_price,
+                    'item_price': prices.get(item_id),
                     'quantity': quantity,
                     'cust_id': customer_id,
                     'delivery': is_delivery,
                     'add_id': address_id
-                }
-                
-                result = db.create_record('orders', order_data)
-                
-                if result > 0:
-                    st.success(f"Order {new_order_id} created successfully!")
-                else:
-                    st.error("Failed to create order. Please check your input.")
+                })
+                st.success("Order saved! It will be numbered as soon as the database confirms it.")
+        
+        # Status of the last order saved from this session
+        last_order = journal.get_entry(st.session_state.get("last_order_key"))
+        if last_order and last_order['status'] == 'flushed':
+            st.info(f"Last order: {last_order['result']['order_id']}")
+        elif last_order and last_order['status'] == 'failed':
+            st.error(f"Last order was rejected by the database: {last_order['error']}")
+        elif last_order:
+            st.caption("Last order is waiting to be sent to the database.")
     
     with tab3:
         st.subheader("Order Analytics")
@@ -489,21 +664,21 @@ elif selected_table == "Order Management":
             GROUP BY DATE(created_at)
             ORDER BY date DESC
             LIMIT 10
-        """)
+        """, priority="report")
         
         if not daily_orders.empty:
             st.line_chart(daily_orders.set_index('date')[['order_count']])
             st.line_chart(daily_orders.set_index('date')[['revenue']])
         
         # Top selling items
-        top_items = db.fetch_data("""
+        top_items = db.fetch_data(f"""
             SELECT i.item_name, SUM(o.quantity) as total_quantity, SUM(o.item_price * o.quantity) as total_revenue
-            FROM orders o
+            FROM {db.orders_source(alias='o')}
             JOIN item i ON o.item_id = i.item_id
             GROUP BY i.item_name
             ORDER BY total_quantity DESC
             LIMIT 5
-        """)
+        """, priority="report")
         
         if not top_items.empty:
             st.subheader("Top Selling Items")
@@ -512,7 +687,7 @@ elif selected_table == "Order Management":
 elif selected_table == "Inventory Management":
     st.header("Inventory Management")
     
-    tab1, tab2 = st.tabs(["View Inventory", "Update Inventory"])
+    tab1, tab2, tab3 = st.tabs(["View Inventory", "Update Inventory", "Stock Ledger"])
     
     with tab1:
         st.subheader("Current Inventory")
@@ -523,9 +698,9 @@ elif selected_table == "Inventory Management":
             st.info("No inventory items found.")
         
         # Low stock alert
-        low_stock = inventory[inventory['quantity'] < 10] if not inventory.empty else pd.DataFrame()
+        low_stock = db.get_low_stock()
         if not low_stock.empty:
-            st.warning("Low Stock Items (quantity < 10):")
+            st.warning("Items below their reorder point:")
             st.dataframe(low_stock)
     
     with tab2:
@@ -534,29 +709,77 @@ elif selected_table == "Inventory Management":
         # Get inventory items for dropdown
         inventory = db.get_inventory_with_items()
         if not inventory.empty:
-            inv_options = {row['inv_id']: f"{row['item_name']} (Current stock: {row['quantity']})" for _, row in inventory.iterrows()}
+            inv_labels = {f"{row['inv_id']} - {row['item_name']} ({row['item_size']}, stock: {row['quantity']})": row['inv_id']
+                          for row in inventory.to_dict('records')}
             
             with st.form(key="update_inventory"):
-                inv_id = st.selectbox("Select Item", options=list(inv_options.keys()), format_func=lambda x: inv_options.get(x, ""))
-                quantity = st.number_input("New Quantity", min_value=0, value=10)
+                # One row per stock movement; all rows are posted together
+                movements = st.data_editor(
+                    pd.DataFrame({
+                        'item': pd.Series(dtype='str'),
+                        'movement_type': pd.Series(dtype='str'),
+                        'quantity': pd.Series(dtype='int'),
+                        'note': pd.Series(dtype='str')
+                    }),
+                    num_rows="dynamic",
+                    column_config={
+                        'item': st.column_config.SelectboxColumn("Item", options=list(inv_labels.keys()), required=True),
+                        'movement_type': st.column_config.SelectboxColumn("Type", options=["receipt", "sale", "waste", "count"], required=True),
+                        'quantity': st.column_config.NumberColumn("Quantity", min_value=0, step=1, required=True),
+                        'note': st.column_config.TextColumn("Note")
+                    },
+                    key="stock_movements"
+                )
+                st.caption("Receipts add stock, sales and waste remove it, and a count sets the counted quantity.")
                 
-                submit_button = st.form_submit_button(label="Update Inventory")
+                submit_button = st.form_submit_button(label="Post Movements")
                 
                 if submit_button:
-                    # Update inventory
-                    result = db.update_record('inventory', {'quantity': quantity}, f"inv_id = {inv_id}")
-                    
-                    if result > 0:
-                        st.success("Inventory updated successfully!")
+                    movements = movements.dropna(subset=['item', 'movement_type', 'quantity'])
+                    if movements.empty:
+                        st.error("Please add at least one movement.")
                     else:
-                        st.error("Failed to update inventory. Please try again.")
+                        # All movements are posted together once the journal reaches the database
+                        journal.submit('stock_movements', {'movements': [
+                            {
+                                'inv_id': inv_labels[row['item']],
+                                'movement_type': row['movement_type'],
+                                'quantity': row['quantity'],
+                                'note': row['note'] if isinstance(row['note'], str) and row['note'] else None
+                            }
+                            for row in movements.to_dict('records')
+                        ]})
+                        st.success(f"{len(movements)} stock movement(s) saved! Stock levels update as soon as the database confirms them.")
         else:
             st.info("No inventory items found.")
+    
+    with tab3:
+        st.subheader("Stock Ledger")
+        
+        movements = db.get_stock_movements()
+        if not movements.empty:
+            st.dataframe(movements)
+        else:
+            st.info("No stock movements found.")
+        
+        # Fold old ledger entries into per-item snapshots
+        with st.form(key="compact_ledger"):
+            keep_days = st.number_input("Keep movements from the last N days", min_value=1, value=90)
+            submit_button = st.form_submit_button(label="Compact Ledger")
+            
+            if submit_button:
+                cutoff = datetime.datetime.now() - datetime.timedelta(days=keep_days)
+                result = db.compact_stock_movements(cutoff)
+                
+                if result >= 0:
+                    st.success(f"{result} stock movement(s) compacted into snapshots.")
+                else:
+                    st.error("Failed to compact the stock ledger. Please try again.")
 
 elif selected_table == "Staff Schedule":
     st.header("Staff Schedule")
     
-    tab1, tab2 = st.tabs(["View Schedule", "Create Rotation"])
+    tab1, tab2, tab3 = st.tabs(["View Schedule", "Create Rotation", "Generate Rotations"])
     
     with tab1:
         st.subheader("Staff Schedule")
@@ -568,8 +791,8 @@ elif selected_table == "Staff Schedule":
         
         selected_staff = st.selectbox("Filter by Staff", options=list(staff_options.keys()), format_func=lambda x: staff_options.get(x, ""))
         
-        schedule = db.get_staff_schedule(selected_staff if selected_staff else None)
-        if not schedule.empty:
+        schedule = db.get_staff_schedule(selected_staff if selected_staff else None, arrow=True)
+        if schedule.num_rows > 0:
             st.dataframe(schedule)
         else:
             st.info("No schedule found for the selected criteria.")
@@ -583,26 +806,10 @@ elif selected_table == "Staff Schedule":
             staff_options = {row['staff_id']: row['name'] for _, row in staff.iterrows()}
             
             # Get shifts for dropdown
-            shifts = db.fetch_data("SELECT shift_id, CONCAT(day_of_week, ' (', start_time, ' - ', end_time, ')') as shift_desc FROM shift")
+            shifts = db.fetch_data("SELECT shift_id, CONCAT(day_of_week, ' (', start_time, ' - ', end_time, ')') as shift_desc FROM shift", cached=True)
             shift_options = {row['shift_id']: row['shift_desc'] for _, row in shifts.iterrows()}
             
             # Create form fields
-            # Get the next row_id
-            last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM rotation")
-            new_row_id = 1
-            if not last_row.empty and last_row.iloc[0]['max_id'] is not None:
-                new_row_id = last_row.iloc[0]['max_id'] + 1
-                
-            # Generate rotation ID
-            last_rota = db.fetch_data("SELECT rota_id FROM rotation ORDER BY row_id DESC LIMIT 1")
-            if not last_rota.empty:
-                last_id = last_rota.iloc[0]['rota_id']
-                # Extract the numeric part and increment
-                numeric_part = int(last_id.replace('ROT', '')) + 1
-                new_rota_id = f"ROT{numeric_part:04d}"
-            else:
-                new_rota_id = "ROT0001"
-            
             staff_id = st.selectbox("Staff", options=list(staff_options.keys()), format_func=lambda x: staff_options.get(x, ""))
             shift_id = st.selectbox("Shift", options=list(shift_options.keys()), format_func=lambda x: shift_options.get(x, ""))
             date = st.date_input("Date")
@@ -610,21 +817,16 @@ elif selected_table == "Staff Schedule":
             submit_button = st.form_submit_button(label="Create Rotation")
             
             if submit_button:
-                # Create new rotation
-                rotation_data = {
-                    'row_id': new_row_id,
-                    'rota_id': new_rota_id,
+                # Row and rotation IDs are assigned when the journal reaches the database
+                journal.submit('rotation', {
                     'date': date,
                     'shift_id': shift_id,
                     'staff_id': staff_id
-                }
-                
-                result = db.create_record('rotation', rotation_data)
-                
-                if result > 0:
-                    st.success(f"Rotation {new_rota_id} created successfully!")
-                else:
-                    st.error("Failed to create rotation. Please check your input.")
+                })
+                st.success("Rotation saved! It will appear in the schedule as soon as the database confirms it.")
+    
+    with tab3:
+        show_rotation_generator(db)
 
 elif selected_table == "Recipe Management":
     st.header("Recipe Management")
@@ -635,7 +837,7 @@ elif selected_table == "Recipe Management":
         st.subheader("Recipes")
         
         # Get items for recipes
-        items = db.fetch_data("SELECT sku, item_name FROM item")
+        items = db.fetch_data("SELECT sku, item_name FROM item", cached=True)
         recipe_options = {row['sku']: row['item_name'] for _, row in items.iterrows()}
         recipe_options[''] = "All Recipes"
         
@@ -652,42 +854,82 @@ elif selected_table == "Recipe Management":
         
         with st.form(key="create_recipe"):
             # Get items for dropdown
-            items = db.fetch_data("SELECT sku, item_name FROM item")
+            items = db.fetch_data("SELECT sku, item_name FROM item", cached=True)
             item_options = {row['sku']: row['item_name'] for _, row in items.iterrows()}
             
             # Get ingredients for dropdown
-            ingredients = db.fetch_data("SELECT ing_id, ing_name FROM ingredient")
+            ingredients = db.fetch_data("SELECT ing_id, ing_name FROM ingredient", cached=True)
             ing_options = {row['ing_id']: row['ing_name'] for _, row in ingredients.iterrows()}
             
             # Create form fields
             # Get the next row_id
-            last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM recipe")
+            last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM recipe", primary=True)
             new_row_id = 1
             if not last_row.empty and last_row.iloc[0]['max_id'] is not None:
                 new_row_id = last_row.iloc[0]['max_id'] + 1
             
             recipe_id = st.selectbox("Item SKU", options=list(item_options.keys()), format_func=lambda x: item_options.get(x, ""))
-            ing_id = st.selectbox("Ingredient", options=list(ing_options.keys()), format_func=lambda x: ing_options.get(x, ""))
-            quantity = st.number_input("Quantity", min_value=1, value=1)
+            
+            # One row per ingredient to add to the recipe
+            ing_labels = {f"{ing_id} - {name}": ing_id for ing_id, name in ing_options.items()}
+            recipe_rows = st.data_editor(
+                pd.DataFrame({'ingredient': pd.Series(dtype='str'), 'quantity': pd.Series(dtype='int')}),
+                num_rows="dynamic",
+                column_config={
+                    'ingredient': st.column_config.SelectboxColumn("Ingredient", options=list(ing_labels.keys()), required=True),
+                    'quantity': st.column_config.NumberColumn("Quantity", min_value=1, step=1, required=True)
+                },
+                key="recipe_rows"
+            )
             
             submit_button = st.form_submit_button(label="Add to Recipe")
             
             if submit_button:
-                # Create new recipe item
-                recipe_data = {
-                    'row_id': new_row_id,
-                    'recipe_id': recipe_id,
-                    'ing_id': ing_id,
-                    'quantity': quantity
-                }
-                
-                result = db.create_record('recipe', recipe_data)
-                
-                if result > 0:
-                    st.success(f"Recipe item added successfully!")
+                recipe_rows = recipe_rows.dropna()
+                if recipe_rows.empty:
+                    st.error("Please add at least one ingredient.")
                 else:
-                    st.error("Failed to add recipe item. Please check your input.")
+                    # Add all recipe items in a single transaction
+                    with db.unit_of_work() as uow:
+                        for offset, (_, row) in enumerate(recipe_rows.iterrows()):
+                            uow.create('recipe', {
+                                'row_id': new_row_id + offset,
+                                'recipe_id': recipe_id,
+                                'ing_id': ing_labels[row['ingredient']],
+                                'quantity': int(row['quantity'])
+                            })
+                    
+                    if uow.committed:
+                        st.success(f"{len(recipe_rows)} recipe item(s) added successfully!")
+                    else:
+                        st.error("Failed to add recipe items. Please check your input.")
+
+elif selected_table == "Customer Analytics":
+    show_customer_analytics(db)
+
+elif selected_table == "Demand Forecast":
+    show_demand_forecast(db)
+
+elif selected_table == "Index Advisor":
+    show_index_advisor(db)
+
+elif selected_table == "Order History Tiers":
+    show_order_tiers(db, tier_maintenance)
+
+elif selected_table == "Delivery Dispatch":
+    refresh_interval = show_delivery_dispatch(db)
+
+elif selected_table == "Price Simulator":
+    show_price_simulator(db)
+
+# Profile aggregated over this page's reruns
+show_profile(stop_profiling())
 
 # Footer
 st.markdown("---")
-st.markdown("© 2025 Ice Cream Shop Management System")
\ No newline at end of file
+st.markdown("© 2025 Ice Cream Shop Management System")
+
+PAGE_DURATION.observe(time.perf_counter() - rerun_started, page=selected_table)
+
+# Rerun live pages once everything has been rendered
+schedule_refresh(refresh_interval)
\ No newline at end of file
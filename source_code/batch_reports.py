@@ -0,0 +1,250 @@
+"""Period reports for month-end closing
+
+Run with:
+
+    python batch_reports.py 2025-01-01 2025-03-31 [--out reports] [--workers 4]
+
+The date range is split into calendar months and each month is built in its
+own process with its own database connection. Orders are read in row_id
+ranges of --chunk-rows so no single query holds the server for long. The
+reports are written as Parquet files plus an index.html summary under
+<out>/<start>_<end>/.
+"""
+import argparse
+import datetime
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from mysql.connector import Error
+from database import Database
+from order_api import load_settings
+
+REPORTS = ("sales_by_day", "sales_by_item", "sales_by_category", "labor", "inventory")
+
+class ReportError(Exception):
+    """A month could not be read completely"""
+
+def month_ranges(start, end):
+    """Split an inclusive date range into (first day, day after last) pairs per calendar month"""
+    ranges = []
+    first = start
+    while first <= end:
+        next_month = (first.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        ranges.append((first, min(next_month, end + datetime.timedelta(days=1))))
+        first = next_month
+    return ranges
+
+def read_sales(db, start, end, chunk_rows):
+    """Aggregate a month of order lines per day and item, reading row_id ranges of chunk_rows
+
+    Each chunk is reduced before the next is read, so memory stays bounded
+    by the number of items and days rather than the number of order lines.
+    """
+    source = db.orders_source(start)
+    bounds = db.fetch_report(f"""
+        SELECT MIN(row_id) as first_row, MAX(row_id) as last_row
+        FROM {source}
+        WHERE created_at >= %s AND created_at < %s
+        """, [start, end])
+    if bounds.empty or pd.isna(bounds.iloc[0]['first_row']):
+        return pd.DataFrame(columns=['sale_date', 'item_id', 'units', 'revenue', 'orders'])
+
+    partials = []
+    order_days = set()
+    low = int(bounds.iloc[0]['first_row'])
+    last_row = int(bounds.iloc[0]['last_row'])
+    while low <= last_row:
+        rows = db.fetch_report(f"""
+            SELECT order_id, DATE(created_at) as sale_date, item_id, quantity, item_price * quantity as amount
+            FROM {source}
+            WHERE row_id >= %s AND row_id < %s AND created_at >= %s AND created_at < %s
+            """, [low, low + chunk_rows, start, end], arrow=True)
+        low += chunk_rows
+        if rows.num_rows == 0:
+            continue
+        chunk = rows.to_pandas()
+        chunk['amount'] = chunk['amount'].astype(float)
+        partials.append(chunk.groupby(['sale_date', 'item_id'], as_index=False)
+                        .agg(units=('quantity', 'sum'), revenue=('amount', 'sum')))
+        # An order's lines can fall in two chunks, so orders are counted once at the end
+        order_days.update(zip(chunk['sale_date'], chunk['order_id']))
+
+    if not partials:
+        return pd.DataFrame(columns=['sale_date', 'item_id', 'units', 'revenue', 'orders'])
+    sales = pd.concat(partials).groupby(['sale_date', 'item_id'], as_index=False)[['units', 'revenue']].sum()
+    orders = pd.DataFrame(list(order_days), columns=['sale_date', 'order_id']).groupby('sale_date').size()
+    sales['orders'] = sales['sale_date'].map(orders)
+    return sales
+
+def read_labor(db, start, end):
+    """Get the scheduled shifts, hours and cost of each staff member in a month"""
+    shifts = db.fetch_report("""
+        SELECT r.staff_id, st.first_name, st.last_name, st.position, st.hourly_rate,
+               (TIME_TO_SEC(s.end_time) - TIME_TO_SEC(s.start_time)
+                + IF(s.end_time <= s.start_time, 86400, 0)) / 3600 as hours
+        FROM rotation r
+        JOIN shift s ON r.shift_id = s.shift_id
+        JOIN staff st ON r.staff_id = st.staff_id
+        WHERE r.date >= %s AND r.date < %s
+        """, [start, end])
+    if shifts.empty:
+        return pd.DataFrame(columns=['staff_id', 'first_name', 'last_name', 'position', 'shifts', 'hours', 'cost'])
+    shifts['hours'] = shifts['hours'].astype(float)
+    shifts['cost'] = shifts['hours'] * shifts['hourly_rate'].astype(float)
+    return (shifts.groupby(['staff_id', 'first_name', 'last_name', 'position'], as_index=False)
+            .agg(shifts=('hours', 'size'), hours=('hours', 'sum'), cost=('cost', 'sum')))
+
+def read_inventory(db, start, end):
+    """Get each inventory line's opening and closing quantity and movements in a month
+
+    Positions are rebuilt backwards from the current quantity with the ledger
+    entries after the month. Movements already compacted into stock
+    snapshots are not broken down by type.
+    """
+    inventory = db.fetch_report("""
+        SELECT i.inv_id, i.item_id, t.item_name, t.item_size, i.quantity
+        FROM inventory i
+        JOIN item t ON i.item_id = t.item_id
+        """)
+    if inventory.empty:
+        return pd.DataFrame()
+    movements = db.fetch_report("""
+        SELECT inv_id, movement_type, created_at < %s as in_period, SUM(delta) as delta
+        FROM stock_movement
+        WHERE created_at >= %s
+        GROUP BY inv_id, movement_type, created_at < %s
+        """, [end, start, end])
+
+    inventory = inventory.set_index('inv_id')
+    later = pd.Series(0.0, index=inventory.index)
+    in_period = pd.DataFrame(0.0, index=inventory.index, columns=['receipt', 'sale', 'waste', 'count'])
+    if not movements.empty:
+        movements['delta'] = movements['delta'].astype(float)
+        later = later.add(movements[movements['in_period'] == 0].groupby('inv_id')['delta'].sum(), fill_value=0)
+        period = movements[movements['in_period'] == 1].pivot_table(
+            index='inv_id', columns='movement_type', values='delta', aggfunc='sum')
+        in_period = in_period.add(period, fill_value=0)[in_period.columns]
+
+    closing = inventory['quantity'] - later.reindex(inventory.index, fill_value=0)
+    return pd.DataFrame({
+        'item_id': inventory['item_id'],
+        'item_name': inventory['item_name'],
+        'item_size': inventory['item_size'],
+        'opening': closing - in_period.sum(axis=1),
+        'received': in_period['receipt'],
+        'sold': 0 - in_period['sale'],
+        'wasted': 0 - in_period['waste'],
+        'count_adjustment': in_period['count'],
+        'closing': closing
+    }).reset_index()
+
+def build_month(settings, start, end, chunk_rows=50000):
+    """Build the reports of one month; runs in a worker process
+
+    Reads run at report priority, off the POS connection, and raise when they
+    fail or time out so a month is never written with missing rows.
+    """
+    db = Database(**settings)
+    try:
+        items = db.fetch_report("SELECT item_id, item_name, item_cat, item_size FROM item")
+        sales = read_sales(db, start, end, chunk_rows)
+        labor = read_labor(db, start, end)
+        inventory = read_inventory(db, start, end)
+    except Error as e:
+        # Re-raised as a plain exception so it crosses back from the worker process
+        raise ReportError(f"Reading {start:%Y-%m} failed: {e}") from None
+    finally:
+        db.disconnect()
+
+    month = start.strftime("%Y-%m")
+    sales_by_day = (sales.groupby('sale_date', as_index=False)[['units', 'revenue']].sum()
+                    .merge(sales[['sale_date', 'orders']].drop_duplicates(), on='sale_date'))
+    sales_by_item = (sales.groupby('item_id', as_index=False)[['units', 'revenue']].sum()
+                     .merge(items, on='item_id', how='left'))
+    sales_by_category = sales_by_item.groupby('item_cat', as_index=False)[['units', 'revenue']].sum()
+    reports = dict(sales_by_day=sales_by_day, sales_by_item=sales_by_item, sales_by_category=sales_by_category,
+                   labor=labor, inventory=inventory)
+    for name, df in reports.items():
+        df.insert(0, 'month', month)
+    return reports
+
+def summarize(reports):
+    """Get one row per month with sales, labor and labor share of revenue"""
+    sales = reports['sales_by_day'].groupby('month')[['orders', 'units', 'revenue']].sum()
+    labor = reports['labor'].groupby('month')[['hours', 'cost']].sum()
+    summary = sales.join(labor.rename(columns={'hours': 'labor_hours', 'cost': 'labor_cost'}), how='outer').fillna(0)
+    summary['labor_pct'] = (summary['labor_cost'] / summary['revenue'].where(summary['revenue'] > 0) * 100).fillna(0)
+    return summary.round(2).reset_index()
+
+def write_html(path, title, summary, reports):
+    """Write a static HTML page with the period summary and the main report tables"""
+    sections = [("Monthly Summary", summary),
+                ("Top Items", reports['sales_by_item'].groupby(['item_id', 'item_name', 'item_size'], as_index=False)
+                 [['units', 'revenue']].sum().sort_values('revenue', ascending=False).head(20)),
+                ("Sales by Category", reports['sales_by_category'].pivot_table(
+                    index='item_cat', columns='month', values='revenue', aggfunc='sum', fill_value=0)),
+                ("Labor by Staff", reports['labor'].groupby(['staff_id', 'first_name', 'last_name', 'position'],
+                                                            as_index=False)[['shifts', 'hours', 'cost']].sum()),
+                ("Closing Inventory", reports['inventory'][reports['inventory']['month'] == reports['inventory']['month'].max()]
+                 if not reports['inventory'].empty else reports['inventory'])]
+    body = "".join(f"<h2>{html.escape(heading)}</h2>"
+                   + (df.round(2).to_html(index=df.index.name is not None, border=0)
+                      if not df.empty else "<p>No data.</p>")
+                   for heading, df in sections)
+    with open(path, "w") as f:
+        f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; }}
+th, td {{ padding: 4px 10px; text-align: right; border-bottom: 1px solid #ddd; }}
+th {{ background: #f4f4f4; }}
+</style></head>
+<body><h1>{html.escape(title)}</h1>
+<p>Generated {datetime.datetime.now():%Y-%m-%d %H:%M}</p>
+{body}
+</body></html>""")
+
+def generate_reports(settings, start, end, out_dir, workers=None, chunk_rows=50000):
+    """Build every month of the range in parallel and write Parquet files and index.html
+
+    Returns the directory the reports were written to. Raises ReportError,
+    before anything is written, when any month could not be read.
+    """
+    ranges = month_ranges(start, end)
+    # Workers only read, so they skip the shared cache file
+    settings = dict(settings, shared_cache_path=None)
+    with ProcessPoolExecutor(max_workers=workers or min(len(ranges), os.cpu_count() or 1)) as pool:
+        months = list(pool.map(build_month, [settings] * len(ranges), [r[0] for r in ranges],
+                               [r[1] for r in ranges], [chunk_rows] * len(ranges)))
+
+    reports = {name: pd.concat([month[name] for month in months], ignore_index=True) for name in REPORTS}
+    path = os.path.join(out_dir, f"{start:%Y-%m-%d}_{end:%Y-%m-%d}")
+    os.makedirs(path, exist_ok=True)
+    for name, df in reports.items():
+        df.to_parquet(os.path.join(path, f"{name}.parquet"), index=False)
+    write_html(os.path.join(path, "index.html"), f"Ice Cream Shop Report {start:%Y-%m-%d} to {end:%Y-%m-%d}",
+               summarize(reports), reports)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Period reports for the Ice Cream Shop")
+    parser.add_argument("start", type=datetime.date.fromisoformat, help="First day, YYYY-MM-DD")
+    parser.add_argument("end", type=datetime.date.fromisoformat, help="Last day, YYYY-MM-DD")
+    parser.add_argument("--out", default="reports", help="Directory the report folder is created in")
+    parser.add_argument("--workers", type=int, default=None, help="Months built at once (default: one per CPU)")
+    parser.add_argument("--chunk-rows", type=int, default=50000, help="Order rows read per query")
+    args = parser.parse_args()
+    if args.end < args.start:
+        parser.error("end must not be before start")
+
+    try:
+        path = generate_reports(load_settings(), args.start, args.end, args.out, args.workers, args.chunk_rows)
+    except ReportError as e:
+        # Nothing is written unless every month was read in full
+        parser.exit(1, f"{e}\nNo reports were written. A smaller --chunk-rows helps with query timeouts.\n")
+    print(f"Reports written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import datetime
+from database import Database
+
+STATE_NAME = "customer_metrics"
+
+def update_customer_metrics(db):
+    """Fold orders added since the last run into the persisted customer metrics
+
+    All new orders are aggregated per customer in one vectorized pass and
+    merged into customer_metrics and customer_activity in a single transaction.
+    The state row is locked first, so concurrent runs queue up instead of
+    adding the same orders twice. Returns the number of order rows processed,
+    or -1 on failure.
+    """
+    now = datetime.datetime.now()
+    with db.transaction() as tx:
+        db.execute_query("""
+            INSERT IGNORE INTO analytics_state (name, last_row_id, updated_at) VALUES (%s, 0, %s)
+            """, [STATE_NAME, now])
+        state = db.fetch_data("SELECT last_row_id FROM analytics_state WHERE name = %s FOR UPDATE", [STATE_NAME])
+        last_row_id = int(state.iloc[0]['last_row_id']) if not state.empty else 0
+
+        orders = db.fetch_data(f"""
+            SELECT row_id, order_id, cust_id, created_at, item_price * quantity as amount
+            FROM {db.orders_source(since_row_id=last_row_id)}
+            WHERE row_id > %s
+            """, [last_row_id], arrow=True)
+        # A failed read comes back without columns, which is not the same as no new orders
+        if orders.num_columns == 0:
+            tx.failed = True
+            return -1
+        if orders.num_rows == 0:
+            return 0
+
+        cust_ids, codes = np.unique(orders.column('cust_id').to_numpy(), return_inverse=True)
+        created_at = orders.column('created_at').to_numpy().astype('datetime64[s]')
+        amount = orders.column('amount').cast(pa.float64()).to_numpy()
+        n = len(cust_ids)
+
+        # Grouped reductions over all customers at once
+        total_spent = np.bincount(codes, weights=amount, minlength=n)
+        first_order = np.full(n, np.datetime64('9999-12-31T00:00:00'), dtype='datetime64[s]')
+        last_order = np.full(n, np.datetime64('1970-01-01T00:00:00'), dtype='datetime64[s]')
+        np.minimum.at(first_order, codes, created_at)
+        np.maximum.at(last_order, codes, created_at)
+        # An order can span several rows, so frequency counts distinct order ids
+        order_ids = orders.column('order_id').to_numpy(zero_copy_only=False)
+        _, order_index = np.unique(order_ids, return_index=True)
+        order_count = np.bincount(codes[order_index], minlength=n)
+
+        # Months each customer was active in, for cohort retention
+        months = created_at.astype('datetime64[M]')
+        activity = np.unique(np.stack([codes, months.astype(np.int64)], axis=1), axis=0)
+
+        db.execute_many("""
+            INSERT INTO customer_metrics (cust_id, first_order_at, last_order_at, order_count, total_spent, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                first_order_at = LEAST(first_order_at, VALUES(first_order_at)),
+                last_order_at = GREATEST(last_order_at, VALUES(last_order_at)),
+                order_count = order_count + VALUES(order_count),
+                total_spent = total_spent + VALUES(total_spent),
+                updated_at = VALUES(updated_at)
+            """, [
+                (cust_ids[i].item(), first_order[i].item(), last_order[i].item(), int(order_count[i]), round(float(total_spent[i]), 2), now)
+                for i in range(n)
+            ])
+        db.execute_many(
+            "INSERT IGNORE INTO customer_activity (cust_id, activity_month) VALUES (%s, %s)",
+            list(zip(cust_ids[activity[:, 0]].tolist(), activity[:, 1].astype('datetime64[M]').astype('datetime64[D]').tolist()))
+        )
+        db.execute_query("""
+            INSERT INTO analytics_state (name, last_row_id, updated_at) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE last_row_id = VALUES(last_row_id), updated_at = VALUES(updated_at)
+            """, [STATE_NAME, int(orders.column('row_id').to_numpy().max()), now])
+    return orders.num_rows if tx.committed else -1
+
+def reset_customer_metrics(db):
+    """Clear the persisted customer metrics so the next update starts from the first order"""
+    with db.unit_of_work() as uow:
+        uow.execute("DELETE FROM customer_metrics")
+        uow.execute("DELETE FROM customer_activity")
+        uow.delete('analytics_state', "name = %s", [STATE_NAME])
+    return uow.committed
+
+def score_customers(metrics, as_of, lifespan_months=24):
+    """Compute RFM scores and lifetime value for all customers with array math
+
+    Each of recency, frequency and monetary value is scored 1-5 by quintile
+    rank. Lifetime value projects the average order value and monthly order
+    rate over the expected customer lifespan.
+    """
+    last_order = metrics['last_order_at'].to_numpy(dtype='datetime64[s]')
+    first_order = metrics['first_order_at'].to_numpy(dtype='datetime64[s]')
+    frequency = metrics['order_count'].to_numpy(dtype=float)
+    monetary = metrics['total_spent'].to_numpy(dtype=float)
+    recency = (np.datetime64(as_of, 's') - last_order) / np.timedelta64(1, 'D')
+
+    def quintile(values, higher_is_better=True):
+        ranks = values.argsort(kind='stable').argsort()
+        scores = np.floor(ranks * 5 / max(len(values), 1)).astype(int) + 1
+        return scores if higher_is_better else 6 - scores
+
+    r_score = quintile(recency, higher_is_better=False)
+    f_score = quintile(frequency)
+    m_score = quintile(monetary)
+
+    tenure_months = np.maximum((np.datetime64(as_of, 's') - first_order) / np.timedelta64(30, 'D'), 1.0)
+    avg_order_value = monetary / np.maximum(frequency, 1)
+    lifetime_value = avg_order_value * (frequency / tenure_months) * lifespan_months
+
+    segment = np.select(
+        [(r_score >= 4) & (f_score >= 4),
+         f_score >= 4,
+         (r_score <= 2) & (f_score >= 3),
+         (r_score >= 4) & (f_score <= 2),
+         r_score <= 2],
+        ["Champions", "Loyal", "At Risk", "New", "Hibernating"],
+        default="Regular"
+    )
+
+    return pd.DataFrame({
+        'cust_id': metrics['cust_id'].to_numpy(),
+        'customer': metrics['customer'].to_numpy(),
+        'recency_days': np.round(recency, 1),
+        'frequency': frequency.astype(int),
+        'monetary': np.round(monetary, 2),
+        'r_score': r_score,
+        'f_score': f_score,
+        'm_score': m_score,
+        'rfm': r_score * 100 + f_score * 10 + m_score,
+        'segment': segment,
+        'avg_order_value': np.round(avg_order_value, 2),
+        'lifetime_value': np.round(lifetime_value, 2)
+    })
+
+def cohort_retention(metrics, activity):
+    """Build the monthly cohort retention matrix
+
+    Rows are the month of each customer's first order, columns are months
+    since then, values are the share of the cohort active in that month.
+    """
+    cohort_by_cust = pd.Series(
+        metrics['first_order_at'].to_numpy(dtype='datetime64[M]'),
+        index=metrics['cust_id'].to_numpy()
+    )
+    activity = activity[activity['cust_id'].isin(cohort_by_cust.index)]
+    if activity.empty:
+        return pd.DataFrame()
+    cohort = cohort_by_cust.loc[activity['cust_id'].to_numpy()].to_numpy().astype('datetime64[M]')
+    month = activity['activity_month'].to_numpy(dtype='datetime64[M]')
+    period = (month - cohort).astype(int)
+
+    cohorts, cohort_codes = np.unique(cohort, return_inverse=True)
+    counts = np.zeros((len(cohorts), period.max() + 1))
+    np.add.at(counts, (cohort_codes, period), 1)
+
+    retention = counts / counts[:, :1]
+    return pd.DataFrame(
+        np.round(retention * 100, 1),
+        index=pd.Index(np.datetime_as_string(cohorts, unit='M'), name='cohort'),
+        columns=[f"M{i}" for i in range(retention.shape[1])]
+    )
+
+def show_customer_analytics(db):
+    """Display the customer analytics section"""
+    st.header("Customer Analytics")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Update Analytics", type="primary"):
+            processed = update_customer_metrics(db)
+            if processed >= 0:
+                st.success(f"{processed} new order row(s) processed.")
+            else:
+                st.error("Failed to update customer analytics. Please try again.")
+    with col2:
+        if st.button("Rebuild From Scratch"):
+            if reset_customer_metrics(db) and update_customer_metrics(db) >= 0:
+                st.success("Customer analytics rebuilt.")
+            else:
+                st.error("Failed to rebuild customer analytics. Please try again.")
+
+    metrics = db.fetch_data("""
+        SELECT m.cust_id, CONCAT(c.cust_firstname, ' ', c.cust_lastname) as customer,
+               m.first_order_at, m.last_order_at, m.order_count, m.total_spent
+        FROM customer_metrics m
+        JOIN customers c ON m.cust_id = c.cust_id
+        """, cached=True)
+    if metrics.empty:
+        st.info("No customer analytics yet. Click Update Analytics to compute them.")
+        return
+
+    state = db.fetch_data("SELECT last_row_id, updated_at FROM analytics_state WHERE name = %s", [STATE_NAME])
+    if not state.empty:
+        st.caption(f"Up to order row {state.iloc[0]['last_row_id']}, last updated {state.iloc[0]['updated_at']}")
+
+    tab1, tab2, tab3 = st.tabs(["RFM Segments", "Lifetime Value", "Cohort Retention"])
+
+    lifespan = st.sidebar.number_input("Expected customer lifespan (months)", min_value=1, value=24)
+    scores = score_customers(metrics, datetime.datetime.now(), lifespan)
+
+    with tab1:
+        st.subheader("RFM Segments")
+        segments = scores.groupby('segment').agg(
+            customers=('cust_id', 'count'),
+            avg_recency_days=('recency_days', 'mean'),
+            avg_frequency=('frequency', 'mean'),
+            total_monetary=('monetary', 'sum')
+        ).round(2)
+        st.bar_chart(segments[['customers']])
+        st.dataframe(segments)
+        st.dataframe(scores.drop(columns=['avg_order_value', 'lifetime_value']), hide_index=True)
+
+    with tab2:
+        st.subheader("Customer Lifetime Value")
+        st.metric("Average Lifetime Value", f"${scores['lifetime_value'].mean():.2f}")
+        st.dataframe(
+            scores[['cust_id', 'customer', 'frequency', 'avg_order_value', 'lifetime_value', 'segment']]
+            .sort_values('lifetime_value', ascending=False),
+            hide_index=True
+        )
+
+    with tab3:
+        st.subheader("Monthly Cohort Retention (%)")
+        activity = db.fetch_data("SELECT cust_id, activity_month FROM customer_activity", cached=True)
+        retention = cohort_retention(metrics, activity)
+        if not retention.empty:
+            st.dataframe(retention)
+        else:
+            st.info("No cohort data found.")
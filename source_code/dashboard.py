@@ -1,12 +1,22 @@
 import streamlit as st
 import pandas as pd
 from database import Database
+from live_refresh import show_live_controls, get_live_orders, reset_live_orders, schedule_refresh
 import datetime
 
 def show_dashboard(db):
     """Display the dashboard with key statistics and quick links"""
     st.header("Dashboard")
     
+    # In live mode only orders newer than the last one seen are fetched
+    refresh_interval = show_live_controls("dashboard")
+    if refresh_interval:
+        recent_orders, new_orders = get_live_orders(db, "dashboard_orders")
+    else:
+        reset_live_orders("dashboard_orders")
+        st.session_state.pop("dashboard_counts", None)
+        recent_orders, new_orders = None, pd.DataFrame()
+    
     # Create layout with columns
     col1, col2 = st.columns(2)
     
@@ -14,20 +24,29 @@ def show_dashboard(db):
     with col1:
         st.subheader("Overview")
         
-        # Get total number of orders
-        orders_count = db.fetch_data("SELECT COUNT(*) as count FROM orders").iloc[0, 0]
-        # Get total number of items
-        items_count = db.fetch_data("SELECT COUNT(*) as count FROM item").iloc[0, 0]
-        # Get total number of customers
-        customers_count = db.fetch_data("SELECT COUNT(*) as count FROM customers").iloc[0, 0]
-        # Get total number of staff
-        staff_count = db.fetch_data("SELECT COUNT(*) as count FROM staff").iloc[0, 0]
+        counts = st.session_state.get("dashboard_counts")
+        if counts is None:
+            counts = {
+                # Get total number of orders
+                'orders': db.count_orders(),
+                # Get total number of items
+                'items': db.fetch_data("SELECT COUNT(*) as count FROM item", cached=True).iloc[0, 0],
+                # Get total number of customers
+                'customers': db.fetch_data("SELECT COUNT(*) as count FROM customers", cached=True).iloc[0, 0],
+                # Get total number of staff
+                'staff': db.fetch_data("SELECT COUNT(*) as count FROM staff", cached=True).iloc[0, 0]
+            }
+            if refresh_interval:
+                st.session_state["dashboard_counts"] = counts
+        else:
+            # Keep the counts up to date from the new orders alone
+            counts['orders'] += len(new_orders)
         
         # Display statistics in a nice format
-        st.metric("Total Orders", orders_count)
-        st.metric("Total Items", items_count)
-        st.metric("Total Customers", customers_count)
-        st.metric("Total Staff", staff_count)
+        st.metric("Total Orders", counts['orders'], delta=len(new_orders) if not new_orders.empty else None)
+        st.metric("Total Items", counts['items'])
+        st.metric("Total Customers", counts['customers'])
+        st.metric("Total Staff", counts['staff'])
     
     with col2:
         st.subheader("Quick Links")
@@ -52,7 +71,9 @@ def show_dashboard(db):
     
     # Recent orders
     st.subheader("Recent Orders")
-    recent_orders = db.get_orders_with_details().head(5)
+    if recent_orders is None:
+        recent_orders = db.get_orders_with_details(limit=5)
+    recent_orders = recent_orders.head(5)
     if not recent_orders.empty:
         st.dataframe(recent_orders)
     else:
@@ -60,15 +81,12 @@ def show_dashboard(db):
     
     # Low stock alert
     st.subheader("Low Stock Alert")
-    low_stock = db.fetch_data("""
-        SELECT i.inv_id, t.item_name, i.quantity 
-        FROM inventory i 
-        JOIN item t ON i.item_id = t.item_id 
-        WHERE i.quantity < 10
-        """)
+    low_stock = db.get_low_stock()
     
     if not low_stock.empty:
         st.warning("The following items are running low on stock:")
         st.dataframe(low_stock)
     else:
-        st.success("All items have sufficient stock.")
\ No newline at end of file
+        st.success("All items have sufficient stock.")
+    
+    schedule_refresh(refresh_interval)
\ No newline at end of file
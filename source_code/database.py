@@ -1,74 +1,848 @@
 import mysql.connector
 from mysql.connector import Error
 import pandas as pd
+import pyarrow as pa
+import datetime
+import threading
+import time
+import re
+from decimal import Decimal
+from contextlib import contextmanager
+from shared_cache import SharedCache
+import metrics
+
+class Transaction:
+    """State of an open transaction or savepoint"""
+    def __init__(self, savepoint=None):
+        self.savepoint = savepoint
+        self.failed = False
+        self.committed = False
+
+class UnitOfWork:
+    """Collect writes and apply them together in a single transaction"""
+    def __init__(self, db):
+        self.db = db
+        self.operations = []
+        self.committed = False
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.operations = []
+        return False
+        
+    def create(self, table_name, data):
+        """Queue an insert"""
+        self.operations.append((self.db.create_record, (table_name, data)))
+        
+    def update(self, table_name, data, condition, params=None):
+        """Queue an update"""
+        self.operations.append((self.db.update_record, (table_name, data, condition, params)))
+        
+    def delete(self, table_name, condition, params=None):
+        """Queue a delete"""
+        self.operations.append((self.db.delete_record, (table_name, condition, params)))
+        
+    def execute(self, query, params=None):
+        """Queue an arbitrary write statement"""
+        self.operations.append((self.db.execute_query, (query, params)))
+        
+    def commit(self):
+        """Apply all queued writes with one commit, rolling back if any fails"""
+        operations, self.operations = self.operations, []
+        with self.db.transaction() as tx:
+            for operation, args in operations:
+                if operation(*args) < 0:
+                    break
+        self.committed = tx.committed
+        return self.committed
+
+class Replica:
+    """A read replica connection with health and lag tracking"""
+    def __init__(self, host, user, password, database, port=3306):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.database = database
+        self.connection = None
+        self.prepared_cursors = {}
+        self.lag = None
+        self.checked_at = 0
+        self.down_until = 0
+        
+    def get_connection(self):
+        """Get the replica connection, reconnecting if needed"""
+        if not self.connection or not self.connection.is_connected():
+            if self.connection is not None:
+                metrics.RECONNECTS.inc(target="replica")
+            try:
+                self.connection = mysql.connector.connect(
+                    host=self.host,
+                    port=self.port,
+                    user=self.user,
+                    password=self.password,
+                    database=self.database,
+                    autocommit=True
+                )
+            except Error:
+                metrics.CONNECTS.inc(target="replica", result="failure")
+                raise
+            metrics.CONNECTS.inc(target="replica", result="success")
+            self.prepared_cursors = {}
+        return self.connection
+        
+    def disconnect(self):
+        """Disconnect from the replica"""
+        self.prepared_cursors = {}
+        if self.connection and self.connection.is_connected():
+            self.connection.close()
+            
+    def mark_down(self, seconds=30):
+        """Stop routing reads to this replica for a while"""
+        self.down_until = time.time() + seconds
+        
+    def check_lag(self):
+        """Get the replication lag in seconds, or None if replication is not running"""
+        cursor = self.get_connection().cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+                lag_column = 'Seconds_Behind_Source'
+            except Error:
+                # MySQL before 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+                lag_column = 'Seconds_Behind_Master'
+            row = cursor.fetchone()
+            return row.get(lag_column) if row else None
+        finally:
+            cursor.close()
+            
+    def is_available(self, max_lag, check_interval):
+        """Check whether the replica is up and close enough to the primary"""
+        now = time.time()
+        if now < self.down_until:
+            return False
+        if now - self.checked_at >= check_interval:
+            try:
+                self.lag = self.check_lag()
+            except Error as e:
+                print(f"Error checking replica {self.host}:{self.port}: {e}")
+                metrics.DB_ERRORS.inc(operation="check_lag")
+                self.mark_down()
+                return False
+            self.checked_at = now
+        return self.lag is not None and self.lag <= max_lag
 
 class Database:
-    def __init__(self, host, user, password, database):
+    def __init__(self, host, user, password, database, replicas=None, max_replica_lag=5,
+                 sticky_seconds=10, lag_check_interval=2, shared_cache_path=None,
+                 interactive_timeout_ms=5000, report_timeout_ms=60000, max_report_queries=2,
+                 report_queue_timeout=10):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
         self.connection = None
+        # Read replicas for SELECTs; writes always go to the primary
+        self.replicas = [Replica(host=replica['host'], port=replica.get('port', 3306),
+                                 user=replica.get('user', user), password=replica.get('password', password),
+                                 database=replica.get('database', database))
+                         for replica in (replicas or [])]
+        self.max_replica_lag = max_replica_lag
+        self.sticky_seconds = sticky_seconds
+        self.lag_check_interval = lag_check_interval
+        self._next_replica = 0
+        # Last write time per session, for read-your-writes stickiness
+        self._session = threading.local()
+        self._last_write = {}
+        # Named statements executed through server-side prepared cursors
+        self.statements = {}
+        self.statement_counts = {}
+        self._prepared_cursors = {}
+        # The primary connection is shared by every session of the app, so
+        # statements on it take turns, and an open transaction keeps it until
+        # it ends so other threads' writes wait instead of joining it
+        self._connection_lock = threading.RLock()
+        # SQL issued through this instance with call counts and timings
+        self.workload = {}
+        self._workload_lock = threading.Lock()
+        # Results cache shared with the other app processes
+        self.shared_cache = SharedCache(shared_cache_path) if shared_cache_path else None
+        # Priority classes: interactive reads share the POS connection with a
+        # short timeout; report reads queue for a few connections of their own
+        self.timeouts = {'interactive': interactive_timeout_ms, 'report': report_timeout_ms}
+        self.report_queue_timeout = report_queue_timeout
+        self._report_slots = threading.BoundedSemaphore(max_report_queries)
+        self._report_connections = []
+        self._report_lock = threading.Lock()
+        # Foreign keys keyed by referenced table, loaded on first use
+        self._fk_graph = None
+        # Cached hot/cold boundary of the orders table
+        self._tier = None
+        self._tier_checked_at = 0
         self.connect()
+        self.register_default_statements()
         
     def connect(self):
         """Connect to MySQL database"""
+        if self.connection is not None:
+            metrics.RECONNECTS.inc(target="primary")
         try:
             self.connection = mysql.connector.connect(
                 host=self.host,
                 user=self.user,
                 password=self.password,
-                database=self.database
+                database=self.database,
+                # Reads outside a transaction must not hold an old snapshot,
+                # otherwise polling never sees rows committed by others
+                autocommit=True
             )
             if self.connection.is_connected():
+                # Prepared statements belong to a connection, so they are
+                # re-prepared lazily on the new one
+                self._prepared_cursors = {}
+                self._set_timeout(self.connection, self.timeouts['interactive'])
+                metrics.CONNECTS.inc(target="primary", result="success")
                 return True
         except Error as e:
             print(f"Error connecting to MySQL: {e}")
-            return False
+            metrics.DB_ERRORS.inc(operation="connect")
+        metrics.CONNECTS.inc(target="primary", result="failure")
+        return False
             
     def disconnect(self):
         """Disconnect from MySQL database"""
+        for cursor in self._prepared_cursors.values():
+            self._close_cursor(cursor)
+        self._prepared_cursors = {}
         if self.connection and self.connection.is_connected():
             self.connection.close()
+        for replica in self.replicas:
+            replica.disconnect()
+        with self._report_lock:
+            for connection in self._report_connections:
+                if connection.is_connected():
+                    connection.close()
+            self._report_connections = []
+            
+    # Read/write routing
+    def set_session(self, session_key):
+        """Set the user session the current thread is working for"""
+        self._session.key = session_key
+        
+    def set_priority(self, priority):
+        """Set the priority class of reads made by the current thread, 'interactive' or 'report'"""
+        self._session.priority = priority
+        
+    def _priority(self, priority=None):
+        """Get the priority class of a read, defaulting to the thread's class"""
+        return priority or getattr(self._session, 'priority', 'interactive')
+        
+    @property
+    def _transactions(self):
+        """Stack of transactions the current thread has open, outermost first"""
+        if not hasattr(self._session, 'transactions'):
+            self._session.transactions = []
+        return self._session.transactions
+        
+    @property
+    def _pending_invalidations(self):
+        """Tables written in the current thread's open transaction whose cached reads go stale on commit"""
+        if not hasattr(self._session, 'pending_invalidations'):
+            self._session.pending_invalidations = set()
+        return self._session.pending_invalidations
+        
+    @_pending_invalidations.setter
+    def _pending_invalidations(self, tables):
+        self._session.pending_invalidations = tables
+        
+    def _note_write(self):
+        """Remember that the current session wrote, so it reads its own writes"""
+        self._last_write[getattr(self._session, 'key', None)] = time.time()
+        
+    def _choose_replica(self):
+        """Pick a healthy replica for a read, or None to read from the primary"""
+        if not self.replicas or self._transactions:
+            return None
+        last_write = self._last_write.get(getattr(self._session, 'key', None), 0)
+        if time.time() - last_write < self.sticky_seconds:
+            return None
+        for offset in range(len(self.replicas)):
+            index = (self._next_replica + offset) % len(self.replicas)
+            if self.replicas[index].is_available(self.max_replica_lag, self.lag_check_interval):
+                self._next_replica = (index + 1) % len(self.replicas)
+                return self.replicas[index]
+        return None
+            
+    def _ensure_connection(self):
+        """Reconnect if needed, unless that would silently drop an open transaction"""
+        if not self.connection or not self.connection.is_connected():
+            if self._transactions:
+                raise Error(msg="Connection lost during transaction")
+            self.connect()
+            
+    def in_transaction(self):
+        """Check whether writes are currently batched in a transaction"""
+        return bool(self._transactions)
+        
+    def _commit(self):
+        """Commit unless an ambient transaction will commit later"""
+        if not self._transactions:
+            self.connection.commit()
+            self._note_write()
+            
+    def _mark_failed(self):
+        """Flag the innermost open transaction for rollback"""
+        if self._transactions:
+            self._transactions[-1].failed = True
+            
+    @contextmanager
+    def transaction(self):
+        """Batch writes into a single commit, nesting via savepoints
+        
+        The primary connection is held for the whole transaction, so other
+        threads wait for it to end rather than writing into it.
+        """
+        with self._connection_lock:
+            self._ensure_connection()
+            cursor = self.connection.cursor()
+            if self._transactions:
+                tx = Transaction(savepoint=f"sp_{len(self._transactions)}")
+                cursor.execute(f"SAVEPOINT {tx.savepoint}")
+            else:
+                tx = Transaction()
+                # End any implicit read snapshot before starting
+                self.connection.commit()
+                self.connection.start_transaction()
+            self._transactions.append(tx)
+            raised = False
+            try:
+                yield tx
+            except Exception:
+                tx.failed = True
+                raised = True
+                raise
+            finally:
+                self._transactions.pop()
+                try:
+                    if tx.savepoint:
+                        if tx.failed:
+                            cursor.execute(f"ROLLBACK TO SAVEPOINT {tx.savepoint}")
+                            # A failed write fails the enclosing transaction too; callers
+                            # that catch the exception from a nested block can carry on
+                            if not raised:
+                                self._mark_failed()
+                        else:
+                            cursor.execute(f"RELEASE SAVEPOINT {tx.savepoint}")
+                    elif tx.failed:
+                        self.connection.rollback()
+                        self._pending_invalidations = set()
+                    else:
+                        self.connection.commit()
+                        self._note_write()
+                        self._invalidate_tables(self._pending_invalidations)
+                        self._pending_invalidations = set()
+                    tx.committed = not tx.failed
+                except Error as e:
+                    print(f"Error ending transaction: {e}")
+                    metrics.DB_ERRORS.inc(operation="transaction")
+                    self._mark_failed()
+                    if not tx.savepoint:
+                        self._pending_invalidations = set()
+                        try:
+                            self.connection.rollback()
+                        except Error:
+                            pass
+                finally:
+                    self._close_cursor(cursor)
+                
+    def unit_of_work(self):
+        """Create a unit of work that applies queued writes in one transaction"""
+        return UnitOfWork(self)
             
     def execute_query(self, query, params=None):
         """Execute a query and return affected rows"""
-        try:
-            if not self.connection or not self.connection.is_connected():
-                self.connect()
+        with self._connection_lock:
+            try:
+                self._ensure_connection()
                 
-            cursor = self.connection.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
+                cursor = self.connection.cursor()
+                started = time.perf_counter()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                self._record_query(query, params, started)
                 
-            self.connection.commit()
-            affected_rows = cursor.rowcount
-            cursor.close()
-            return affected_rows
+                self._commit()
+                self._invalidate(query)
+                affected_rows = cursor.rowcount
+                cursor.close()
+                return affected_rows
+            except Error as e:
+                print(f"Error executing query: {e}")
+                metrics.DB_ERRORS.inc(operation="execute_query")
+                self._mark_failed()
+                return -1
+            
+    def execute_many(self, query, seq_params):
+        """Execute a query for each parameter set in one batch and return affected rows"""
+        with self._connection_lock:
+            try:
+                self._ensure_connection()
+            
+                cursor = self.connection.cursor()
+                seq_params = [self._normalize_params(params) for params in seq_params]
+                started = time.perf_counter()
+                cursor.executemany(query, seq_params)
+                self._record_query(query, seq_params[0] if seq_params else None, started)
+            
+                self._commit()
+                self._invalidate(query)
+                affected_rows = cursor.rowcount
+                cursor.close()
+                return affected_rows
+            except Error as e:
+                print(f"Error executing batch: {e}")
+                metrics.DB_ERRORS.inc(operation="execute_many")
+                self._mark_failed()
+                return -1
+            
+    # Priority classes
+    def _set_timeout(self, connection, timeout_ms):
+        """Make the server abort SELECTs on this connection that run longer than the timeout"""
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout_ms or 0)}")
         except Error as e:
-            print(f"Error executing query: {e}")
-            return -1
+            # Servers without the variable (MariaDB, MySQL before 5.7.8) just run without a timeout
+            print(f"Error setting statement timeout: {e}")
+            metrics.DB_ERRORS.inc(operation="set_timeout")
+        finally:
+            cursor.close()
             
-    def fetch_data(self, query, params=None):
-        """Execute a SELECT query and return results as DataFrame"""
+    def _report_connection(self):
+        """Take an idle report connection, opening one if none is free"""
+        with self._report_lock:
+            while self._report_connections:
+                connection = self._report_connections.pop()
+                if connection.is_connected():
+                    return connection
         try:
-            if not self.connection or not self.connection.is_connected():
-                self.connect()
-                
-            cursor = self.connection.cursor(dictionary=True)
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-                
-            result = cursor.fetchall()
+            connection = mysql.connector.connect(
+                host=self.host,
+                user=self.user,
+                password=self.password,
+                database=self.database,
+                autocommit=True
+            )
+        except Error:
+            metrics.CONNECTS.inc(target="report", result="failure")
+            raise
+        metrics.CONNECTS.inc(target="report", result="success")
+        self._set_timeout(connection, self.timeouts['report'])
+        return connection
+        
+    def _release_report_connection(self, connection):
+        """Return a report connection to the idle list"""
+        with self._report_lock:
+            self._report_connections.append(connection)
+            
+    def _fetch_report(self, query, params=None, primary=False, arrow=False, raise_errors=False):
+        """Run a report read once a report slot frees up, off the POS connection
+        
+        At most max_report_queries report reads run at once; others wait up to
+        report_queue_timeout seconds and then get an empty result, so heavy
+        reads degrade instead of holding the connection order entry needs.
+        With raise_errors set, rejections and failures raise Error instead.
+        """
+        started = time.perf_counter()
+        if not self._report_slots.acquire(timeout=self.report_queue_timeout):
+            print("Report query rejected: too many report queries running")
+            metrics.ADMISSION_REJECTED.inc(priority="report")
+            if raise_errors:
+                raise Error(msg="Report query rejected: too many report queries running")
+            return self._empty_result(arrow)
+        metrics.ADMISSION_WAIT.observe(time.perf_counter() - started, priority="report")
+        try:
+            replica = None if primary else self._choose_replica()
+            if replica is not None:
+                try:
+                    return self._fetch_from(replica.get_connection(), query, params, arrow)
+                except Error as e:
+                    print(f"Error fetching report from replica {replica.host}:{replica.port}: {e}")
+                    self._count_error(e, "fetch_replica", "report")
+                    replica.mark_down()
+            connection = None
+            try:
+                connection = self._report_connection()
+                return self._fetch_from(connection, query, params, arrow, target="report")
+            except Error as e:
+                print(f"Error fetching report: {e}")
+                self._count_error(e, "fetch_report", "report")
+                if raise_errors:
+                    raise
+                return self._empty_result(arrow)
+            finally:
+                if connection is not None:
+                    self._release_report_connection(connection)
+        finally:
+            self._report_slots.release()
+            
+    def fetch_report(self, query, params=None, arrow=False):
+        """Run a report priority read, raising Error when it fails or is rejected
+        
+        For batch jobs, where an empty result standing in for a failed read
+        would go unnoticed.
+        """
+        return self._fetch_report(query, params, arrow=arrow, raise_errors=True)
+        
+    def _count_error(self, error, operation, priority=None):
+        """Count a caught error, and separately when it was a statement timeout"""
+        metrics.DB_ERRORS.inc(operation=operation)
+        # ER_QUERY_TIMEOUT: MAX_EXECUTION_TIME exceeded
+        if getattr(error, 'errno', None) == 3024:
+            metrics.QUERY_TIMEOUTS.inc(priority=self._priority(priority))
+            
+    def _empty_result(self, arrow=False):
+        """Get the empty result returned when a read fails"""
+        return pa.table({}) if arrow else pd.DataFrame()
+        
+    def _cursor_to_arrow(self, cursor, batch_size=10000):
+        """Build a pyarrow Table straight from cursor batches, without a DataFrame"""
+        names = list(cursor.column_names)
+        tables = []
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            tables.append(pa.table([pa.array(column) for column in zip(*rows)], names=names))
+        if not tables:
+            return pa.table({name: pa.array([], type=pa.null()) for name in names})
+        # Batches can infer different types (all-NULL columns, decimal precision), so promote
+        return pa.concat_tables(tables, promote_options="permissive")
+        
+    def _fetch_from(self, connection, query, params=None, arrow=False, target=None):
+        """Run a SELECT query on the given connection and return results as DataFrame or Arrow table"""
+        cursor = connection.cursor(dictionary=not arrow)
+        target = target or ("primary" if connection is self.connection else "replica")
+        started = time.perf_counter()
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+            
+        if arrow:
+            result = self._cursor_to_arrow(cursor)
             cursor.close()
-            return pd.DataFrame(result) if result else pd.DataFrame()
+            self._record_query(query, params, started, target)
+            return self._count_rows(query, result)
+        result = cursor.fetchall()
+        cursor.close()
+        self._record_query(query, params, started, target)
+        return self._count_rows(query, pd.DataFrame(result) if result else pd.DataFrame())
+        
+    def fetch_data(self, query, params=None, primary=False, arrow=False, cached=False, priority=None):
+        """Execute a SELECT query and return results as DataFrame
+        
+        Reads go to a read replica when one is available, unless primary is set.
+        With arrow set the result is a pyarrow Table built from the cursor batches.
+        With cached set the result is served from the shared cache when possible.
+        Report priority reads (see set_priority) are queued and run off the POS connection.
+        """
+        if cached and self.shared_cache is not None:
+            return self._read_through(query, params, arrow,
+                                      lambda: self.fetch_data(query, params, True, arrow, priority=priority))
+        if self._priority(priority) == 'report' and not self._transactions:
+            return self._fetch_report(query, params, primary, arrow)
+        replica = None if primary else self._choose_replica()
+        if replica is not None:
+            try:
+                return self._fetch_from(replica.get_connection(), query, params, arrow)
+            except Error as e:
+                print(f"Error fetching data from replica {replica.host}:{replica.port}: {e}")
+                self._count_error(e, "fetch_replica")
+                replica.mark_down()
+        try:
+            with self._connection_lock:
+                self._ensure_connection()
+                return self._fetch_from(self.connection, query, params, arrow)
         except Error as e:
             print(f"Error fetching data: {e}")
-            return pd.DataFrame()
+            self._count_error(e, "fetch_data")
+            self._mark_failed()
+            return self._empty_result(arrow)
+    
+    # Prepared statement registry
+    def register_default_statements(self):
+        """Register the hot statements used across the app"""
+        self.register_statement("item_price", "SELECT item_price FROM item WHERE item_id = %s")
+        self.register_statement("item_list", "SELECT item_id, item_name, item_price, item_size FROM item")
+        # Run once per journaled write
+        self.register_statement("claim_write",
+                                "INSERT IGNORE INTO applied_writes (idempotency_key, kind, applied_at) VALUES (%s, %s, %s)")
+        self.register_statement("store_write_result", "UPDATE applied_writes SET result = %s WHERE idempotency_key = %s")
+        
+    def register_statement(self, name, query):
+        """Register a named parameterized statement"""
+        if self.statements.get(name) == query:
+            return
+        self.statements[name] = query
+        self.statement_counts.setdefault(name, 0)
+        # Drop any cursor prepared for a previous version of the statement
+        for cursors in [self._prepared_cursors] + [replica.prepared_cursors for replica in self.replicas]:
+            cursor = cursors.pop(name, None)
+            if cursor is not None:
+                self._close_cursor(cursor)
+            
+    def _close_cursor(self, cursor):
+        """Close a cursor, ignoring errors from a dead connection"""
+        try:
+            cursor.close()
+        except Error:
+            pass
+            
+    def _plain_value(self, value):
+        """Convert a numpy/pandas scalar to a plain Python value"""
+        if value is None or (not isinstance(value, (str, bytes)) and pd.isna(value)):
+            return None
+        if isinstance(value, pd.Timestamp):
+            return value.to_pydatetime()
+        if hasattr(value, 'item'):
+            return value.item()
+        return value
+        
+    def _normalize_params(self, params):
+        """Convert numpy/pandas scalars to plain Python values for the binary protocol"""
+        if not params:
+            return ()
+        return tuple(self._plain_value(value) for value in params)
+        
+    def _run_statement(self, name, params=None):
+        """Execute a registered statement on its prepared cursor and return the cursor"""
+        params = self._normalize_params(params)
+        for attempt in range(2):
+            self._ensure_connection()
+            cursor = self._prepared_cursors.get(name)
+            metrics.cache_lookup("prepared_statement", cursor is not None)
+            if cursor is None:
+                cursor = self.connection.cursor(prepared=True)
+                self._prepared_cursors[name] = cursor
+            try:
+                started = time.perf_counter()
+                cursor.execute(self.statements[name], params)
+                self.statement_counts[name] += 1
+                self._record_query(self.statements[name], params, started)
+                return cursor
+            except Error:
+                metrics.DB_ERRORS.inc(operation="prepared_statement")
+                # Re-prepare on a fresh connection if the old one went away
+                self._prepared_cursors.pop(name, None)
+                self._close_cursor(cursor)
+                if attempt == 1 or self.connection.is_connected():
+                    raise
+                
+    def execute_statement(self, name, params=None):
+        """Execute a registered write statement and return affected rows"""
+        try:
+            with self._connection_lock:
+                cursor = self._run_statement(name, params)
+                self._commit()
+            self._invalidate(self.statements[name])
+            return cursor.rowcount
+        except Error as e:
+            print(f"Error executing statement {name}: {e}")
+            metrics.DB_ERRORS.inc(operation="execute_statement")
+            self._mark_failed()
+            return -1
+            
+    def _fetch_statement_from_replica(self, replica, name, params=None):
+        """Execute a registered SELECT statement on a replica's prepared cursor"""
+        cursor = replica.prepared_cursors.get(name)
+        metrics.cache_lookup("prepared_statement", cursor is not None)
+        if cursor is None:
+            cursor = replica.get_connection().cursor(prepared=True)
+            replica.prepared_cursors[name] = cursor
+        params = self._normalize_params(params)
+        try:
+            started = time.perf_counter()
+            cursor.execute(self.statements[name], params)
+        except Error:
+            replica.prepared_cursors.pop(name, None)
+            self._close_cursor(cursor)
+            raise
+        self.statement_counts[name] += 1
+        self._record_query(self.statements[name], params, started, "replica")
+        return cursor
+        
+    def _statement_result(self, cursor, arrow=False):
+        """Read the rows of an executed prepared cursor as DataFrame or Arrow table"""
+        if arrow:
+            return self._cursor_to_arrow(cursor)
+        result = cursor.fetchall()
+        return pd.DataFrame(result, columns=cursor.column_names) if result else pd.DataFrame()
+        
+    def fetch_statement(self, name, params=None, primary=False, arrow=False, cached=False, priority=None):
+        """Execute a registered SELECT statement and return results as DataFrame
+        
+        Like fetch_data, reads go to a read replica when one is available,
+        arrow returns a pyarrow Table instead, cached uses the shared cache and
+        report priority reads are queued and run unprepared off the POS connection.
+        """
+        if cached and self.shared_cache is not None:
+            return self._read_through(self.statements[name], params, arrow,
+                                      lambda: self.fetch_statement(name, params, True, arrow, priority=priority))
+        if self._priority(priority) == 'report' and not self._transactions:
+            self.statement_counts[name] += 1
+            return self._fetch_report(self.statements[name], self._normalize_params(params), primary, arrow)
+        replica = None if primary else self._choose_replica()
+        if replica is not None:
+            try:
+                cursor = self._fetch_statement_from_replica(replica, name, params)
+                return self._count_rows(self.statements[name], self._statement_result(cursor, arrow))
+            except Error as e:
+                print(f"Error fetching statement {name} from replica {replica.host}:{replica.port}: {e}")
+                self._count_error(e, "fetch_replica")
+                replica.mark_down()
+        try:
+            with self._connection_lock:
+                cursor = self._run_statement(name, params)
+                result = self._statement_result(cursor, arrow)
+            return self._count_rows(self.statements[name], result)
+        except Error as e:
+            print(f"Error fetching statement {name}: {e}")
+            self._count_error(e, "fetch_statement")
+            self._mark_failed()
+            return self._empty_result(arrow)
+            
+    def get_statement_stats(self):
+        """Get per-statement execution counts"""
+        stats = [{'statement': name, 'executions': count, 'prepared': name in self._prepared_cursors}
+                 for name, count in self.statement_counts.items()]
+        df = pd.DataFrame(stats)
+        if not df.empty:
+            df = df.sort_values('executions', ascending=False).reset_index(drop=True)
+        return df
+            
+    # Shared cache
+    READ_TABLES = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+    WRITE_TABLE = re.compile(r"^\s*(?:INSERT(?:\s+IGNORE)?\s+INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+`?(\w+)`?",
+                             re.IGNORECASE)
+    
+    def _read_through(self, query, params, arrow, load):
+        """Serve a read from the shared cache, loading and storing it on a miss
+        
+        Misses load from the primary, so a result cached under the current
+        table versions never comes from a lagging replica.
+        """
+        key = self.shared_cache.key(query, self._normalize_params(params), self.READ_TABLES.findall(query),
+                                    "arrow" if arrow else "pandas")
+        result = self.shared_cache.get(key)
+        metrics.cache_lookup("shared", result is not None)
+        if result is not None:
+            return result
+        result = load()
+        # Failed reads come back without columns and must not be cached
+        if result.num_columns if arrow else len(result.columns):
+            self.shared_cache.put(key, result)
+        return result
+        
+    def _invalidate(self, query):
+        """Make cached reads of the table a write statement changed stale"""
+        match = self.WRITE_TABLE.match(query)
+        if match is None or self.shared_cache is None:
+            return
+        if self._transactions:
+            # Readers must not re-cache the old rows before the commit
+            self._pending_invalidations.add(match.group(1))
+        else:
+            self._invalidate_tables([match.group(1)])
+            
+    def _invalidate_tables(self, tables):
+        """Bump the shared cache version of the tables"""
+        if tables and self.shared_cache is not None:
+            self.shared_cache.bump(tables)
+            
+    # Workload capture
+    MAX_WORKLOAD_STATEMENTS = 500
+    # IN lists, key tuple lists and CASE arms that grow with the batch size
+    IN_TUPLES = re.compile(r"IN \(\((%s(?:, %s)*)\)(?:, \(\1\))*\)")
+    IN_LIST = re.compile(r"IN \(%s(?:, %s)*\)")
+    CASE_ARMS = re.compile(r"(WHEN .+? THEN %s)(?: \1)*")
+    
+    def _statement_key(self, sql):
+        """Get the workload key of a statement, the same for every batch size"""
+        sql = self.IN_TUPLES.sub(r"IN ((\1), ...)", sql)
+        sql = self.IN_LIST.sub("IN (%s, ...)", sql)
+        return self.CASE_ARMS.sub(r"\1 ...", sql)
+        
+    def _record_query(self, query, params, started, target="primary"):
+        """Add one execution of a statement to the captured workload and latency metrics
+        
+        Statements differing only in batch size share an entry. Past
+        MAX_WORKLOAD_STATEMENTS entries, the ones with the least total time
+        are dropped.
+        """
+        elapsed = time.perf_counter() - started
+        metrics.QUERY_DURATION.observe(elapsed, statement=metrics.statement_label(query), target=target)
+        sql = " ".join(query.split())
+        # Introspection and transaction control are not part of the workload
+        if sql.split(" ", 1)[0].upper() in ("EXPLAIN", "SHOW", "DESCRIBE", "SAVEPOINT", "RELEASE", "ROLLBACK"):
+            return
+        key = self._statement_key(sql)
+        with self._workload_lock:
+            if key not in self.workload and len(self.workload) >= self.MAX_WORKLOAD_STATEMENTS:
+                # Evict a tenth at a time so a full workload is not sorted on every new statement
+                by_time = sorted(self.workload, key=lambda k: self.workload[k]['total_time'])
+                for old in by_time[:max(1, self.MAX_WORKLOAD_STATEMENTS // 10)]:
+                    del self.workload[old]
+            entry = self.workload.setdefault(key, {'calls': 0, 'total_time': 0.0, 'query': sql, 'params': None})
+            entry['calls'] += 1
+            entry['total_time'] += elapsed
+            # Keep the latest statement and parameters so it can be explained later
+            entry['query'] = sql
+            entry['params'] = params
+            
+    def _count_rows(self, query, result):
+        """Add the rows of a read result to the rows fetched metric and pass it through"""
+        rows = result.num_rows if isinstance(result, pa.Table) else len(result)
+        metrics.ROWS_FETCHED.inc(rows, statement=metrics.statement_label(query))
+        return result
+        
+    def get_workload(self):
+        """Get captured statements ordered by total time spent"""
+        with self._workload_lock:
+            rows = [{'query': entry['query'], 'calls': entry['calls'],
+                     'total_ms': round(entry['total_time'] * 1000, 2),
+                     'avg_ms': round(entry['total_time'] * 1000 / entry['calls'], 3),
+                     'params': entry['params']}
+                    for entry in self.workload.values()]
+        df = pd.DataFrame(rows)
+        if not df.empty:
+            df = df.sort_values('total_ms', ascending=False).reset_index(drop=True)
+        return df
+        
+    def reset_workload(self):
+        """Forget the captured workload"""
+        with self._workload_lock:
+            self.workload = {}
+            
+    def explain_query(self, query, params=None):
+        """Get the optimizer plan for a statement"""
+        return self.fetch_data(f"EXPLAIN {query}", params, primary=True)
+        
+    def get_indexes(self, table_name):
+        """Get the indexes of a table as lists of columns keyed by index name"""
+        indexes = self.fetch_data(f"SHOW INDEX FROM {table_name}", primary=True)
+        if indexes.empty:
+            return {}
+        indexes = indexes.sort_values(['Key_name', 'Seq_in_index'])
+        return indexes.groupby('Key_name', sort=False)['Column_name'].apply(list).to_dict()
             
     def get_tables(self):
         """Get list of all tables in the database"""
@@ -91,67 +865,421 @@ class Database:
             return pk_columns
         return []
     
+    def _after_write(self, table_name, affected_rows):
+        """Keep derived data in step with a write and pass its result through"""
+        if affected_rows > 0 and table_name == 'inventory':
+            # Generic edits can change quantities or reorder points of any row
+            self.refresh_low_stock_alerts()
+        return affected_rows
+    
     # CRUD operations for each table
     def create_record(self, table_name, data):
         """Insert a new record into the specified table"""
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['%s'] * len(data))
         query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        return self.execute_query(query, list(data.values()))
+        return self._after_write(table_name, self.execute_query(query, list(data.values())))
         
-    def read_records(self, table_name, limit=100, where_clause=None, params=None):
+    def read_records(self, table_name, limit=100, where_clause=None, params=None, arrow=False):
         """Read records from the specified table"""
         query = f"SELECT * FROM {table_name}"
         if where_clause:
             query += f" WHERE {where_clause}"
         query += f" LIMIT {limit}"
-        return self.fetch_data(query, params)
+        return self.fetch_data(query, params, arrow=arrow)
+        
+    def _values_equal(self, original, submitted):
+        """Compare a stored value with a submitted form value"""
+        original = self._plain_value(original)
+        submitted = self._plain_value(submitted)
+        if original is None or submitted is None:
+            return original is None and (submitted is None or submitted == '')
+        if isinstance(original, (int, float, Decimal)) and isinstance(submitted, (int, float, Decimal)):
+            return abs(float(original) - float(submitted)) < 1e-9
+        # Date inputs only carry the date part of DATETIME columns
+        if isinstance(original, datetime.datetime) and not isinstance(submitted, datetime.datetime) \
+                and isinstance(submitted, datetime.date):
+            return original.date() == submitted
+        # TIME columns are returned as timedelta
+        if isinstance(original, datetime.timedelta) and isinstance(submitted, datetime.time):
+            return (datetime.datetime.min + original).time() == submitted
+        return str(original) == str(submitted)
+        
+    def get_changed_fields(self, original, data):
+        """Get the fields in data whose values differ from the original row"""
+        return {key: value for key, value in data.items() if not self._values_equal(original.get(key), value)}
         
-    def update_record(self, table_name, data, condition):
-        """Update a record in the specified table"""
+    def update_record(self, table_name, data, condition, params=None, original=None):
+        """Update a record in the specified table
+        
+        When the originally loaded row is given, only changed columns are
+        written and the update only applies if those columns still hold their
+        original values, compared with <=> so NULLs match. Returns 0 when the
+        row was changed concurrently.
+        """
+        params = list(params or [])
         set_clause = ', '.join([f"{key} = %s" for key in data.keys()])
+        if original is not None:
+            data = self.get_changed_fields(original, data)
+            if not data:
+                return 0
+            set_clause = ', '.join([f"{key} = %s" for key in data.keys()])
+            checks = ' AND '.join([f"{key} <=> %s" for key in data.keys()])
+            condition = f"({condition}) AND {checks}"
+            params.extend(self._plain_value(original.get(key)) for key in data.keys())
         query = f"UPDATE {table_name} SET {set_clause} WHERE {condition}"
-        return self.execute_query(query, list(data.values()))
+        return self._after_write(table_name, self.execute_query(query, list(data.values()) + params))
+        
+    def _key_condition(self, primary_keys, keys):
+        """Build a WHERE condition matching a list of primary key tuples"""
+        if len(primary_keys) == 1:
+            condition = f"{primary_keys[0]} IN ({', '.join(['%s'] * len(keys))})"
+            params = [key[0] for key in keys]
+        else:
+            row = f"({', '.join(['%s'] * len(primary_keys))})"
+            condition = f"({', '.join(primary_keys)}) IN ({', '.join([row] * len(keys))})"
+            params = [value for key in keys for value in key]
+        return condition, self._normalize_params(params)
+        
+    def bulk_update_records(self, table_name, primary_keys, changes, originals, batch_size=500):
+        """Apply edits to many rows in one transaction using CASE-based UPDATE statements
+        
+        changes maps each primary key tuple to the changed columns of that row,
+        originals maps it to the row as it was loaded. Rows whose changed columns
+        no longer hold their loaded values are skipped and reported as conflicts.
+        Returns a DataFrame with the primary key columns and a status per row.
+        """
+        keys = list(changes.keys())
+        status = {key: 'failed' for key in keys}
+        with self.transaction() as tx:
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                
+                # Lock the rows and compare them with what the user loaded
+                condition, params = self._key_condition(primary_keys, batch)
+                current = self.fetch_data(f"SELECT * FROM {table_name} WHERE {condition} FOR UPDATE", params)
+                current_rows = {tuple(self._plain_value(row[pk]) for pk in primary_keys): row
+                                for row in current.to_dict('records')}
+                
+                apply_keys = []
+                for key in batch:
+                    row = current_rows.get(tuple(self._plain_value(value) for value in key))
+                    if row is None or any(not self._values_equal(originals[key].get(column), row.get(column))
+                                          for column in changes[key]):
+                        status[key] = 'conflict'
+                    else:
+                        apply_keys.append(key)
+                if not apply_keys:
+                    continue
+                
+                # One CASE expression per changed column covers every row in the batch
+                columns = sorted({column for key in apply_keys for column in changes[key]})
+                match = ' AND '.join([f"{pk} = %s" for pk in primary_keys])
+                set_parts = []
+                set_params = []
+                for column in columns:
+                    cases = []
+                    for key in apply_keys:
+                        if column in changes[key]:
+                            cases.append(f"WHEN {match} THEN %s")
+                            set_params.extend(key)
+                            set_params.append(changes[key][column])
+                    set_parts.append(f"{column} = CASE {' '.join(cases)} ELSE {column} END")
+                condition, params = self._key_condition(primary_keys, apply_keys)
+                query = f"UPDATE {table_name} SET {', '.join(set_parts)} WHERE {condition}"
+                if self.execute_query(query, list(self._normalize_params(set_params)) + list(params)) < 0:
+                    break
+                for key in apply_keys:
+                    status[key] = 'updated'
+        if not tx.committed:
+            status = {key: ('failed' if value == 'updated' else value) for key, value in status.items()}
+        self._after_write(table_name, sum(value == 'updated' for value in status.values()))
+        result = pd.DataFrame([list(key) for key in keys], columns=primary_keys)
+        result['status'] = [status[key] for key in keys]
+        return result
         
     def delete_record(self, table_name, condition, params=None):
         """Delete a record from the specified table"""
         query = f"DELETE FROM {table_name} WHERE {condition}"
-        return self.execute_query(query, params)
+        return self._after_write(table_name, self.execute_query(query, params))
+        
+    def delete_records(self, table_name, primary_keys, keys, batch_size=500):
+        """Delete rows by primary key tuples with one DELETE per batch in a single transaction
+        
+        Returns the number of rows deleted, or -1 on failure.
+        """
+        deleted = 0
+        with self.transaction() as tx:
+            for start in range(0, len(keys), batch_size):
+                condition, params = self._key_condition(primary_keys, keys[start:start + batch_size])
+                result = self.execute_query(f"DELETE FROM {table_name} WHERE {condition}", list(params))
+                if result < 0:
+                    break
+                deleted += result
+        return self._after_write(table_name, deleted if tx.committed else -1)
+        
+    # Foreign key dependency graph
+    # Tables holding rows moved out of another table, without its foreign keys
+    MIRROR_TABLES = {'orders': 'orders_archive'}
+    
+    def get_foreign_keys(self, refresh=False):
+        """Get the foreign keys of the schema keyed by the table they reference
+        
+        Read once from information_schema; each entry has the referencing
+        table, constraint name, column pairs and delete rule. Mirror tables
+        get the keys of the table they mirror.
+        """
+        if self._fk_graph is None or refresh:
+            rows = self.fetch_data("""
+                SELECT k.CONSTRAINT_NAME as constraint_name, k.TABLE_NAME as table_name,
+                       k.COLUMN_NAME as column_name, k.REFERENCED_TABLE_NAME as referenced_table,
+                       k.REFERENCED_COLUMN_NAME as referenced_column, r.DELETE_RULE as delete_rule
+                FROM information_schema.KEY_COLUMN_USAGE k
+                JOIN information_schema.REFERENTIAL_CONSTRAINTS r
+                  ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+                 AND r.TABLE_NAME = k.TABLE_NAME
+                WHERE k.TABLE_SCHEMA = DATABASE() AND k.REFERENCED_TABLE_NAME IS NOT NULL
+                ORDER BY k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION
+                """, primary=True)
+            graph = {}
+            if not rows.empty:
+                for (table, constraint), fk in rows.groupby(['table_name', 'constraint_name'], sort=False):
+                    graph.setdefault(fk['referenced_table'].iloc[0], []).append({
+                        'table': table,
+                        'constraint': constraint,
+                        'columns': fk['column_name'].tolist(),
+                        'referenced_columns': fk['referenced_column'].tolist(),
+                        'delete_rule': fk['delete_rule'].iloc[0]
+                    })
+            for fks in graph.values():
+                present = {(fk['table'], tuple(fk['columns'])) for fk in fks}
+                for fk in list(fks):
+                    mirror = self.MIRROR_TABLES.get(fk['table'])
+                    if mirror and (mirror, tuple(fk['columns'])) not in present:
+                        # Nothing cascades into the mirror, so its rows would be orphaned
+                        fks.append(dict(fk, table=mirror, constraint=f"{fk['constraint']} ({mirror})",
+                                        delete_rule='RESTRICT'))
+            self._fk_graph = graph
+        return self._fk_graph
+        
+    def get_delete_impact(self, table_name, primary_keys, keys, max_depth=5):
+        """Count the rows that reference the given rows, in one UNION ALL query
+        
+        Rows reached through ON DELETE CASCADE keys are followed further down
+        the graph; SET NULL rows stay, so their own references do not matter.
+        A row in a RESTRICT or NO ACTION key blocks the delete. Returns a
+        DataFrame with one row per referencing path.
+        """
+        graph = self.get_foreign_keys()
+        condition, params = self._key_condition([f"t0.{pk}" for pk in primary_keys], keys)
+        parts = []
+        
+        def walk(table, joins, depth, path, visited):
+            for fk in graph.get(table, []):
+                alias = f"t{depth + 1}"
+                on = ' AND '.join(f"{alias}.{column} = t{depth}.{referenced}"
+                                  for column, referenced in zip(fk['columns'], fk['referenced_columns']))
+                chain = [f"JOIN {fk['table']} {alias} ON {on}"] + joins
+                route = path + [f"{fk['table']}.{', '.join(fk['columns'])}"]
+                parts.append((f"SELECT %s as referencing_table, %s as via, %s as delete_rule, COUNT(*) as referencing_rows "
+                              f"FROM {table_name} t0 {' '.join(reversed(chain))} WHERE {condition}",
+                              [fk['table'], ' -> '.join(route), fk['delete_rule']]))
+                if fk['delete_rule'] == 'CASCADE' and depth + 1 < max_depth and fk['table'] not in visited:
+                    walk(fk['table'], chain, depth + 1, route, visited | {fk['table']})
+        
+        walk(table_name, [], 0, [table_name], {table_name})
+        if not parts:
+            return pd.DataFrame(columns=['referencing_table', 'via', 'delete_rule', 'referencing_rows', 'blocks'])
+        impact = self.fetch_data(" UNION ALL ".join(query for query, _ in parts),
+                                 [value for _, labels in parts for value in labels + list(params)], primary=True)
+        if impact.empty:
+            return impact
+        impact['referencing_rows'] = impact['referencing_rows'].astype(int)
+        impact['blocks'] = ~impact['delete_rule'].isin(['CASCADE', 'SET NULL']) & (impact['referencing_rows'] > 0)
+        return impact
+        
+    def get_record_by_pk(self, table_name, pk, value):
+        """Get a single record by its primary key"""
+        name = f"{table_name}_by_{pk}"
+        self.register_statement(name, f"SELECT * FROM {table_name} WHERE {pk} = %s")
+        return self.fetch_statement(name, [value])
         
     def search_records(self, table_name, search_column, search_term):
         """Search for records in the specified table"""
         query = f"SELECT * FROM {table_name} WHERE {search_column} LIKE %s LIMIT 100"
-        return self.fetch_data(query, [f"%{search_term}%"])
+        # A leading wildcard scans the whole table
+        return self.fetch_data(query, [f"%{search_term}%"], priority="report")
     
     # Table-specific methods for complex operations
     
     # Order operations
-    def get_orders_with_details(self):
-        """Get orders with customer and item details"""
-        query = """
-        SELECT o.*, c.cust_firstname, c.cust_lastname, i.item_name, 
-               a.delivery_address1, a.delivery_city, a.delivery_zipcode
-        FROM orders o
-        JOIN customers c ON o.cust_id = c.cust_id
-        JOIN item i ON o.item_id = i.item_id
-        JOIN address a ON o.add_id = a.add_id
-        ORDER BY o.created_at DESC
-        LIMIT 100
+    def get_item_price(self, item_id):
+        """Get the current price of an item"""
+        result = self.fetch_statement("item_price", [item_id])
+        if not result.empty:
+            return result.iloc[0]['item_price']
+        return None
+    
+    # Columns available from the order details query and the join each one needs
+    ORDER_DETAIL_COLUMNS = {
+        'row_id': ('o', None), 'order_id': ('o', None), 'created_at': ('o', None),
+        'item_id': ('o', None), 'item_price': ('o', None), 'quantity': ('o', None),
+        'cust_id': ('o', None), 'delivery': ('o', None), 'add_id': ('o', None),
+        'cust_firstname': ('c', "JOIN customers c ON o.cust_id = c.cust_id"),
+        'cust_lastname': ('c', "JOIN customers c ON o.cust_id = c.cust_id"),
+        'item_name': ('i', "JOIN item i ON o.item_id = i.item_id"),
+        'delivery_address1': ('a', "JOIN address a ON o.add_id = a.add_id"),
+        'delivery_city': ('a', "JOIN address a ON o.add_id = a.add_id"),
+        'delivery_zipcode': ('a', "JOIN address a ON o.add_id = a.add_id")
+    }
+    
+    def get_orders_with_details(self, limit=100, start_date=None, end_date=None, cust_id=None,
+                                item_id=None, delivery=None, columns=None, since_row_id=None, arrow=False):
+        """Get orders with customer and item details, newest first
+        
+        All filters, the column projection and the limit are applied in SQL.
+        start_date is inclusive and end_date exclusive. Only the joins needed
+        for the requested columns are made. With since_row_id only orders
+        added after that row are returned, oldest first, so callers can page
+        forward from the last row_id they got. Newest first reads go to the
+        hot table and read the archive only for the rows still missing.
         """
-        return self.fetch_data(query)
+        columns = list(columns) if columns else list(self.ORDER_DETAIL_COLUMNS.keys())
+        unknown = [column for column in columns if column not in self.ORDER_DETAIL_COLUMNS]
+        if unknown:
+            print(f"Unknown order detail columns: {', '.join(unknown)}")
+            return pd.DataFrame()
+        
+        filters = []
+        params = []
+        for condition, value in [("o.row_id > %s", since_row_id),
+                                 ("o.created_at >= %s", start_date),
+                                 ("o.created_at < %s", end_date),
+                                 ("o.cust_id = %s", cust_id),
+                                 ("o.item_id = %s", item_id),
+                                 ("o.delivery = %s", delivery)]:
+            if value is not None:
+                filters.append(condition)
+                params.append(value)
+        
+        source = self.orders_source(start_date, since_row_id, alias='o')
+        if since_row_id is not None:
+            return self._fetch_order_details(columns, filters, params, source, "o.row_id", limit, arrow)
+        # Every archived order is older than every hot one, so the hot table
+        # alone answers a newest first read unless it runs out of rows
+        orders = self._fetch_order_details(columns, filters, params, "orders o", "o.created_at DESC", limit, arrow)
+        found = orders.num_rows if arrow else len(orders)
+        if source == "orders o" or found >= limit:
+            return orders
+        archived = self._fetch_order_details(columns, filters, params, "orders_archive o",
+                                             "o.created_at DESC", limit - found, arrow)
+        if arrow:
+            tables = [table for table in (orders, archived) if table.num_columns]
+            return pa.concat_tables(tables, promote_options="permissive") if tables else orders
+        return pd.concat([orders, archived], ignore_index=True)
+        
+    def _fetch_order_details(self, columns, filters, params, source, order_by, limit, arrow=False):
+        """Run one order details read against the given source as a prepared statement"""
+        select = ', '.join([f"{self.ORDER_DETAIL_COLUMNS[column][0]}.{column}" for column in columns])
+        joins = []
+        for column in columns:
+            join = self.ORDER_DETAIL_COLUMNS[column][1]
+            if join and join not in joins:
+                joins.append(join)
+        
+        query = f"SELECT {select} FROM {source}"
+        if joins:
+            query += " " + " ".join(joins)
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+        query += f" ORDER BY {order_by} LIMIT %s"
+        
+        # Each combination of columns, filters and source is prepared once
+        tier = {"orders o": "hot", "orders_archive o": "archive"}.get(source, "all")
+        name = f"orders_with_details({','.join(columns)}|{','.join(filters)}|{order_by}|{tier})"
+        self.register_statement(name, query)
+        return self.fetch_statement(name, params + [int(limit)], arrow=arrow)
     
+    def get_orders_since(self, last_row_id, limit=1000):
+        """Get up to limit orders with details added after the given row_id, oldest first"""
+        return self.get_orders_with_details(limit=limit, since_row_id=last_row_id)
+    
+    # Order tiers
+    TIER_CACHE_SECONDS = 30
+    ARCHIVE_UNION = "(SELECT * FROM orders UNION ALL SELECT * FROM orders_archive)"
+    
+    def get_order_tier(self, refresh=False):
+        """Get the archive boundary date and the highest row_id below it, or None before any archiving
+        
+        Both are published before any row moves, so every row at or below
+        that row_id may already be in the archive.
+        """
+        expired = refresh or time.time() - self._tier_checked_at > self.TIER_CACHE_SECONDS
+        metrics.cache_lookup("order_tier", not expired)
+        if expired:
+            state = self.fetch_data("SELECT boundary, last_row_id FROM tier_state WHERE name = 'orders'", primary=True)
+            self._tier = None
+            if not state.empty:
+                self._tier = (pd.Timestamp(state.iloc[0]['boundary']), int(state.iloc[0]['last_row_id']))
+            self._tier_checked_at = time.time()
+        return self._tier
+        
+    def orders_source(self, start_date=None, since_row_id=None, alias=None):
+        """Get the FROM clause for orders, spanning the archive only when needed
+        
+        Reads bounded to rows newer than the archive boundary, by date or
+        row_id, touch only the hot orders table.
+        """
+        tier = self.get_order_tier()
+        hot_only = (tier is None
+                    or (start_date is not None and pd.Timestamp(start_date) >= tier[0])
+                    or (since_row_id is not None and since_row_id >= tier[1]))
+        if hot_only:
+            return f"orders {alias}" if alias else "orders"
+        return f"{self.ARCHIVE_UNION} {alias or 'orders'}"
+        
+    def get_last_order(self):
+        """Get the row_id and order_id of the newest order in either tier"""
+        for table in ("orders", "orders_archive"):
+            last = self.fetch_data(f"SELECT row_id, order_id FROM {table} ORDER BY row_id DESC LIMIT 1", primary=True)
+            if not last.empty:
+                return int(last.iloc[0]['row_id']), last.iloc[0]['order_id']
+        return None, None
+        
+    def lock_numbering(self, name):
+        """Lock the named numbering row until the current transaction ends
+        
+        Writers that number new rows from the last one take this first, so
+        concurrent flushers queue up instead of picking the same id. Returns
+        False if the lock could not be taken.
+        """
+        query = "SELECT last_row_id FROM analytics_state WHERE name = %s FOR UPDATE"
+        if not self.fetch_data(query, [name]).empty:
+            return True
+        # Only the first writer ever creates the row
+        self.execute_query("INSERT IGNORE INTO analytics_state (name, last_row_id, updated_at) VALUES (%s, 0, %s)",
+                           [name, datetime.datetime.now()])
+        return not self.fetch_data(query, [name]).empty
+        
+    def count_orders(self):
+        """Count order rows across both tiers"""
+        count = self.fetch_data("SELECT (SELECT COUNT(*) FROM orders) + (SELECT COUNT(*) FROM orders_archive) as count")
+        return int(count.iloc[0, 0]) if not count.empty else 0
+        
     # Inventory operations
     def get_inventory_with_items(self):
         """Get inventory with item details"""
         query = """
-        SELECT i.inv_id, i.quantity, t.item_id, t.item_name, t.item_cat, t.item_size, t.item_price
+        SELECT i.inv_id, i.quantity, i.reorder_point, i.lead_time_days, 
+               t.item_id, t.item_name, t.item_cat, t.item_size, t.item_price
         FROM inventory i
         JOIN item t ON i.item_id = t.item_id
         """
-        return self.fetch_data(query)
+        self.register_statement("inventory_with_items", query)
+        return self.fetch_statement("inventory_with_items")
     
     # Staff operations
-    def get_staff_schedule(self, staff_id=None):
+    def get_staff_schedule(self, staff_id=None, arrow=False):
         """Get staff schedule with shift details"""
         query = """
         SELECT r.row_id, r.rota_id, r.date, s.staff_id, 
@@ -161,12 +1289,16 @@ class Database:
         JOIN staff s ON r.staff_id = s.staff_id
         JOIN shift sh ON r.shift_id = sh.shift_id
         """
+        name = "staff_schedule"
         params = None
         if staff_id:
             query += " WHERE s.staff_id = %s"
+            name = "staff_schedule_by_staff"
             params = [staff_id]
         query += " ORDER BY r.date DESC"
-        return self.fetch_data(query, params)
+        self.register_statement(name, query)
+        # Unbounded without a staff filter, so it runs as a report read
+        return self.fetch_statement(name, params, arrow=arrow, priority=None if staff_id else "report")
     
     # Recipe operations
     def get_recipe_with_ingredients(self, recipe_id=None):
@@ -179,8 +1311,169 @@ class Database:
         JOIN ingredient ing ON r.ing_id = ing.ing_id
         JOIN item i ON r.recipe_id = i.sku
         """
+        name = "recipe_with_ingredients"
         params = None
         if recipe_id:
             query += " WHERE r.recipe_id = %s"
+            name = "recipe_with_ingredients_by_recipe"
             params = [recipe_id]
-        return self.fetch_data(query, params)
\ No newline at end of file
+        self.register_statement(name, query)
+        return self.fetch_statement(name, params)
+    
+    # Stock movement operations
+    def post_stock_movements(self, movements):
+        """Append stock movements to the ledger and apply them to inventory in one transaction
+        
+        Each movement is a dict with inv_id (or item_id), movement_type and quantity,
+        plus an optional note and created_at. Receipts add stock, sales and waste remove it and a
+        count sets the counted quantity. Stock is changed with atomic
+        quantity = quantity + delta updates rather than overwrites.
+        Returns the number of movements posted, or -1 on failure.
+        """
+        if not movements:
+            return 0
+        now = datetime.datetime.now()
+        with self.transaction() as tx:
+            # Resolve item ids to inventory rows
+            item_ids = sorted({m['item_id'] for m in movements if m.get('inv_id') is None})
+            inv_by_item = {}
+            if item_ids:
+                rows = self.fetch_data(
+                    f"SELECT inv_id, item_id FROM inventory WHERE item_id IN ({', '.join(['%s'] * len(item_ids))})",
+                    item_ids
+                )
+                inv_by_item = {row['item_id']: row['inv_id'] for row in rows.to_dict('records')}
+            
+            # Counts need the locked current quantity; other movements never read it
+            inv_ids = [m['inv_id'] if m.get('inv_id') is not None else inv_by_item.get(m['item_id'])
+                       for m in movements]
+            counted = sorted({inv_id for inv_id, m in zip(inv_ids, movements)
+                              if m['movement_type'] == 'count' and inv_id is not None})
+            current = {}
+            if counted:
+                rows = self.fetch_data(
+                    f"SELECT inv_id, quantity FROM inventory WHERE inv_id IN ({', '.join(['%s'] * len(counted))}) FOR UPDATE",
+                    counted
+                )
+                current = {row['inv_id']: row['quantity'] for row in rows.to_dict('records')}
+            
+            ledger_rows = []
+            deltas = {}
+            for inv_id, movement in zip(inv_ids, movements):
+                if inv_id is None:
+                    continue
+                movement_type = movement['movement_type']
+                quantity = int(movement['quantity'])
+                if movement_type == 'receipt':
+                    delta = quantity
+                elif movement_type in ('sale', 'waste'):
+                    delta = -quantity
+                elif movement_type == 'count':
+                    delta = quantity - (current.get(inv_id, 0) + deltas.get(inv_id, 0))
+                else:
+                    print(f"Unknown stock movement type: {movement_type}")
+                    tx.failed = True
+                    break
+                deltas[inv_id] = deltas.get(inv_id, 0) + delta
+                ledger_rows.append((inv_id, movement_type, delta, movement.get('created_at') or now, movement.get('note')))
+            
+            if ledger_rows and not tx.failed:
+                self.execute_many(
+                    "INSERT INTO stock_movement (inv_id, movement_type, delta, created_at, note) VALUES (%s, %s, %s, %s, %s)",
+                    ledger_rows
+                )
+                # Net deltas per item are applied in a single statement
+                deltas = {inv_id: delta for inv_id, delta in deltas.items() if delta != 0}
+                if deltas:
+                    cases = ' '.join(['WHEN %s THEN %s'] * len(deltas))
+                    placeholders = ', '.join(['%s'] * len(deltas))
+                    params = [value for item in deltas.items() for value in item] + list(deltas.keys())
+                    self.execute_query(
+                        f"UPDATE inventory SET quantity = quantity + CASE inv_id {cases} END WHERE inv_id IN ({placeholders})",
+                        self._normalize_params(params)
+                    )
+                    self.refresh_low_stock_alerts(list(deltas.keys()))
+        return len(ledger_rows) if tx.committed else -1
+    
+    def get_stock_movements(self, inv_id=None, limit=100):
+        """Get the most recent stock movements with item details"""
+        query = """
+        SELECT m.movement_id, m.created_at, m.inv_id, t.item_name, 
+               m.movement_type, m.delta, m.note
+        FROM stock_movement m
+        JOIN inventory i ON m.inv_id = i.inv_id
+        JOIN item t ON i.item_id = t.item_id
+        """
+        params = []
+        if inv_id:
+            query += " WHERE m.inv_id = %s"
+            params.append(inv_id)
+        query += f" ORDER BY m.movement_id DESC LIMIT {int(limit)}"
+        return self.fetch_data(query, params)
+    
+    def compact_stock_movements(self, before):
+        """Fold ledger entries older than the given datetime into per-item snapshots
+        
+        Returns the number of movements compacted, or -1 on failure.
+        """
+        with self.transaction() as tx:
+            last = self.fetch_data("SELECT MAX(movement_id) as max_id FROM stock_movement WHERE created_at < %s", [before])
+            if last.empty or last.iloc[0]['max_id'] is None or pd.isna(last.iloc[0]['max_id']):
+                return 0
+            last_id = int(last.iloc[0]['max_id'])
+            self.execute_query("""
+                INSERT INTO stock_snapshot (inv_id, last_movement_id, snapshot_at, received, sold, wasted, counted, net_delta)
+                SELECT inv_id, %s, NOW(),
+                       SUM(CASE WHEN movement_type = 'receipt' THEN delta ELSE 0 END),
+                       -SUM(CASE WHEN movement_type = 'sale' THEN delta ELSE 0 END),
+                       -SUM(CASE WHEN movement_type = 'waste' THEN delta ELSE 0 END),
+                       SUM(CASE WHEN movement_type = 'count' THEN delta ELSE 0 END),
+                       SUM(delta)
+                FROM stock_movement
+                WHERE movement_id <= %s
+                GROUP BY inv_id
+                """, [last_id, last_id])
+            compacted = self.execute_query("DELETE FROM stock_movement WHERE movement_id <= %s", [last_id])
+        return compacted if tx.committed else -1
+    
+    # Low stock operations
+    def refresh_low_stock_alerts(self, inv_ids=None):
+        """Bring the low stock alert set up to date for the given inventory rows (or all rows)
+        
+        Alerts keep the time they were first raised while the item stays below
+        its reorder point and are removed once it is restocked.
+        """
+        condition = "1 = 1"
+        params = []
+        if inv_ids is not None:
+            if not inv_ids:
+                return 0
+            condition = f"i.inv_id IN ({', '.join(['%s'] * len(inv_ids))})"
+            params = list(self._normalize_params(inv_ids))
+        with self.transaction() as tx:
+            self.execute_query(f"""
+                DELETE a FROM low_stock_alert a
+                JOIN inventory i ON a.inv_id = i.inv_id
+                WHERE {condition} AND i.quantity >= i.reorder_point
+                """, params)
+            self.execute_query(f"""
+                INSERT INTO low_stock_alert (inv_id, quantity, reorder_point, raised_at)
+                SELECT i.inv_id, i.quantity, i.reorder_point, NOW()
+                FROM inventory i
+                WHERE {condition} AND i.quantity < i.reorder_point
+                ON DUPLICATE KEY UPDATE quantity = VALUES(quantity), reorder_point = VALUES(reorder_point)
+                """, params)
+        return 0 if tx.committed else -1
+    
+    def get_low_stock(self):
+        """Get items below their reorder point from the alert set"""
+        query = """
+        SELECT a.inv_id, t.item_name, t.item_size, a.quantity, a.reorder_point, 
+               i.lead_time_days, a.raised_at
+        FROM low_stock_alert a
+        JOIN inventory i ON a.inv_id = i.inv_id
+        JOIN item t ON i.item_id = t.item_id
+        ORDER BY a.quantity - a.reorder_point
+        """
+        self.register_statement("low_stock", query)
+        return self.fetch_statement("low_stock")
\ No newline at end of file
@@ -0,0 +1,181 @@
+import streamlit as st
+import pandas as pd
+import datetime
+from database import Database
+from live_refresh import show_live_controls
+
+STATE_NAME = "delivery_dispatch"
+
+def window_start(created_at, window_minutes):
+    """Get the start of the dispatch window an order time falls in"""
+    return pd.to_datetime(created_at).dt.floor(f"{window_minutes}min")
+
+def plan_runs(orders, open_runs, next_run_id, max_orders=8, max_items=40):
+    """Pack orders into runs sharing zipcode, city and window, within capacity
+
+    Orders fill the open run of their group while it has room and start a
+    new run otherwise. Returns the assignments as (order_id, run_id) pairs
+    and the DataFrame of every run created or changed.
+    """
+    runs = {}
+    by_group = {}
+    for run in open_runs.itertuples(index=False):
+        runs[run.run_id] = run._asdict()
+        by_group.setdefault((run.zipcode, run.city, pd.Timestamp(run.window_start)), []).append(run.run_id)
+
+    assignments = []
+    touched = set()
+    for order in orders.sort_values('created_at').itertuples(index=False):
+        group = (order.zipcode, order.city, pd.Timestamp(order.window_start))
+        run_id = next((r for r in by_group.get(group, [])
+                       if runs[r]['order_count'] < max_orders and runs[r]['item_count'] + order.items <= max_items), None)
+        if run_id is None:
+            run_id = next_run_id
+            next_run_id += 1
+            runs[run_id] = {'run_id': run_id, 'zipcode': order.zipcode, 'city': order.city,
+                            'window_start': group[2], 'order_count': 0, 'item_count': 0}
+            by_group.setdefault(group, []).append(run_id)
+        runs[run_id]['order_count'] += 1
+        runs[run_id]['item_count'] += int(order.items)
+        assignments.append((order.order_id, run_id))
+        touched.add(run_id)
+    return assignments, pd.DataFrame([runs[r] for r in sorted(touched)])
+
+def assign_new_deliveries(db, window_minutes=30, max_orders=8, max_items=40, horizon_hours=12):
+    """Group delivery orders placed since the last pass into dispatch runs
+
+    Only delivery rows newer than the stored row_id and inside the horizon
+    are read, through the (delivery, created_at) index, and joined to their
+    addresses. The state row is locked so concurrent passes queue up instead
+    of assigning the same orders twice. Returns the number of orders
+    assigned, or -1 on failure.
+    """
+    assigned = 0
+    now = datetime.datetime.now()
+    since = now - datetime.timedelta(hours=horizon_hours)
+    with db.transaction() as tx:
+        db.execute_query("""
+            INSERT IGNORE INTO analytics_state (name, last_row_id, updated_at) VALUES (%s, 0, %s)
+            """, [STATE_NAME, now])
+        state = db.fetch_data("SELECT last_row_id FROM analytics_state WHERE name = %s FOR UPDATE", [STATE_NAME])
+        last_row_id = int(state.iloc[0]['last_row_id']) if not state.empty else 0
+
+        rows = db.fetch_data("""
+            SELECT o.row_id, o.order_id, o.created_at, o.quantity,
+                   a.delivery_zipcode as zipcode, a.delivery_city as city
+            FROM orders o
+            JOIN address a ON o.add_id = a.add_id
+            WHERE o.delivery = 1 AND o.created_at >= %s AND o.row_id > %s
+            """, [since, last_row_id])
+        if rows.empty:
+            return 0
+
+        orders = rows.groupby('order_id', as_index=False).agg(
+            created_at=('created_at', 'min'), zipcode=('zipcode', 'first'),
+            city=('city', 'first'), items=('quantity', 'sum'))
+        orders['window_start'] = window_start(orders['created_at'], window_minutes)
+
+        # Item lines of an order that was already assigned go to the same run
+        placeholders = ', '.join(['%s'] * len(orders))
+        known = db.fetch_data(f"""
+            SELECT order_id, run_id FROM delivery_run_orders WHERE order_id IN ({placeholders})
+            """, orders['order_id'].tolist())
+        if not known.empty:
+            extra = orders.merge(known, on='order_id')
+            db.execute_many("UPDATE delivery_runs SET item_count = item_count + %s WHERE run_id = %s",
+                            [(int(items), int(run_id)) for items, run_id in zip(extra['items'], extra['run_id'])])
+            orders = orders[~orders['order_id'].isin(known['order_id'])]
+
+        if not orders.empty:
+            open_runs = db.fetch_data("""
+                SELECT run_id, zipcode, city, window_start, order_count, item_count
+                FROM delivery_runs
+                WHERE status = 'open' AND window_start >= %s
+                """, [pd.Timestamp(since).floor(f"{window_minutes}min").to_pydatetime()])
+            if open_runs.empty:
+                open_runs = pd.DataFrame(columns=['run_id', 'zipcode', 'city', 'window_start', 'order_count', 'item_count'])
+            last_run = db.fetch_data("SELECT MAX(run_id) as max_id FROM delivery_runs")
+            next_run_id = 1
+            if not last_run.empty and pd.notna(last_run.iloc[0]['max_id']):
+                next_run_id = int(last_run.iloc[0]['max_id']) + 1
+
+            assignments, runs = plan_runs(orders, open_runs, next_run_id, max_orders, max_items)
+            db.execute_many("""
+                INSERT INTO delivery_runs (run_id, zipcode, city, window_start, window_end, status, order_count, item_count, created_at)
+                VALUES (%s, %s, %s, %s, %s, 'open', %s, %s, %s)
+                ON DUPLICATE KEY UPDATE order_count = VALUES(order_count), item_count = VALUES(item_count)
+                """, [(run.run_id, run.zipcode, run.city, run.window_start.to_pydatetime(),
+                       (run.window_start + pd.Timedelta(minutes=window_minutes)).to_pydatetime(),
+                       run.order_count, run.item_count, now)
+                      for run in runs.itertuples(index=False)])
+            db.execute_many("INSERT INTO delivery_run_orders (order_id, run_id, assigned_at) VALUES (%s, %s, %s)",
+                            [(order_id, run_id, now) for order_id, run_id in assignments])
+            assigned = len(assignments)
+
+        db.execute_query("UPDATE analytics_state SET last_row_id = %s, updated_at = %s WHERE name = %s",
+                         [int(rows['row_id'].max()), now, STATE_NAME])
+    return assigned if tx.committed else -1
+
+def get_open_runs(db):
+    """Get the runs waiting to be dispatched with their orders"""
+    return db.fetch_data("""
+        SELECT r.run_id, r.zipcode, r.city, r.window_start, r.window_end, r.order_count, r.item_count,
+               GROUP_CONCAT(ro.order_id ORDER BY ro.order_id SEPARATOR ', ') as orders
+        FROM delivery_runs r
+        JOIN delivery_run_orders ro ON ro.run_id = r.run_id
+        WHERE r.status = 'open'
+        GROUP BY r.run_id
+        ORDER BY r.window_start, r.zipcode
+        """, primary=True)
+
+def dispatch_runs(db, run_ids):
+    """Mark runs as dispatched so no more orders join them"""
+    placeholders = ', '.join(['%s'] * len(run_ids))
+    return db.execute_query(f"""
+        UPDATE delivery_runs SET status = 'dispatched', dispatched_at = %s
+        WHERE status = 'open' AND run_id IN ({placeholders})
+        """, [datetime.datetime.now()] + [int(run_id) for run_id in run_ids])
+
+def show_delivery_dispatch(db):
+    """Display the delivery dispatch section and return the live refresh interval"""
+    st.header("Delivery Dispatch")
+
+    # New delivery orders are grouped on every rerun, so live mode keeps runs current
+    refresh_interval = show_live_controls("dispatch")
+
+    window_minutes = st.sidebar.number_input("Dispatch window (minutes)", min_value=5, max_value=240, value=30, step=5)
+    max_orders = st.sidebar.number_input("Max orders per run", min_value=1, value=8)
+    max_items = st.sidebar.number_input("Max items per run", min_value=1, value=40)
+
+    assigned = assign_new_deliveries(db, window_minutes, max_orders, max_items)
+    if assigned > 0:
+        st.success(f"{assigned} new delivery order(s) grouped into runs.")
+    elif assigned < 0:
+        st.error("Failed to group new delivery orders. Please try again.")
+
+    runs = get_open_runs(db)
+    if runs.empty:
+        st.info("No delivery runs waiting to be dispatched.")
+        return refresh_interval
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Open Runs", len(runs))
+    col2.metric("Orders Waiting", int(runs['order_count'].sum()))
+    col3.metric("Zip Codes", runs['zipcode'].nunique())
+
+    st.dataframe(runs, hide_index=True)
+
+    with st.form(key="dispatch_runs"):
+        labels = {row['run_id']: f"Run {row['run_id']}: {row['city']} {row['zipcode']}, "
+                                 f"{row['window_start']:%H:%M}-{row['window_end']:%H:%M} ({row['order_count']} orders)"
+                  for _, row in runs.iterrows()}
+        selected = st.multiselect("Runs to dispatch", options=list(labels.keys()), format_func=lambda x: labels.get(x, ""))
+        submit_button = st.form_submit_button(label="Dispatch Runs")
+
+        if submit_button and selected:
+            if dispatch_runs(db, selected) >= 0:
+                st.success(f"{len(selected)} run(s) dispatched.")
+            else:
+                st.error("Failed to dispatch runs. Please try again.")
+
+    return refresh_interval
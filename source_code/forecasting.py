@@ -0,0 +1,216 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import datetime
+from database import Database
+
+SEASON_COLUMNS = [f"season_{d}" for d in range(7)]
+
+def build_sales_matrix(sales, item_ids, start, days):
+    """Build a days x items matrix of units sold from (item_id, sale_date, quantity) rows"""
+    matrix = np.zeros((days, len(item_ids)))
+    if sales.num_rows == 0:
+        return matrix
+    item_index = pd.Index(item_ids).get_indexer(sales.column('item_id').to_numpy(zero_copy_only=False))
+    day_index = (sales.column('sale_date').to_numpy().astype('datetime64[D]') - np.datetime64(start, 'D')).astype(int)
+    known = item_index >= 0
+    np.add.at(matrix, (day_index[known], item_index[known]), sales.column('quantity').cast(pa.float64()).to_numpy()[known])
+    return matrix
+
+def fit_seasonal_smoothing(matrix, start, level, season, alpha=0.3, gamma=0.1):
+    """Advance exponential smoothing with day-of-week seasonality over new days
+
+    Every item is updated at once per day: the level tracks deseasonalized
+    demand and the seasonal factor of that weekday tracks demand relative to
+    the level. Returns the new level and season arrays.
+    """
+    level = level.copy()
+    season = season.copy()
+    first_dow = np.datetime64(start, 'D').astype(datetime.date).weekday()
+    for day, sold in enumerate(matrix):
+        dow = (first_dow + day) % 7
+        factor = season[:, dow]
+        deseasonalized = np.divide(sold, factor, out=sold.copy(), where=factor > 0)
+        level = alpha * deseasonalized + (1 - alpha) * level
+        ratio = np.divide(sold, level, out=factor.copy(), where=level > 0)
+        season[:, dow] = gamma * ratio + (1 - gamma) * factor
+    # Keep the weekly factors averaging to one so the level stays a daily rate
+    mean_factor = season.mean(axis=1, keepdims=True)
+    season = np.divide(season, mean_factor, out=np.ones_like(season), where=mean_factor > 0)
+    return level, season
+
+def refresh_demand_model(db, alpha=0.3, gamma=0.1):
+    """Fold complete days since the last refresh into the cached demand model
+
+    Only days after the model's fitted_through date are read from orders, so a
+    daily refresh touches one day of history. Returns the number of days
+    fitted, or -1 on failure.
+    """
+    model = db.fetch_data(f"""
+        SELECT item_id, level, {', '.join(SEASON_COLUMNS)}, fitted_through
+        FROM demand_model
+        """, primary=True)
+    if not model.empty:
+        start = pd.Timestamp(model['fitted_through'].max()).date() + datetime.timedelta(days=1)
+    else:
+        first = db.fetch_data(f"SELECT MIN(created_at) as first_order FROM {db.orders_source()}", primary=True)
+        if first.empty or pd.isna(first.iloc[0]['first_order']):
+            return 0
+        start = pd.Timestamp(first.iloc[0]['first_order']).date()
+
+    # Today is still in progress, so fit up to and including yesterday
+    end = datetime.date.today() - datetime.timedelta(days=1)
+    days = (end - start).days + 1
+    if days <= 0:
+        return 0
+
+    sales = db.fetch_data(f"""
+        SELECT item_id, DATE(created_at) as sale_date, SUM(quantity) as quantity
+        FROM {db.orders_source(start)}
+        WHERE created_at >= %s AND created_at < %s
+        GROUP BY item_id, DATE(created_at)
+        """, [start, end + datetime.timedelta(days=1)], primary=True, arrow=True)
+    # A failed read comes back without columns; fitting it as zero demand
+    # would move fitted_through past days that were never read
+    if sales.num_columns == 0:
+        return -1
+
+    items = db.fetch_data("SELECT item_id FROM item", primary=True)
+    if items.empty:
+        return -1
+    item_ids = items['item_id'].tolist()
+    level = np.zeros(len(item_ids))
+    season = np.ones((len(item_ids), 7))
+    if not model.empty:
+        model = model.set_index('item_id').reindex(item_ids)
+        level = model['level'].fillna(0).to_numpy(dtype=float)
+        season = model[SEASON_COLUMNS].fillna(1).to_numpy(dtype=float)
+
+    matrix = build_sales_matrix(sales, item_ids, start, days)
+    level, season = fit_seasonal_smoothing(matrix, start, level, season, alpha, gamma)
+
+    day_index, item_index = np.nonzero(matrix)
+    dates = (np.datetime64(start, 'D') + day_index).tolist()
+    now = datetime.datetime.now()
+    with db.transaction() as tx:
+        db.execute_many("""
+            INSERT INTO item_daily_sales (item_id, sale_date, quantity) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)
+            """, [(item_ids[i], d, int(q)) for i, d, q in zip(item_index, dates, matrix[day_index, item_index])])
+        db.execute_many(f"""
+            INSERT INTO demand_model (item_id, level, {', '.join(SEASON_COLUMNS)}, fitted_through, updated_at)
+            VALUES ({', '.join(['%s'] * 11)})
+            ON DUPLICATE KEY UPDATE level = VALUES(level),
+                {', '.join(f'{c} = VALUES({c})' for c in SEASON_COLUMNS)},
+                fitted_through = VALUES(fitted_through), updated_at = VALUES(updated_at)
+            """, [
+                (item_id, float(level[i]), *season[i].tolist(), end, now)
+                for i, item_id in enumerate(item_ids)
+            ])
+    return days if tx.committed else -1
+
+def reset_demand_model(db):
+    """Clear the cached demand model so the next refresh refits from full history"""
+    with db.unit_of_work() as uow:
+        uow.execute("DELETE FROM demand_model")
+        uow.execute("DELETE FROM item_daily_sales")
+    return uow.committed
+
+def forecast_demand(db, horizon=7, ma_window=7):
+    """Forecast next-N-day demand per item and days of cover against inventory
+
+    Returns one row per inventory line with the moving average, smoothed and
+    seasonal forecasts plus the number of days the current stock will last.
+    """
+    model = db.fetch_data(f"""
+        SELECT item_id, level, {', '.join(SEASON_COLUMNS)}, fitted_through
+        FROM demand_model
+        """)
+    inventory = db.get_inventory_with_items()
+    if model.empty or inventory.empty:
+        return pd.DataFrame()
+
+    fitted_through = pd.Timestamp(model['fitted_through'].max()).date()
+    item_ids = model['item_id'].tolist()
+    level = model['level'].to_numpy(dtype=float)
+    season = model[SEASON_COLUMNS].to_numpy(dtype=float)
+
+    # Moving average over the last ma_window days of the cached sales matrix
+    window_start = fitted_through - datetime.timedelta(days=ma_window - 1)
+    recent = db.fetch_data("""
+        SELECT item_id, sale_date, quantity
+        FROM item_daily_sales
+        WHERE sale_date >= %s AND sale_date <= %s
+        """, [window_start, fitted_through], arrow=True)
+    moving_average = build_sales_matrix(recent, item_ids, window_start, ma_window).mean(axis=0)
+
+    # items x horizon matrix of seasonal daily forecasts
+    future_dows = (fitted_through.weekday() + 1 + np.arange(horizon)) % 7
+    seasonal = level[:, None] * season[:, future_dows]
+
+    forecast = pd.DataFrame({
+        'item_id': item_ids,
+        'ma_daily': np.round(moving_average, 2),
+        'smoothed_daily': np.round(level, 2),
+        'ma_forecast': np.round(moving_average * horizon, 1),
+        'seasonal_forecast': np.round(seasonal.sum(axis=1), 1)
+    })
+
+    inventory = inventory.merge(forecast, on='item_id', how='left').fillna({
+        'ma_daily': 0, 'smoothed_daily': 0, 'ma_forecast': 0, 'seasonal_forecast': 0
+    })
+    # Walk cumulative seasonal demand over the horizon, then extend at the smoothed rate
+    by_item = pd.Index(item_ids).get_indexer(inventory['item_id'])
+    cumulative = np.where(by_item[:, None] >= 0, seasonal[by_item].cumsum(axis=1), 0)
+    quantity = inventory['quantity'].to_numpy(dtype=float)
+    covered_days = (cumulative <= quantity[:, None]).sum(axis=1).astype(float)
+    remaining = quantity - np.where(by_item >= 0, cumulative[:, -1], 0)
+    rate = inventory['smoothed_daily'].to_numpy(dtype=float)
+    beyond = np.divide(remaining, rate, out=np.full(len(rate), np.inf), where=rate > 0)
+    inventory['days_of_cover'] = np.round(np.where(covered_days == horizon, horizon + beyond, covered_days), 1)
+    inventory['reorder'] = inventory['days_of_cover'] <= inventory['lead_time_days']
+
+    return inventory[[
+        'inv_id', 'item_id', 'item_name', 'item_size', 'quantity', 'lead_time_days',
+        'ma_daily', 'smoothed_daily', 'ma_forecast', 'seasonal_forecast', 'days_of_cover', 'reorder'
+    ]].sort_values('days_of_cover')
+
+def show_demand_forecast(db):
+    """Display the demand forecasting section"""
+    st.header("Demand Forecast")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Refresh Forecast", type="primary"):
+            fitted = refresh_demand_model(db)
+            if fitted >= 0:
+                st.success(f"{fitted} new day(s) fitted.")
+            else:
+                st.error("Failed to refresh the demand model. Please try again.")
+    with col2:
+        if st.button("Refit From Full History"):
+            if reset_demand_model(db) and refresh_demand_model(db) >= 0:
+                st.success("Demand model refitted.")
+            else:
+                st.error("Failed to refit the demand model. Please try again.")
+
+    horizon = st.sidebar.slider("Forecast horizon (days)", min_value=1, max_value=28, value=7)
+    ma_window = st.sidebar.slider("Moving average window (days)", min_value=3, max_value=56, value=7)
+
+    forecast = forecast_demand(db, horizon, ma_window)
+    if forecast.empty:
+        st.info("No forecast yet. Click Refresh Forecast to fit the demand model.")
+        return
+
+    reorder = forecast[forecast['reorder']]
+    col1, col2 = st.columns(2)
+    col1.metric("Items Forecast", len(forecast))
+    col2.metric("Below Lead Time Cover", len(reorder))
+
+    if not reorder.empty:
+        st.warning(f"{len(reorder)} item(s) will run out before a new delivery can arrive.")
+
+    st.subheader(f"Next {horizon} Day Demand")
+    st.dataframe(forecast, hide_index=True)
+    st.bar_chart(forecast.set_index('item_id')[['ma_forecast', 'seasonal_forecast']])
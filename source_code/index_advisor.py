@@ -0,0 +1,266 @@
+import streamlit as st
+import pandas as pd
+import datetime
+import os
+import re
+from database import Database
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "migrations")
+
+KEYWORDS = {"ON", "WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "GROUP", "ORDER",
+            "LIMIT", "SET", "USING", "HAVING", "UNION", "AS"}
+TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(\w+)`?)?", re.IGNORECASE)
+# Optional alias, column, then the comparison it takes part in
+PREDICATE_PATTERN = re.compile(
+    r"(?<![\w.(])(?:`?(\w+)`?\.)?`?(\w+)`?\s*(<=>|<=|>=|<>|!=|=|<|>|\bIN\b|\bBETWEEN\b|\bLIKE\b)",
+    re.IGNORECASE)
+COLUMN_PATTERN = re.compile(r"(?<![\w.])(?:`?(\w+)`?\.)?`?(\w+)`?(?![\w(])")
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE")
+MAX_INDEX_COLUMNS = 5
+
+def estimate_rows_examined(plan):
+    """Estimate the rows a plan examines, treating its tables as nested loop joins"""
+    total = 0.0
+    fanout = 1.0
+    for row in plan.itertuples():
+        rows = float(row.rows) if pd.notna(row.rows) else 0.0
+        filtered = float(row.filtered) / 100 if 'filtered' in plan.columns and pd.notna(row.filtered) else 1.0
+        total += fanout * rows
+        fanout *= max(rows * filtered, 1.0)
+    return int(total)
+
+def _clause(sql, start, ends):
+    """Get the text of a clause up to the next of the given keywords"""
+    match = re.search(rf"\b{start}\b(.*?)(?:\b(?:{'|'.join(ends)})\b|$)", sql, re.IGNORECASE | re.DOTALL)
+    return match.group(1) if match else ""
+
+def parse_query(sql, columns_by_table):
+    """Find the columns a statement filters, joins, sorts and reads, per table
+
+    Aliases are resolved from the FROM/JOIN list and unqualified columns are
+    matched to the only referenced table that has them.
+    """
+    aliases = {}
+    for table, alias in TABLE_PATTERN.findall(sql):
+        if table.upper() in KEYWORDS or table not in columns_by_table:
+            continue
+        aliases[table] = table
+        if alias and alias.upper() not in KEYWORDS:
+            aliases[alias] = table
+
+    def resolve(alias, column):
+        if alias:
+            table = aliases.get(alias)
+            return table if table and column in columns_by_table[table] else None
+        owners = [t for t in set(aliases.values()) if column in columns_by_table[t]]
+        return owners[0] if len(owners) == 1 else None
+
+    usage = {table: {'table': table, 'equality': [], 'join': [], 'range': [], 'sort': [], 'read': []}
+             for table in set(aliases.values())}
+
+    def add(kind, table, column):
+        if table and column not in usage[table][kind]:
+            usage[table][kind].append(column)
+
+    # Join conditions only help the table being looked up, not the one driving the join
+    joins = " ".join(re.findall(r"\bON\b(.*?)(?=\b(?:LEFT|RIGHT|INNER|JOIN|WHERE|GROUP|ORDER|LIMIT)\b|$)",
+                                sql, re.IGNORECASE | re.DOTALL))
+    for alias, column in COLUMN_PATTERN.findall(joins):
+        add('join', resolve(alias, column), column)
+    where = _clause(sql, "WHERE", ["GROUP BY", "ORDER BY", "LIMIT", "HAVING"])
+    for alias, column, operator in PREDICATE_PATTERN.findall(where):
+        kind = 'equality' if operator.upper() in ("=", "<=>", "IN") else 'range'
+        add(kind, resolve(alias, column), column)
+
+    for clause in (_clause(sql, "GROUP BY", ["ORDER BY", "LIMIT", "HAVING"]), _clause(sql, "ORDER BY", ["LIMIT"])):
+        for alias, column in COLUMN_PATTERN.findall(clause):
+            add('sort', resolve(alias, column), column)
+
+    select_list = _clause(sql, "SELECT", ["FROM"])
+    for alias, column in COLUMN_PATTERN.findall(select_list):
+        add('read', resolve(alias, column), column)
+    # SELECT * or t.* can never be covered by an index
+    for table in usage:
+        names = "|".join(alias for alias, t in aliases.items() if t == table)
+        wildcard = re.search(rf"(?:^|,)\s*\*|\b(?:{names})\.\*", select_list)
+        usage[table]['covering'] = wildcard is None
+    # EXPLAIN names tables by their alias
+    for alias, table in aliases.items():
+        usage.setdefault(alias, usage[table])
+    return usage
+
+def suggest_indexes(db, sql, plan, columns_by_table):
+    """Suggest composite or covering indexes for the tables a plan scans poorly
+
+    Columns are ordered equality lookups first, then one range or the sort
+    columns, then the remaining read columns when the index can cover them.
+    Suggestions already served by the leading columns of an existing index
+    are skipped.
+    """
+    usage = parse_query(sql, columns_by_table)
+    suggestions = []
+    for position, row in enumerate(plan.itertuples()):
+        if row.table not in usage:
+            continue
+        extra = str(row.Extra or "")
+        scans = row.type in ("ALL", "index") or pd.isna(row.key) or "filesort" in extra or "temporary" in extra
+        if not scans:
+            continue
+        table = usage[row.table]['table']
+        existing = db.get_indexes(table)
+        # InnoDB secondary indexes already carry the primary key
+        primary = existing.get('PRIMARY', [])
+
+        cols = list(usage[row.table]['equality'])
+        if position > 0:
+            cols += [c for c in usage[row.table]['join'] if c not in cols]
+        ranges = [c for c in usage[row.table]['range'] if c not in cols]
+        sorts = [c for c in usage[row.table]['sort'] if c not in cols]
+        cols += ranges[:1] if ranges else sorts
+        if not cols:
+            continue
+        reads = [c for c in usage[row.table]['read'] + usage[row.table]['join'] + ranges[1:] + sorts
+                 if c not in cols and c not in primary]
+        reads = list(dict.fromkeys(reads))
+        if usage[row.table]['covering'] and reads and len(cols) + len(reads) <= MAX_INDEX_COLUMNS:
+            cols += reads
+            reason = "covering"
+        else:
+            reason = "composite" if len(cols) > 1 else "single column"
+        cols = cols[:MAX_INDEX_COLUMNS]
+
+        if any(index[:len(cols)] == cols for index in existing.values()):
+            continue
+        name = f"idx_{'_'.join(cols)}"[:64]
+        suggestions.append({
+            'table': table,
+            'columns': cols,
+            'name': name,
+            'reason': f"{reason} index for a {row.type} access",
+            'statement': f"ALTER TABLE `{table}` ADD INDEX `{name}` ({', '.join(f'`{c}`' for c in cols)});"
+        })
+    return suggestions
+
+def analyze_workload(db, top=10):
+    """Explain the top statements of the captured workload and suggest indexes"""
+    workload = db.get_workload()
+    if workload.empty:
+        return []
+    workload = workload[workload['query'].str.split(" ", n=1).str[0].str.upper().isin(EXPLAINABLE)]
+    columns_by_table = {table: set(db.get_table_columns(table)['Field']) for table in db.get_tables()}
+
+    results = []
+    for entry in workload.head(top).itertuples():
+        if "information_schema" in entry.query.lower():
+            continue
+        plan = db.explain_query(entry.query, entry.params)
+        if plan.empty:
+            continue
+        results.append({
+            'query': entry.query,
+            'params': entry.params,
+            'calls': entry.calls,
+            'total_ms': entry.total_ms,
+            'plan': plan,
+            'rows_examined': estimate_rows_examined(plan),
+            'suggestions': suggest_indexes(db, entry.query, plan, columns_by_table)
+        })
+    return results
+
+def write_migration(suggestions):
+    """Write the chosen indexes to a timestamped migration file and return its path"""
+    os.makedirs(MIGRATIONS_DIR, exist_ok=True)
+    path = os.path.join(MIGRATIONS_DIR, f"{datetime.datetime.now():%Y%m%d%H%M%S}_add_indexes.sql")
+    with open(path, "w") as f:
+        f.write("-- Indexes suggested by the index advisor\n")
+        f.write("\n".join(s['statement'] for s in suggestions))
+        f.write("\n")
+    return path
+
+def apply_migration(db, suggestions):
+    """Create the chosen indexes and return the names of those that failed"""
+    return [s['name'] for s in suggestions if db.execute_query(s['statement']) < 0]
+
+def show_index_advisor(db):
+    """Display the index advisor section"""
+    st.header("Index Advisor")
+
+    workload = db.get_workload()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Captured Statements", len(workload))
+    col2.metric("Executions", int(workload['calls'].sum()) if not workload.empty else 0)
+    with col3:
+        if st.button("Clear Workload"):
+            db.reset_workload()
+            st.session_state.pop("advisor_results", None)
+            st.rerun()
+
+    statements = db.get_statement_stats()
+    if not statements.empty:
+        with st.expander("Prepared Statements"):
+            st.dataframe(statements, hide_index=True)
+
+    if workload.empty:
+        st.info("No statements captured yet. Use the app for a while and come back.")
+        return
+
+    with st.expander("Captured Workload"):
+        st.dataframe(workload.drop(columns='params'), hide_index=True)
+
+    top = st.number_input("Statements to analyze", min_value=1, max_value=50, value=10)
+    if st.button("Analyze Workload", type="primary"):
+        st.session_state.advisor_results = analyze_workload(db, top)
+        st.session_state.pop("advisor_after", None)
+
+    results = st.session_state.get("advisor_results")
+    if not results:
+        return
+
+    st.subheader("Top Statements")
+    st.dataframe(pd.DataFrame([{
+        'query': r['query'],
+        'calls': r['calls'],
+        'total_ms': r['total_ms'],
+        'est_rows_examined': r['rows_examined'],
+        'suggested_indexes': ", ".join(f"{s['table']}.{s['name']}" for s in r['suggestions'])
+    } for r in results]), hide_index=True)
+
+    for r in results:
+        with st.expander(f"Plan: {r['query'][:80]}"):
+            st.code(r['query'], language="sql")
+            st.dataframe(r['plan'], hide_index=True)
+
+    # The same index can help several statements
+    suggestions = {}
+    for r in results:
+        for s in r['suggestions']:
+            suggestions.setdefault(s['statement'], s)
+    if not suggestions:
+        st.success("No missing indexes found for the analyzed statements.")
+        return
+
+    st.subheader("Suggested Indexes")
+    chosen = st.multiselect("Indexes to apply", list(suggestions.keys()), default=list(suggestions.keys()))
+    st.code("\n".join(chosen), language="sql")
+
+    if st.button("Apply as Migration") and chosen:
+        chosen = [suggestions[statement] for statement in chosen]
+        path = write_migration(chosen)
+        failed = apply_migration(db, chosen)
+        if failed:
+            st.error(f"Failed to create index(es): {', '.join(failed)}")
+        else:
+            st.success(f"{len(chosen)} index(es) created. Migration written to {os.path.normpath(path)}")
+        st.session_state.advisor_after = [
+            {'query': r['query'],
+             'rows_before': r['rows_examined'],
+             'rows_after': estimate_rows_examined(db.explain_query(r['query'], r['params']))}
+            for r in results
+        ]
+
+    after = st.session_state.get("advisor_after")
+    if after:
+        st.subheader("Estimated Rows Examined")
+        after = pd.DataFrame(after)
+        after['reduction_%'] = (100 * (1 - after['rows_after'] / after['rows_before'].clip(lower=1))).round(1)
+        st.dataframe(after, hide_index=True)
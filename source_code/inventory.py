@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
+import datetime
 from database import Database
 
-def show_inventory_management(db):
+def show_inventory_management(db, journal):
     """Display the inventory management section"""
     st.header("Inventory Management")
     
-    tab1, tab2 = st.tabs(["View Inventory", "Update Inventory"])
+    tab1, tab2, tab3 = st.tabs(["View Inventory", "Update Inventory", "Stock Ledger"])
     
     with tab1:
         st.subheader("Current Inventory")
@@ -17,9 +18,9 @@ def show_inventory_management(db):
             st.info("No inventory items found.")
         
         # Low stock alert
-        low_stock = inventory[inventory['quantity'] < 10] if not inventory.empty else pd.DataFrame()
+        low_stock = db.get_low_stock()
         if not low_stock.empty:
-            st.warning("Low Stock Items (quantity < 10):")
+            st.warning("Items below their reorder point:")
             st.dataframe(low_stock)
     
     with tab2:
@@ -28,21 +29,69 @@ def show_inventory_management(db):
         # Get inventory items for dropdown
         inventory = db.get_inventory_with_items()
         if not inventory.empty:
-            inv_options = {row['inv_id']: f"{row['item_name']} (Current stock: {row['quantity']})" for _, row in inventory.iterrows()}
+            inv_labels = {f"{row['inv_id']} - {row['item_name']} ({row['item_size']}, stock: {row['quantity']})": row['inv_id']
+                          for row in inventory.to_dict('records')}
             
             with st.form(key="update_inventory"):
-                inv_id = st.selectbox("Select Item", options=list(inv_options.keys()), format_func=lambda x: inv_options.get(x, ""))
-                quantity = st.number_input("New Quantity", min_value=0, value=10)
+                # One row per stock movement; all rows are posted together
+                movements = st.data_editor(
+                    pd.DataFrame({
+                        'item': pd.Series(dtype='str'),
+                        'movement_type': pd.Series(dtype='str'),
+                        'quantity': pd.Series(dtype='int'),
+                        'note': pd.Series(dtype='str')
+                    }),
+                    num_rows="dynamic",
+                    column_config={
+                        'item': st.column_config.SelectboxColumn("Item", options=list(inv_labels.keys()), required=True),
+                        'movement_type': st.column_config.SelectboxColumn("Type", options=["receipt", "sale", "waste", "count"], required=True),
+                        'quantity': st.column_config.NumberColumn("Quantity", min_value=0, step=1, required=True),
+                        'note': st.column_config.TextColumn("Note")
+                    },
+                    key="stock_movements"
+                )
+                st.caption("Receipts add stock, sales and waste remove it, and a count sets the counted quantity.")
                 
-                submit_button = st.form_submit_button(label="Update Inventory")
+                submit_button = st.form_submit_button(label="Post Movements")
                 
                 if submit_button:
-                    # Update inventory
-                    result = db.update_record('inventory', {'quantity': quantity}, f"inv_id = {inv_id}")
-                    
-                    if result > 0:
-                        st.success("Inventory updated successfully!")
+                    movements = movements.dropna(subset=['item', 'movement_type', 'quantity'])
+                    if movements.empty:
+                        st.error("Please add at least one movement.")
                     else:
-                        st.error("Failed to update inventory. Please try again.")
+                        # All movements are posted together once the journal reaches the database
+                        journal.submit('stock_movements', {'movements': [
+                            {
+                                'inv_id': inv_labels[row['item']],
+                                'movement_type': row['movement_type'],
+                                'quantity': row['quantity'],
+                                'note': row['note'] if isinstance(row['note'], str) and row['note'] else None
+                            }
+                            for row in movements.to_dict('records')
+                        ]})
+                        st.success(f"{len(movements)} stock movement(s) saved! Stock levels update as soon as the database confirms them.")
         else:
-            st.info("No inventory items found.")
\ No newline at end of file
+            st.info("No inventory items found.")
+    
+    with tab3:
+        st.subheader("Stock Ledger")
+        
+        movements = db.get_stock_movements()
+        if not movements.empty:
+            st.dataframe(movements)
+        else:
+            st.info("No stock movements found.")
+        
+        # Fold old ledger entries into per-item snapshots
+        with st.form(key="compact_ledger"):
+            keep_days = st.number_input("Keep movements from the last N days", min_value=1, value=90)
+            submit_button = st.form_submit_button(label="Compact Ledger")
+            
+            if submit_button:
+                cutoff = datetime.datetime.now() - datetime.timedelta(days=keep_days)
+                result = db.compact_stock_movements(cutoff)
+                
+                if result >= 0:
+                    st.success(f"{result} stock movement(s) compacted into snapshots.")
+                else:
+                    st.error("Failed to compact the stock ledger. Please try again.")
\ No newline at end of file
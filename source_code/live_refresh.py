@@ -0,0 +1,58 @@
+import streamlit as st
+import pandas as pd
+import time
+import metrics
+
+def show_live_controls(key):
+    """Display the live mode toggle and return the refresh interval in seconds, or None when off"""
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        live = st.toggle("Live mode", key=f"{key}_live")
+    with col2:
+        interval = st.slider("Refresh every (seconds)", min_value=2, max_value=60, value=5,
+                             key=f"{key}_interval", disabled=not live)
+    return interval if live else None
+
+def get_live_orders(db, key, max_rows=100, page_size=1000):
+    """Get recent order details, fetching only orders newer than the last one seen
+    
+    The rows are kept in session state between reruns and new orders are
+    prepended. New orders are read forward in pages of page_size, so a burst
+    between polls is never cut short. Returns the current DataFrame and the
+    DataFrame of new rows, newest first.
+    """
+    state = st.session_state.get(key)
+    metrics.cache_lookup("live_orders", state is not None)
+    if state is None:
+        orders = db.get_orders_with_details()
+        new_orders = pd.DataFrame()
+        state = {
+            'orders': orders,
+            'last_row_id': int(orders['row_id'].max()) if not orders.empty else 0
+        }
+        st.session_state[key] = state
+    else:
+        pages = []
+        while True:
+            page = db.get_orders_since(state['last_row_id'], page_size)
+            if page.empty:
+                break
+            pages.append(page)
+            state['last_row_id'] = int(page['row_id'].max())
+            if len(page) < page_size:
+                break
+        new_orders = pd.DataFrame()
+        if pages:
+            new_orders = pd.concat(pages, ignore_index=True).iloc[::-1].reset_index(drop=True)
+            state['orders'] = pd.concat([new_orders, state['orders']], ignore_index=True).head(max_rows)
+    return state['orders'], new_orders
+
+def reset_live_orders(key):
+    """Drop the session-level orders so the next read starts from scratch"""
+    st.session_state.pop(key, None)
+
+def schedule_refresh(interval):
+    """Rerun the page after the interval when live mode is on"""
+    if interval:
+        time.sleep(interval)
+        st.rerun()
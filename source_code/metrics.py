@@ -0,0 +1,161 @@
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATEMENT_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+
+def statement_label(query):
+    """Get a low-cardinality label for a statement: its verb and first table"""
+    words = query.split(None, 1)
+    if not words:
+        return "unknown"
+    verb = words[0].upper()
+    match = STATEMENT_PATTERN.search(query)
+    if match:
+        return f"{verb} {match.group(1)}"
+    return verb
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """A monotonically increasing count, one series per label combination"""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Add to the series for the given labels"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """Get the current value of one series"""
+        return self._values.get(tuple(labels.get(name, "") for name in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {value}"
+                    for key, value in sorted(self._values.items())]
+
+class Histogram:
+    """Observations counted into cumulative buckets, one series per label combination"""
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: bucket counts, sum and count
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record one observation in the series for the given labels"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labels, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+class Registry:
+    """The metrics exposed by this process"""
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+QUERY_DURATION = REGISTRY.register(Histogram(
+    "icecream_db_query_duration_seconds", "Time spent executing a statement, including fetching its rows.",
+    labels=("statement", "target")))
+ROWS_FETCHED = REGISTRY.register(Counter(
+    "icecream_db_rows_fetched_total", "Rows read back from SELECT statements.", labels=("statement",)))
+CONNECTS = REGISTRY.register(Counter(
+    "icecream_db_connects_total", "Connection attempts to MySQL.", labels=("target", "result")))
+RECONNECTS = REGISTRY.register(Counter(
+    "icecream_db_reconnects_total", "Connections re-established after the previous one was lost.", labels=("target",)))
+DB_ERRORS = REGISTRY.register(Counter(
+    "icecream_db_errors_total", "MySQL errors caught by the Database layer.", labels=("operation",)))
+QUERY_TIMEOUTS = REGISTRY.register(Counter(
+    "icecream_db_query_timeouts_total", "Reads aborted by their priority class's statement timeout.",
+    labels=("priority",)))
+ADMISSION_WAIT = REGISTRY.register(Histogram(
+    "icecream_db_admission_wait_seconds", "Time reads waited for a free slot of their priority class.",
+    labels=("priority",)))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "icecream_db_admission_rejected_total", "Reads given up after waiting too long for a slot.",
+    labels=("priority",)))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "icecream_cache_requests_total", "Lookups in the app's caches by result.", labels=("cache", "result")))
+PAGE_DURATION = REGISTRY.register(Histogram(
+    "icecream_page_rerun_duration_seconds", "Time taken by one Streamlit rerun of a page.",
+    labels=("page",), buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)))
+
+def cache_lookup(cache, hit):
+    """Count a cache lookup as a hit or a miss"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the console
+        pass
+
+def start_metrics_server(port=9464, host="127.0.0.1"):
+    """Serve /metrics on a local port from a background thread and return the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,327 @@
+"""Headless order intake for online and kiosk orders
+
+Run next to the Streamlit app with:
+
+    python order_api.py [--port 8502]
+
+POST /orders takes one order or {"orders": [...]} where each order is
+{"cust_id", "add_id", "delivery", "items": [{"item_id", "quantity", "item_price"?}]}.
+Orders are checked against cached item prices and concurrent requests are
+committed together, so the database sees one transaction per batch rather
+than one per order.
+"""
+import argparse
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+try:
+    import tomllib
+except ModuleNotFoundError:
+    # tomllib joined the standard library in Python 3.11
+    import tomli as tomllib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import metrics
+from database import Database
+
+SECRETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+
+ORDERS_ACCEPTED = metrics.REGISTRY.register(metrics.Counter(
+    "icecream_api_orders_total", "Orders received by the order API by result.", labels=("result",)))
+BATCH_SIZE = metrics.REGISTRY.register(metrics.Histogram(
+    "icecream_api_batch_orders", "Orders committed together in one transaction.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)))
+
+def load_settings(path=SECRETS_PATH):
+    """Read the connection settings the Streamlit app uses"""
+    secrets = {}
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            secrets = tomllib.load(f)
+    return dict(
+        host=secrets.get("db_host", "localhost"),
+        user=secrets.get("db_user", "root"),
+        password=secrets.get("db_password", ""),
+        database=secrets.get("db_name", "icecream_shop"),
+        shared_cache_path=secrets.get("shared_cache_path", "shared_cache.db")
+    )
+
+def validate_order(order, prices):
+    """Check one order against the item prices and return (order, None) or (None, error)"""
+    if not isinstance(order, dict):
+        return None, "order must be an object"
+    try:
+        cust_id = int(order['cust_id'])
+        add_id = int(order['add_id'])
+    except (KeyError, TypeError, ValueError):
+        return None, "cust_id and add_id are required integers"
+    lines = order.get('items')
+    if not isinstance(lines, list) or not lines:
+        return None, "items must be a non-empty list"
+
+    checked = []
+    for line in lines:
+        if not isinstance(line, dict):
+            return None, "each item must be an object"
+        item_id = line.get('item_id')
+        if item_id not in prices:
+            return None, f"unknown item_id {item_id!r}"
+        quantity = line.get('quantity')
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return None, f"quantity of {item_id} must be a positive integer"
+        # A client showing an outdated menu must not order at the old price
+        if 'item_price' in line:
+            try:
+                item_price = Decimal(str(line['item_price']))
+            except InvalidOperation:
+                return None, "item_price must be a number"
+            if item_price != prices[item_id]:
+                return None, f"price of {item_id} is {prices[item_id]}, not {line['item_price']}"
+        checked.append({'item_id': item_id, 'quantity': quantity, 'item_price': prices[item_id]})
+    return {'cust_id': cust_id, 'add_id': add_id, 'delivery': bool(order.get('delivery', False)),
+            'items': checked}, None
+
+class PendingRequest:
+    """Orders from one HTTP request, waiting for the committer
+
+    A request is queued until the committer claims it for a batch or the
+    client gives up and cancels it, whichever comes first. Once claimed it
+    can no longer be cancelled, so a client is never told its orders failed
+    when they are about to be committed.
+    """
+    def __init__(self, orders):
+        self.orders = orders
+        self.created_at = datetime.datetime.now()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.state = "queued"
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Take the request for writing, or return False if it was cancelled"""
+        with self._lock:
+            if self.state == "cancelled":
+                return False
+            self.state = "writing"
+            return True
+
+    def cancel(self):
+        """Withdraw the request while it is still queued, or return False if it is being written"""
+        with self._lock:
+            if self.state != "queued":
+                return False
+            self.state = "cancelled"
+            return True
+
+class GroupCommitter(threading.Thread):
+    """Commits the orders of concurrent requests together
+
+    The first waiting request opens a batch; requests arriving within
+    max_wait seconds join it, up to max_orders orders. The batch is numbered
+    and written in one transaction. If that fails, each request is retried
+    in its own transaction so one bad order does not reject the others.
+    """
+    def __init__(self, connection_settings, max_orders=500, max_wait=0.005, price_ttl=30):
+        super().__init__(daemon=True)
+        self.db = Database(**connection_settings)
+        self.max_orders = max_orders
+        self.max_wait = max_wait
+        self.price_ttl = price_ttl
+        self.prices = {}
+        self._prices_loaded_at = 0
+        self._queue = queue.Queue()
+        self.refresh_prices()
+
+    def refresh_prices(self):
+        """Reload item prices from the shared cache when they are older than price_ttl"""
+        if time.time() - self._prices_loaded_at < self.price_ttl:
+            return
+        items = self.db.fetch_statement("item_list", cached=True)
+        if not items.empty:
+            # Swapped in whole so request threads never see a half-built dict
+            self.prices = {item_id: Decimal(str(price)) for item_id, price in zip(items['item_id'], items['item_price'])}
+            self._prices_loaded_at = time.time()
+
+    def submit(self, orders, timeout=10):
+        """Queue validated orders and wait until they are committed or rejected"""
+        request = PendingRequest(orders)
+        self._queue.put(request)
+        if not request.done.wait(timeout):
+            if request.cancel():
+                request.error = "timed out waiting for the database"
+            else:
+                # Already in a batch, so its outcome is what the client must hear
+                request.done.wait()
+        return request
+
+    def _collect(self):
+        """Wait for a request, then gather the ones arriving shortly after it
+
+        Requests cancelled while queued are dropped; the ones gathered are
+        claimed, so they can no longer be cancelled.
+        """
+        batch = []
+        while not batch:
+            try:
+                request = self._queue.get(timeout=self.price_ttl)
+            except queue.Empty:
+                self.refresh_prices()
+                continue
+            if request.claim():
+                batch.append(request)
+        count = len(batch[0].orders)
+        deadline = time.perf_counter() + self.max_wait
+        while count < self.max_orders:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request.claim():
+                batch.append(request)
+                count += len(request.orders)
+        return batch
+
+    def _write(self, requests):
+        """Number and insert the orders of the requests in one transaction, or return None"""
+        try:
+            return self._insert(requests)
+        except Exception as e:
+            print(f"Error writing orders: {e}")
+            return None
+
+    def _insert(self, requests):
+        results = []
+        with self.db.transaction() as tx:
+            # Shared with the write journal, so concurrent writers never pick the same numbers
+            if not self.db.lock_numbering('order_numbering'):
+                tx.failed = True
+                return None
+            last_row_id, last_id = self.db.get_last_order()
+            row_id = last_row_id or 0
+            number = int(last_id.replace('ORD', '')) if last_id is not None else 0
+            rows = []
+            movements = []
+            for request in requests:
+                placed = []
+                for order in request.orders:
+                    number += 1
+                    order_id = f"ORD{number:04d}"
+                    row_ids = []
+                    for line in order['items']:
+                        row_id += 1
+                        row_ids.append(row_id)
+                        rows.append((row_id, order_id, request.created_at, line['item_id'], line['item_price'],
+                                     line['quantity'], order['cust_id'], order['delivery'], order['add_id']))
+                        movements.append({'item_id': line['item_id'], 'movement_type': 'sale',
+                                          'quantity': line['quantity'], 'note': order_id,
+                                          'created_at': request.created_at})
+                    placed.append({'order_id': order_id, 'row_ids': row_ids})
+                results.append(placed)
+            if self.db.execute_many("""
+                INSERT INTO orders (row_id, order_id, created_at, item_id, item_price, quantity, cust_id, delivery, add_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, rows) >= 0:
+                self.db.post_stock_movements(movements)
+        return results if tx.committed else None
+
+    def run(self):
+        while True:
+            batch = self._collect()
+            results = self._write(batch)
+            if results is not None:
+                BATCH_SIZE.observe(sum(len(request.orders) for request in batch))
+                for request, result in zip(batch, results):
+                    request.result = result
+            else:
+                for request in batch:
+                    result = self._write([request]) if len(batch) > 1 else None
+                    if result is not None:
+                        request.result = result[0]
+                    else:
+                        request.error = "rejected by the database"
+            for request in batch:
+                ORDERS_ACCEPTED.inc(len(request.orders), result="committed" if request.error is None else "failed")
+                request.done.set()
+            self.refresh_prices()
+
+class OrderHandler(BaseHTTPRequestHandler):
+    committer = None
+
+    def _send(self, status, body):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {'status': 'ok', 'items': len(self.committer.prices)})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != "/orders":
+            self._send(404, {'error': 'not found'})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        except (ValueError, UnicodeDecodeError):
+            self._send(400, {'error': 'body must be JSON'})
+            return
+        orders = body.get('orders') if isinstance(body, dict) and 'orders' in body else [body]
+        if not isinstance(orders, list) or not orders:
+            self._send(400, {'error': 'orders must be a non-empty list'})
+            return
+
+        prices = self.committer.prices
+        checked = []
+        errors = []
+        for index, order in enumerate(orders):
+            valid, error = validate_order(order, prices)
+            if error:
+                errors.append({'index': index, 'error': error})
+            checked.append(valid)
+        if errors:
+            ORDERS_ACCEPTED.inc(len(orders), result="invalid")
+            self._send(400, {'errors': errors})
+            return
+
+        request = self.committer.submit(checked)
+        if request.error:
+            self._send(503, {'error': request.error})
+        else:
+            self._send(201, {'orders': request.result})
+
+    def log_message(self, format, *args):
+        # One line per order would flood the console at full rate
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Order intake API for the Ice Cream Shop")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="How long a batch waits for more requests")
+    parser.add_argument("--max-orders", type=int, default=500, help="Most orders committed in one transaction")
+    parser.add_argument("--metrics-port", type=int, default=9465)
+    args = parser.parse_args()
+
+    metrics.start_metrics_server(args.metrics_port)
+
+    committer = GroupCommitter(load_settings(), max_orders=args.max_orders, max_wait=args.max_wait_ms / 1000)
+    committer.start()
+    OrderHandler.committer = committer
+    server = ThreadingHTTPServer((args.host, args.port), OrderHandler)
+    print(f"Order API listening on http://{args.host}:{args.port}/orders")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import streamlit as st
+import pandas as pd
+import datetime
+import threading
+import time
+from database import Database
+
+def archive_cutoff(hot_months, today=None):
+    """Get the first day of the oldest month kept in the hot orders table"""
+    today = today or datetime.date.today()
+    month = today.year * 12 + today.month - 1 - (hot_months - 1)
+    return datetime.datetime(month // 12, month % 12 + 1, 1)
+
+def archive_closed_months(db, hot_months=3, batch_size=1000, pause=0.1):
+    """Move orders from closed months into orders_archive in small chunks
+
+    The boundary and the highest row_id below it are published first and
+    readers are given time to pick them up, so queries reaching past either
+    already span both tiers while rows move. Each chunk is its own short
+    transaction on old rows only, so POS inserts of new orders are never
+    blocked. Returns the number of rows moved, or -1 on failure.
+    """
+    cutoff = archive_cutoff(hot_months)
+    tier = db.get_order_tier(refresh=True)
+    last = db.fetch_data("SELECT MAX(row_id) as max_id FROM orders WHERE created_at < %s", [cutoff], primary=True)
+    if last.empty:
+        return -1
+    last_row_id = int(last.iloc[0]['max_id']) if pd.notna(last.iloc[0]['max_id']) else 0
+    if tier is None or tier[0] < pd.Timestamp(cutoff) or tier[1] < last_row_id:
+        result = db.execute_query("""
+            INSERT INTO tier_state (name, boundary, last_row_id, updated_at) VALUES ('orders', %s, %s, %s)
+            ON DUPLICATE KEY UPDATE boundary = GREATEST(boundary, VALUES(boundary)),
+                last_row_id = GREATEST(last_row_id, VALUES(last_row_id)), updated_at = VALUES(updated_at)
+            """, [cutoff, last_row_id, datetime.datetime.now()])
+        if result < 0:
+            return -1
+        # Let every Database instance refresh its cached boundary before rows move
+        time.sleep(db.TIER_CACHE_SECONDS)
+
+    moved = 0
+    while True:
+        # Rows past the published row_id wait for the next run, when readers know about them
+        batch = db.fetch_data(
+            "SELECT row_id FROM orders WHERE created_at < %s AND row_id <= %s ORDER BY row_id LIMIT %s",
+            [cutoff, last_row_id, batch_size], primary=True)
+        if batch.empty:
+            break
+        row_ids = batch['row_id'].astype(int).tolist()
+        placeholders = ', '.join(['%s'] * len(row_ids))
+        with db.transaction() as tx:
+            db.execute_query(f"INSERT INTO orders_archive SELECT * FROM orders WHERE row_id IN ({placeholders})", row_ids)
+            db.execute_query(f"DELETE FROM orders WHERE row_id IN ({placeholders})", row_ids)
+        if not tx.committed:
+            return -1
+        moved += len(row_ids)
+        time.sleep(pause)
+    db.get_order_tier(refresh=True)
+    return moved
+
+class TierMaintenance(threading.Thread):
+    """Background thread that archives closed months once per interval or on request"""
+    def __init__(self, connection_settings, hot_months=3, interval=86400, batch_size=1000):
+        super().__init__(daemon=True)
+        self.connection_settings = connection_settings
+        self.hot_months = hot_months
+        self.interval = interval
+        self.batch_size = batch_size
+        self.running = False
+        self.last_run = None
+        self.last_moved = None
+        self._wake = threading.Event()
+
+    def trigger(self, hot_months=None):
+        """Run the archiving now instead of waiting for the next interval"""
+        if hot_months:
+            self.hot_months = hot_months
+        self._wake.set()
+
+    def run(self):
+        # A connection of its own, so maintenance never holds the one page reruns use
+        db = Database(**self.connection_settings)
+        while True:
+            self.running = True
+            try:
+                self.last_moved = archive_closed_months(db, self.hot_months, self.batch_size)
+            except Exception as e:
+                print(f"Error archiving orders: {e}")
+                self.last_moved = -1
+            self.running = False
+            self.last_run = datetime.datetime.now()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+def get_tier_stats(db):
+    """Get row counts and date ranges of the hot and archive tiers"""
+    return db.fetch_data("""
+        SELECT 'hot' as tier, COUNT(*) as order_rows, MIN(created_at) as oldest, MAX(created_at) as newest
+        FROM orders
+        UNION ALL
+        SELECT 'archive', COUNT(*), MIN(created_at), MAX(created_at)
+        FROM orders_archive
+        """, primary=True)
+
+def show_order_tiers(db, maintenance=None):
+    """Display the order history tiering section"""
+    st.header("Order History Tiers")
+
+    tier = db.get_order_tier(refresh=True)
+    if tier is not None:
+        st.caption(f"Orders before {tier[0]:%Y-%m-%d} are archived, up to row {tier[1]}.")
+    else:
+        st.caption("No orders have been archived yet.")
+
+    stats = get_tier_stats(db)
+    if not stats.empty:
+        st.dataframe(stats, hide_index=True)
+
+    if maintenance is None:
+        st.info("Scheduled archiving is not running.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Months Kept Hot", maintenance.hot_months)
+    col2.metric("Last Run", f"{maintenance.last_run:%Y-%m-%d %H:%M}" if maintenance.last_run else "Pending")
+    col3.metric("Rows Moved", maintenance.last_moved if maintenance.last_moved is not None else "-")
+
+    if maintenance.running:
+        st.info("Archiving is in progress in the background.")
+
+    st.subheader("Archive Now")
+    with st.form(key="archive_orders"):
+        hot_months = st.number_input("Months to keep hot", min_value=1, value=maintenance.hot_months)
+        st.write(f"Orders created before {archive_cutoff(hot_months):%Y-%m-%d} will be moved to the archive.")
+        submit_button = st.form_submit_button(label="Archive Closed Months")
+
+        if submit_button:
+            # The move runs on the maintenance thread so this page stays responsive
+            maintenance.trigger(hot_months)
+            st.success("Archiving started in the background.")
@@ -2,17 +2,52 @@ import streamlit as st
 import pandas as pd
 import datetime
 from database import Database
+from live_refresh import show_live_controls, get_live_orders, reset_live_orders, schedule_refresh
 
-def show_order_management(db):
+def show_order_management(db, journal):
     """Display the order management section"""
     st.header("Order Management")
     
+    refresh_interval = show_live_controls("orders")
+    
     tab1, tab2, tab3 = st.tabs(["View Orders", "Create Order", "Order Analytics"])
     
     with tab1:
         st.subheader("All Orders")
-        orders = db.get_orders_with_details()
-        if not orders.empty:
+        if refresh_interval:
+            # Only orders newer than the last one seen are fetched
+            orders, new_orders = get_live_orders(db, "orders_live")
+            if not new_orders.empty:
+                st.caption(f"{len(new_orders)} new order(s) since the last refresh")
+        else:
+            reset_live_orders("orders_live")
+            
+            # Filters are applied in the database rather than on the loaded rows
+            with st.expander("Filters"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    date_range = st.date_input("Date range", value=(), key="orders_date_range")
+                    cust_filter = st.number_input("Customer ID", min_value=0, value=0, step=1, help="0 for all customers")
+                    limit = st.number_input("Maximum rows", min_value=1, max_value=10000, value=100, step=50)
+                with col2:
+                    item_filter = st.text_input("Item ID")
+                    delivery_filter = st.selectbox("Delivery", options=["All", "Delivery", "Pickup"])
+            
+            start_date = end_date = None
+            if len(date_range) == 2:
+                start_date = date_range[0]
+                end_date = date_range[1] + datetime.timedelta(days=1)
+            orders = db.get_orders_with_details(
+                limit=limit,
+                start_date=start_date,
+                end_date=end_date,
+                cust_id=cust_filter or None,
+                item_id=item_filter or None,
+                delivery={"All": None, "Delivery": True, "Pickup": False}[delivery_filter],
+                arrow=True
+            )
+        # Live mode keeps a DataFrame, otherwise this is an Arrow table
+        if len(orders) > 0:
             st.dataframe(orders)
         else:
             st.info("No orders found.")
@@ -26,7 +61,7 @@ def show_order_management(db):
             customer_options = {row['cust_id']: row['name'] for _, row in customers.iterrows()}
             
             # Get items for dropdown
-            items = db.fetch_data("SELECT item_id, item_name, item_price, item_size FROM item")
+            items = db.fetch_statement("item_list", cached=True)
             item_options = {row['item_id']: f"{row['item_name']} ({row['item_size']}) - ${row['item_price']}" for _, row in items.iterrows()}
             
             # Get addresses for dropdown
@@ -40,51 +75,31 @@ def show_order_management(db):
             is_delivery = st.checkbox("Delivery")
             address_id = st.selectbox("Delivery Address", options=list(address_options.keys()), format_func=lambda x: address_options.get(x, ""))
             
-            # Get the price of the selected item
-            item_price = 0
-            if item_id:
-                selected_item = items[items['item_id'] == item_id]
-                if not selected_item.empty:
-                    item_price = selected_item.iloc[0]['item_price']
-            
             submit_button = st.form_submit_button(label="Create Order")
             
             if submit_button:
-                # Generate a new order ID
-                last_order = db.fetch_data("SELECT order_id FROM orders ORDER BY row_id DESC LIMIT 1")
-                if not last_order.empty:
-                    last_id = last_order.iloc[0]['order_id']
-                    # Extract the numeric part and increment
-                    numeric_part = int(last_id.replace('ORD', '')) + 1
-                    new_order_id = f"ORD{numeric_part:04d}"
-                else:
-                    new_order_id = "ORD0001"
-                
-                # Get the next row_id
-                last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM orders")
-                new_row_id = 1
-                if not last_row.empty and last_row.iloc[0]['max_id'] is not None:
-                    new_row_id = last_row.iloc[0]['max_id'] + 1
-                
-                # Create new order
-                order_data = {
-                    'row_id': new_row_id,
-                    'order_id': new_order_id,
+                # The order goes to the local journal and is numbered when it reaches
+                # the database, so a slow or unavailable database never holds up the counter
+                prices = dict(zip(items['item_id'], items['item_price'])) if not items.empty else {}
+                st.session_state.last_order_key = journal.submit('order', {
                     'created_at': datetime.datetime.now(),
                     'item_id': item_id,
-                    'item_price': item_price,
+                    'item_price': prices.get(item_id),
                     'quantity': quantity,
                     'cust_id': customer_id,
                     'delivery': is_delivery,
                     'add_id': address_id
-                }
-                
-                result = db.create_record('orders', order_data)
-                
-                if result > 0:
-                    st.success(f"Order {new_order_id} created successfully!")
-                else:
-                    st.error("Failed to create order. Please check your input.")
+                })
+                st.success("Order saved! It will be numbered as soon as the database confirms it.")
+        
+        # Status of the last order saved from this session
+        last_order = journal.get_entry(st.session_state.get("last_order_key"))
+        if last_order and last_order['status'] == 'flushed':
+            st.info(f"Last order: {last_order['result']['order_id']}")
+        elif last_order and last_order['status'] == 'failed':
+            st.error(f"Last order was rejected by the database: {last_order['error']}")
+        elif last_order:
+            st.caption("Last order is waiting to be sent to the database.")
     
     with tab3:
         st.subheader("Order Analytics")
@@ -96,22 +111,24 @@ def show_order_management(db):
             GROUP BY DATE(created_at)
             ORDER BY date DESC
             LIMIT 10
-        """)
+        """, priority="report")
         
         if not daily_orders.empty:
             st.line_chart(daily_orders.set_index('date')[['order_count']])
             st.line_chart(daily_orders.set_index('date')[['revenue']])
         
         # Top selling items
-        top_items = db.fetch_data("""
+        top_items = db.fetch_data(f"""
             SELECT i.item_name, SUM(o.quantity) as total_quantity, SUM(o.item_price * o.quantity) as total_revenue
-            FROM orders o
+            FROM {db.orders_source(alias='o')}
             JOIN item i ON o.item_id = i.item_id
             GROUP BY i.item_name
             ORDER BY total_quantity DESC
             LIMIT 5
-        """)
+        """, priority="report")
         
         if not top_items.empty:
             st.subheader("Top Selling Items")
-            st.bar_chart(top_items.set_index('item_name')[['total_quantity']])
\ No newline at end of file
+            st.bar_chart(top_items.set_index('item_name')[['total_quantity']])
+    
+    schedule_refresh(refresh_interval)
\ No newline at end of file
@@ -0,0 +1,201 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import datetime
+from database import Database
+
+ALL_ITEMS = "All items"
+
+def get_item_economics(db):
+    """Get every item with its current price and the ingredient cost of one unit
+
+    Ingredients are priced per package, so a recipe line costs its share of
+    the package weight. Items without a recipe cost 0.
+    """
+    return db.fetch_data("""
+        SELECT i.item_id, i.item_name, i.item_cat, i.item_size, i.item_price,
+               COALESCE(SUM(r.quantity / ing.ing_weight * ing.ing_price), 0) as unit_cost
+        FROM item i
+        LEFT JOIN recipe r ON r.recipe_id = i.sku
+        LEFT JOIN ingredient ing ON ing.ing_id = r.ing_id
+        GROUP BY i.item_id, i.item_name, i.item_cat, i.item_size, i.item_price
+        ORDER BY i.item_id
+        """, cached=True)
+
+def get_monthly_volume(db, start, end):
+    """Get units sold per item and month between two dates"""
+    volume = db.fetch_data(f"""
+        SELECT item_id, YEAR(created_at) as year, MONTH(created_at) as month, SUM(quantity) as quantity
+        FROM {db.orders_source(start)}
+        WHERE created_at >= %s AND created_at < %s
+        GROUP BY item_id, YEAR(created_at), MONTH(created_at)
+        """, [start, end + datetime.timedelta(days=1)], cached=True, priority="report")
+    if not volume.empty:
+        volume['month'] = [f"{int(y)}-{int(m):02d}" for y, m in zip(volume['year'], volume['month'])]
+    return volume
+
+def build_volume_matrix(volume, item_ids, months):
+    """Build an items x months matrix of units sold"""
+    matrix = np.zeros((len(item_ids), len(months)))
+    if volume.empty:
+        return matrix
+    item_index = pd.Index(item_ids).get_indexer(volume['item_id'])
+    month_index = pd.Index(months).get_indexer(volume['month'])
+    known = (item_index >= 0) & (month_index >= 0)
+    np.add.at(matrix, (item_index[known], month_index[known]), volume['quantity'].to_numpy(dtype=float)[known])
+    return matrix
+
+def target_options(items):
+    """Get the labels a price change can target: the whole menu, a category, a size or one item"""
+    return ([ALL_ITEMS]
+            + [f"Category: {cat}" for cat in sorted(items['item_cat'].unique())]
+            + [f"Size: {size}" for size in sorted(items['item_size'].unique())]
+            + [f"Item: {row.item_id} - {row.item_name} ({row.item_size})" for row in items.itertuples(index=False)])
+
+def target_mask(items, target):
+    """Get the boolean mask of the items a target label covers"""
+    if target == ALL_ITEMS:
+        return np.ones(len(items), dtype=bool)
+    kind, _, value = target.partition(": ")
+    if kind == "Category":
+        return (items['item_cat'] == value).to_numpy()
+    if kind == "Size":
+        return (items['item_size'] == value).to_numpy()
+    return (items['item_id'] == value.split(" - ")[0]).to_numpy()
+
+def price_multipliers(items, changes):
+    """Build a scenarios x items matrix of price multipliers from change rows
+
+    Each row of changes has a scenario name, a target and change_pct. Changes
+    of one scenario that cover the same item compound.
+    """
+    names = list(dict.fromkeys(changes['scenario']))
+    multipliers = np.ones((len(names), len(items)))
+    for row in changes.itertuples(index=False):
+        multipliers[names.index(row.scenario), target_mask(items, row.target)] *= 1 + row.change_pct / 100
+    return names, multipliers
+
+def simulate(price, unit_cost, volume, multipliers, elasticity=0.0):
+    """Project revenue and margin of every scenario over the historical volume
+
+    price and unit_cost are per item, volume is items x months and
+    multipliers is scenarios x items. Volume follows a constant elasticity
+    demand curve, so with elasticity -1.5 a 10% price rise sells about 13%
+    fewer units. Returns scenarios x items x months arrays of units,
+    revenue and margin.
+    """
+    new_price = multipliers * price
+    units = volume[None, :, :] * (multipliers ** elasticity)[:, :, None]
+    revenue = units * new_price[:, :, None]
+    margin = revenue - units * unit_cost[None, :, None]
+    return units, revenue, margin
+
+def summarize(names, units, revenue, margin, baseline_revenue, baseline_margin):
+    """Get one row per scenario with its totals and change against current prices"""
+    total_revenue = revenue.sum(axis=(1, 2))
+    total_margin = margin.sum(axis=(1, 2))
+    return pd.DataFrame({
+        'scenario': names,
+        'units': np.round(units.sum(axis=(1, 2))).astype(int),
+        'revenue': np.round(total_revenue, 2),
+        'revenue_change_pct': np.round((total_revenue / baseline_revenue - 1) * 100 if baseline_revenue else 0, 2),
+        'margin': np.round(total_margin, 2),
+        'margin_change_pct': np.round((total_margin / baseline_margin - 1) * 100 if baseline_margin else 0, 2),
+        'margin_pct': np.round(np.divide(total_margin, total_revenue, out=np.zeros_like(total_revenue),
+                                         where=total_revenue > 0) * 100, 2)
+    }).sort_values('margin', ascending=False)
+
+def show_price_simulator(db):
+    """Display the menu price what-if simulator"""
+    st.header("Price Simulator")
+
+    items = get_item_economics(db)
+    if items.empty:
+        st.info("No menu items found.")
+        return
+
+    today = datetime.date.today()
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("History From", today - datetime.timedelta(days=365))
+    with col2:
+        end_date = st.date_input("History To", today)
+
+    elasticity = st.sidebar.slider("Price elasticity", min_value=-3.0, max_value=0.0, value=0.0, step=0.1,
+                                   help="0 keeps volume unchanged; -1 loses 1% of units per 1% of price rise")
+    sweep = st.sidebar.checkbox("Sweep whole-menu changes", value=True)
+    sweep_range = st.sidebar.slider("Sweep range (%)", min_value=-50, max_value=50, value=(-20, 20), disabled=not sweep)
+    sweep_step = st.sidebar.number_input("Sweep step (%)", min_value=1, max_value=25, value=5, disabled=not sweep)
+
+    st.subheader("Proposed Changes")
+    changes = st.data_editor(
+        pd.DataFrame({'scenario': ["Premium large"], 'target': ["Size: Large"], 'change_pct': [10.0]}),
+        num_rows="dynamic",
+        column_config={
+            'scenario': st.column_config.TextColumn("Scenario", required=True),
+            'target': st.column_config.SelectboxColumn("Applies To", options=target_options(items), required=True),
+            'change_pct': st.column_config.NumberColumn("Change (%)", min_value=-90.0, max_value=500.0, step=0.5, required=True)
+        },
+        key="price_changes"
+    ).dropna()
+
+    if sweep:
+        steps = np.arange(sweep_range[0], sweep_range[1] + 1, sweep_step)
+        changes = pd.concat([changes, pd.DataFrame({
+            'scenario': [f"Menu {pct:+d}%" for pct in steps],
+            'target': ALL_ITEMS,
+            'change_pct': steps.astype(float)
+        })], ignore_index=True)
+    if changes.empty:
+        st.info("Add a price change or turn on the sweep to run the simulation.")
+        return
+
+    volume = get_monthly_volume(db, start_date, end_date)
+    if volume.empty:
+        st.info("No orders in the selected history.")
+        return
+
+    item_ids = items['item_id'].tolist()
+    months = sorted(volume['month'].unique())
+    matrix = build_volume_matrix(volume, item_ids, months)
+    price = items['item_price'].to_numpy(dtype=float)
+    unit_cost = items['unit_cost'].to_numpy(dtype=float)
+
+    # Current prices are the first scenario, so every change is measured against them
+    names, multipliers = price_multipliers(items, changes)
+    names = ["Current prices"] + names
+    multipliers = np.vstack([np.ones(len(items)), multipliers])
+    units, revenue, margin = simulate(price, unit_cost, matrix, multipliers, elasticity)
+    summary = summarize(names, units, revenue, margin, revenue[0].sum(), margin[0].sum())
+
+    best = summary.iloc[0]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Scenarios", len(names) - 1)
+    col2.metric("Current Margin", f"${margin[0].sum():,.2f}")
+    col3.metric("Best Margin", f"${best['margin']:,.2f}", f"{best['margin_change_pct']:+.2f}%")
+    st.caption(f"Best scenario: {best['scenario']}. Replayed over {int(matrix.sum()):,} units sold in {len(months)} month(s).")
+
+    st.subheader("Scenarios")
+    st.dataframe(summary, hide_index=True)
+
+    st.subheader("Monthly Margin")
+    chart_names = st.multiselect("Scenarios to chart", options=names, default=list(dict.fromkeys([names[0], best['scenario']])))
+    if chart_names:
+        picked = [names.index(name) for name in chart_names]
+        st.line_chart(pd.DataFrame(margin[picked].sum(axis=1).T, index=months, columns=chart_names))
+
+    st.subheader("Item Detail")
+    scenario = st.selectbox("Scenario", options=names, index=names.index(best['scenario']))
+    s = names.index(scenario)
+    st.dataframe(pd.DataFrame({
+        'item_id': item_ids,
+        'item_name': items['item_name'],
+        'item_size': items['item_size'],
+        'current_price': price,
+        'new_price': np.round(price * multipliers[s], 2),
+        'unit_cost': np.round(unit_cost, 2),
+        'units': np.round(units[s].sum(axis=1)).astype(int),
+        'revenue': np.round(revenue[s].sum(axis=1), 2),
+        'margin': np.round(margin[s].sum(axis=1), 2),
+        'margin_change': np.round(margin[s].sum(axis=1) - margin[0].sum(axis=1), 2)
+    }), hide_index=True)
@@ -0,0 +1,195 @@
+import streamlit as st
+import pandas as pd
+import cProfile
+import pstats
+import collections
+import os
+import re
+import sys
+import threading
+import time
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.path.join(SOURCE_DIR, "..", "profiles")
+MODES = ("sample", "cprofile")
+
+# Profiles aggregated across reruns and sessions, keyed by page
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+def profiling_mode():
+    """Get the profiling mode from the profile query param or ICECREAM_PROFILE, or None when off
+
+    "sample" records call stacks every few milliseconds for flame graphs,
+    "cprofile" traces every call for exact call counts.
+    """
+    mode = st.query_params.get("profile") or os.environ.get("ICECREAM_PROFILE")
+    if mode in ("1", "true", "on"):
+        mode = "sample"
+    return mode if mode in MODES else None
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _page_slug(page):
+    return re.sub(r"\W+", "_", page).strip("_").lower()
+
+class PageProfile:
+    """Profile data of one page, summed over its profiled reruns"""
+    def __init__(self, page):
+        self.page = page
+        self.reruns = 0
+        self.seconds = 0.0
+        self.interval = None
+        # Collapsed stacks (root first, ';' separated) with their sample counts
+        self.stacks = collections.Counter()
+        self.stats = None
+
+    def top_functions(self, limit=25):
+        """Get the functions with the most time spent in their own code"""
+        if self.stats is not None:
+            rows = [{'function': f"{name} ({os.path.basename(path)}:{line})",
+                     'calls': calls, 'self_s': round(own, 4), 'cumulative_s': round(cumulative, 4)}
+                    for (path, line, name), (_, calls, own, cumulative, _) in self.stats.stats.items()]
+        else:
+            own = collections.Counter()
+            cumulative = collections.Counter()
+            for stack, count in self.stacks.items():
+                frames = stack.split(";")
+                own[frames[-1]] += count
+                # A recursive function is counted once per sample
+                for frame in set(frames):
+                    cumulative[frame] += count
+            rows = [{'function': frame, 'samples': cumulative[frame],
+                     'self_s': round(own[frame] * self.interval, 4),
+                     'cumulative_s': round(cumulative[frame] * self.interval, 4)}
+                    for frame in cumulative]
+        df = pd.DataFrame(rows)
+        if not df.empty:
+            df = df.sort_values('self_s', ascending=False).head(limit).reset_index(drop=True)
+        return df
+
+    def collapsed(self):
+        """Get the stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write(self):
+        """Write the flame graph input (.folded) or pstats dump (.prof) and return its path"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, _page_slug(self.page))
+        if self.stats is not None:
+            path += ".prof"
+            self.stats.dump_stats(path)
+        else:
+            path += ".folded"
+            with open(path, "w") as f:
+                f.write(self.collapsed())
+        return path
+
+class StackSampler(threading.Thread):
+    """Samples the call stack of another thread at a fixed interval"""
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            codes.reverse()
+            # Drop the Streamlit runtime frames above the app script
+            start = next((i for i, code in enumerate(codes) if code.co_filename.startswith(SOURCE_DIR)), 0)
+            self.stacks[";".join(_frame_label(code) for code in codes[start:])] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class ProfileRun:
+    """Profiles one rerun of a page on the current thread"""
+    def __init__(self, page, mode):
+        self.page = page
+        self.mode = mode
+        self.started = time.perf_counter()
+        if mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(threading.get_ident())
+            self._profiler.start()
+
+    def stop(self):
+        """Stop profiling and add this rerun to the page's profile"""
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        with _profiles_lock:
+            profile = _profiles.get(self.page)
+            # A profile only holds one kind of data, so switching modes starts over
+            if profile is None or (profile.stats is not None) != (self.mode == "cprofile"):
+                profile = _profiles[self.page] = PageProfile(self.page)
+            profile.reruns += 1
+            profile.seconds += time.perf_counter() - self.started
+            if self.mode == "cprofile":
+                if profile.stats is None:
+                    profile.stats = pstats.Stats(self._profiler)
+                else:
+                    profile.stats.add(self._profiler)
+            else:
+                profile.interval = self._profiler.interval
+                profile.stacks.update(self._profiler.stacks)
+            profile.write()
+        return profile
+
+def start_profiling(page):
+    """Start profiling this rerun when profiling is switched on
+
+    A run left open by a rerun that was interrupted (st.rerun, st.stop) is
+    closed first, so its samples still count.
+    """
+    previous = st.session_state.pop("profile_run", None)
+    if previous is not None:
+        previous.stop()
+    mode = profiling_mode()
+    if mode is None:
+        return None
+    st.session_state.profile_run = ProfileRun(page, mode)
+    return st.session_state.profile_run
+
+def stop_profiling():
+    """Stop profiling this rerun and return the page's aggregated profile"""
+    run = st.session_state.pop("profile_run", None)
+    return run.stop() if run is not None else None
+
+def reset_profile(page):
+    """Forget the aggregated profile of a page"""
+    with _profiles_lock:
+        _profiles.pop(page, None)
+
+def show_profile(profile):
+    """Display the aggregated profile of the current page"""
+    if profile is None:
+        return
+    with st.expander(f"Profile: {profile.page}"):
+        col1, col2 = st.columns(2)
+        col1.metric("Profiled Reruns", profile.reruns)
+        col2.metric("Average Rerun (s)", round(profile.seconds / profile.reruns, 3))
+        st.dataframe(profile.top_functions(), hide_index=True)
+        if profile.stats is None:
+            st.download_button("Download Flame Graph Stacks", profile.collapsed(),
+                               file_name=f"{_page_slug(profile.page)}.folded")
+            st.caption("Open the .folded file in speedscope or flamegraph.pl.")
+        else:
+            st.caption(f"pstats dump written to {os.path.normpath(profile.write())}; "
+                       "open it with snakeviz or flameprof.")
+        if st.button("Reset Profile"):
+            reset_profile(profile.page)
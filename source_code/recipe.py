@@ -1,4 +1,5 @@
 import streamlit as st
+import pandas as pd
 from database import Database
 
 def show_recipe_management(db):
@@ -11,7 +12,7 @@ def show_recipe_management(db):
         st.subheader("Recipes")
         
         # Get items for recipes
-        items = db.fetch_data("SELECT sku, item_name FROM item")
+        items = db.fetch_data("SELECT sku, item_name FROM item", cached=True)
         recipe_options = {row['sku']: row['item_name'] for _, row in items.iterrows()}
         recipe_options[''] = "All Recipes"
         
@@ -28,38 +29,52 @@ def show_recipe_management(db):
         
         with st.form(key="create_recipe"):
             # Get items for dropdown
-            items = db.fetch_data("SELECT sku, item_name FROM item")
+            items = db.fetch_data("SELECT sku, item_name FROM item", cached=True)
             item_options = {row['sku']: row['item_name'] for _, row in items.iterrows()}
             
             # Get ingredients for dropdown
-            ingredients = db.fetch_data("SELECT ing_id, ing_name FROM ingredient")
+            ingredients = db.fetch_data("SELECT ing_id, ing_name FROM ingredient", cached=True)
             ing_options = {row['ing_id']: row['ing_name'] for _, row in ingredients.iterrows()}
             
             # Create form fields
             # Get the next row_id
-            last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM recipe")
+            last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM recipe", primary=True)
             new_row_id = 1
             if not last_row.empty and last_row.iloc[0]['max_id'] is not None:
                 new_row_id = last_row.iloc[0]['max_id'] + 1
             
             recipe_id = st.selectbox("Item SKU", options=list(item_options.keys()), format_func=lambda x: item_options.get(x, ""))
-            ing_id = st.selectbox("Ingredient", options=list(ing_options.keys()), format_func=lambda x: ing_options.get(x, ""))
-            quantity = st.number_input("Quantity", min_value=1, value=1)
+            
+            # One row per ingredient to add to the recipe
+            ing_labels = {f"{ing_id} - {name}": ing_id for ing_id, name in ing_options.items()}
+            recipe_rows = st.data_editor(
+                pd.DataFrame({'ingredient': pd.Series(dtype='str'), 'quantity': pd.Series(dtype='int')}),
+                num_rows="dynamic",
+                column_config={
+                    'ingredient': st.column_config.SelectboxColumn("Ingredient", options=list(ing_labels.keys()), required=True),
+                    'quantity': st.column_config.NumberColumn("Quantity", min_value=1, step=1, required=True)
+                },
+                key="recipe_rows"
+            )
             
             submit_button = st.form_submit_button(label="Add to Recipe")
             
             if submit_button:
-                # Create new recipe item
-                recipe_data = {
-                    'row_id': new_row_id,
-                    'recipe_id': recipe_id,
-                    'ing_id': ing_id,
-                    'quantity': quantity
-                }
-                
-                result = db.create_record('recipe', recipe_data)
-                
-                if result > 0:
-                    st.success(f"Recipe item added successfully!")
+                recipe_rows = recipe_rows.dropna()
+                if recipe_rows.empty:
+                    st.error("Please add at least one ingredient.")
                 else:
-                    st.error("Failed to add recipe item. Please check your input.")
\ No newline at end of file
+                    # Add all recipe items in a single transaction
+                    with db.unit_of_work() as uow:
+                        for offset, (_, row) in enumerate(recipe_rows.iterrows()):
+                            uow.create('recipe', {
+                                'row_id': new_row_id + offset,
+                                'recipe_id': recipe_id,
+                                'ing_id': ing_labels[row['ingredient']],
+                                'quantity': int(row['quantity'])
+                            })
+                    
+                    if uow.committed:
+                        st.success(f"{len(recipe_rows)} recipe item(s) added successfully!")
+                    else:
+                        st.error("Failed to add recipe items. Please check your input.")
\ No newline at end of file
@@ -0,0 +1,268 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import datetime
+from database import Database
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+def load_shifts(db):
+    """Get shift definitions with start and end hours"""
+    shifts = db.fetch_data("SELECT shift_id, day_of_week, start_time, end_time FROM shift", cached=True)
+    if shifts.empty:
+        return shifts
+    shifts['start_hour'] = pd.to_timedelta(shifts['start_time']).dt.total_seconds().floordiv(3600).astype(int)
+    shifts['end_hour'] = pd.to_timedelta(shifts['end_time']).dt.total_seconds().floordiv(3600).astype(int)
+    # A shift ending at midnight runs to the end of the day
+    shifts.loc[shifts['end_hour'] <= shifts['start_hour'], 'end_hour'] += 24
+    shifts['hours'] = shifts['end_hour'] - shifts['start_hour']
+    return shifts
+
+def coverage_from_orders(db, shifts, orders_per_staff=6, min_staff=1, max_staff=None):
+    """Derive the staff needed per shift from historical order volume by hour
+
+    The busiest average hour inside each shift, for that shift's weekday,
+    sets how many staff it needs.
+    """
+    hourly = db.fetch_data(f"""
+        SELECT DATE(created_at) as order_date, HOUR(created_at) as hour, COUNT(DISTINCT order_id) as orders
+        FROM {db.orders_source()}
+        GROUP BY DATE(created_at), HOUR(created_at)
+        """, priority="report")
+    required = np.full(len(shifts), min_staff)
+    if not hourly.empty:
+        hourly['day_of_week'] = pd.to_datetime(hourly['order_date']).dt.day_name()
+        # Average orders for each weekday (rows) and hour (columns)
+        days_seen = hourly.groupby('day_of_week')['order_date'].nunique()
+        totals = hourly.pivot_table(index='day_of_week', columns='hour', values='orders', aggfunc='sum')
+        load = totals.reindex(index=DAYS, columns=range(24)).fillna(0).div(days_seen.reindex(DAYS).fillna(1), axis=0).to_numpy()
+        day_index = shifts['day_of_week'].map({d: i for i, d in enumerate(DAYS)}).fillna(0).astype(int).to_numpy()
+        hours = np.arange(24)
+        inside = (hours >= shifts['start_hour'].to_numpy()[:, None]) & (hours < shifts['end_hour'].to_numpy()[:, None])
+        peak = np.where(inside, load[day_index], 0).max(axis=1)
+        required = np.maximum(np.ceil(peak / orders_per_staff).astype(int), min_staff)
+    if max_staff:
+        required = np.minimum(required, max_staff)
+    return pd.Series(required, index=shifts['shift_id'].to_numpy())
+
+def generate_rotations(dates, shifts, staff, availability, required, lead_positions=None, max_shifts=5, existing=None):
+    """Assign staff to every shift slot in the date range with a greedy heuristic
+
+    Slots with the fewest eligible staff are filled first. Each slot takes a
+    lead position first when one is required, then the eligible staff with the
+    fewest hours so far, holding back other leads. Nobody works two shifts on
+    the same date or more than max_shifts shifts in a week. Existing rotations
+    are kept and count towards coverage. Returns the planned rotations and a
+    shortfall per slot.
+    """
+    lead_positions = set(lead_positions or [])
+    available_days = availability.groupby('staff_id')['day_of_week'].apply(set).to_dict()
+    staff = staff.set_index('staff_id')
+
+    hours = {staff_id: 0 for staff_id in staff.index}
+    weekly = {}
+    working = set()
+    planned = []
+    shift_hours = shifts.set_index('shift_id')['hours']
+    if existing is not None:
+        for row in existing.itertuples():
+            planned.append((row.date, row.shift_id, row.staff_id))
+            working.add((row.staff_id, row.date))
+            week = (row.staff_id, row.date.isocalendar()[:2])
+            weekly[week] = weekly.get(week, 0) + 1
+            hours[row.staff_id] = hours.get(row.staff_id, 0) + shift_hours.get(row.shift_id, 0)
+
+    # Build every (date, shift) slot together with the staff who can work it
+    slots = []
+    for date in dates:
+        day = DAYS[date.weekday()]
+        for shift in shifts[shifts['day_of_week'] == day].itertuples():
+            eligible = [s for s in staff.index if day in available_days.get(s, set(DAYS))]
+            filled = [p for p in planned if p[0] == date and p[1] == shift.shift_id]
+            slots.append((date, shift, eligible, filled))
+    slots.sort(key=lambda slot: (len(slot[2]), slot[0]))
+
+    shortfall = []
+    for date, shift, eligible, filled in slots:
+        needed = int(required.get(shift.shift_id, 0))
+        assigned = [p[2] for p in filled]
+        week_key = date.isocalendar()[:2]
+
+        def can_work(staff_id):
+            return ((staff_id, date) not in working
+                    and weekly.get((staff_id, week_key), 0) < max_shifts)
+
+        def assign(staff_id):
+            planned.append((date, shift.shift_id, staff_id))
+            assigned.append(staff_id)
+            working.add((staff_id, date))
+            weekly[(staff_id, week_key)] = weekly.get((staff_id, week_key), 0) + 1
+            hours[staff_id] += shift.hours
+
+        candidates = sorted((s for s in eligible if can_work(s)), key=lambda s: (hours[s], staff.loc[s, 'hourly_rate']))
+        has_lead = any(staff.loc[s, 'position'] in lead_positions for s in assigned if s in staff.index)
+        if lead_positions and not has_lead and len(assigned) < needed:
+            lead = next((s for s in candidates if staff.loc[s, 'position'] in lead_positions), None)
+            if lead is not None:
+                assign(lead)
+                has_lead = True
+        # Leads are scarce, so keep them for shifts that still need one
+        if has_lead:
+            candidates.sort(key=lambda s: staff.loc[s, 'position'] in lead_positions)
+        for staff_id in candidates:
+            if len(assigned) >= needed:
+                break
+            if can_work(staff_id):
+                assign(staff_id)
+
+        if len(assigned) < needed or (lead_positions and not has_lead):
+            shortfall.append({
+                'date': date,
+                'shift_id': shift.shift_id,
+                'required': needed,
+                'assigned': len(assigned),
+                'lead_missing': bool(lead_positions) and not has_lead
+            })
+
+    plan = pd.DataFrame(planned, columns=['date', 'shift_id', 'staff_id'])
+    return plan.sort_values(['date', 'shift_id', 'staff_id']).reset_index(drop=True), pd.DataFrame(shortfall)
+
+def diff_rotations(existing, plan):
+    """Compare existing rotations in the range against a plan
+
+    Each row is marked add, keep or remove.
+    """
+    keys = ['date', 'shift_id', 'staff_id']
+    merged = existing[keys + ['row_id']].merge(plan[keys], on=keys, how='outer', indicator=True)
+    merged['change'] = merged['_merge'].map({'left_only': 'remove', 'right_only': 'add', 'both': 'keep'})
+    return merged.drop(columns='_merge').sort_values(keys).reset_index(drop=True)
+
+def apply_rotation_plan(db, diff):
+    """Insert added rotations and delete removed ones in one transaction"""
+    added = diff[diff['change'] == 'add']
+    removed = diff[diff['change'] == 'remove']
+
+    with db.transaction() as tx:
+        # Numbered under the same lock as journaled rotations
+        if not db.lock_numbering('rotation_numbering'):
+            return False
+        last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM rotation", primary=True)
+        new_row_id = 1
+        if not last_row.empty and pd.notna(last_row.iloc[0]['max_id']):
+            new_row_id = int(last_row.iloc[0]['max_id']) + 1
+        last_rota = db.fetch_data("SELECT rota_id FROM rotation ORDER BY row_id DESC LIMIT 1", primary=True)
+        numeric_part = int(last_rota.iloc[0]['rota_id'].replace('ROT', '')) + 1 if not last_rota.empty else 1
+
+        if not removed.empty:
+            row_ids = removed['row_id'].astype(int).tolist()
+            db.execute_query(f"DELETE FROM rotation WHERE row_id IN ({', '.join(['%s'] * len(row_ids))})", row_ids)
+        if not added.empty:
+            db.execute_many(
+                "INSERT INTO rotation (row_id, rota_id, date, shift_id, staff_id) VALUES (%s, %s, %s, %s, %s)",
+                [
+                    (new_row_id + i, f"ROT{numeric_part + i:04d}", row.date, row.shift_id, row.staff_id)
+                    for i, row in enumerate(added.itertuples())
+                ]
+            )
+    return tx.committed
+
+def show_rotation_generator(db):
+    """Display the rotation generator"""
+    st.subheader("Generate Rotations")
+
+    shifts = load_shifts(db)
+    staff = db.fetch_data("SELECT staff_id, CONCAT(first_name, ' ', last_name) as name, position, hourly_rate FROM staff")
+    if shifts.empty or staff.empty:
+        st.info("Add staff and shifts before generating rotations.")
+        return
+    availability = db.fetch_data("SELECT staff_id, day_of_week FROM staff_availability")
+    if availability.empty:
+        availability = pd.DataFrame(columns=['staff_id', 'day_of_week'])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Start Date", key="rota_start")
+        period = st.radio("Period", ["Week", "Month"], horizontal=True)
+        max_shifts = st.number_input("Max shifts per person per week", min_value=1, max_value=7, value=5)
+    with col2:
+        positions = sorted(staff['position'].unique())
+        lead_positions = st.multiselect("Each shift needs one of", positions,
+                                        default=[p for p in positions if 'Manager' in p])
+        coverage_source = st.radio("Coverage", ["Fixed", "From order history"], horizontal=True)
+        replace = st.checkbox("Replace existing rotations in the range")
+
+    if coverage_source == "Fixed":
+        per_shift = st.number_input("Staff per shift", min_value=1, value=3)
+        required = pd.Series(per_shift, index=shifts['shift_id'].to_numpy())
+    else:
+        orders_per_staff = st.number_input("Orders per staff member per hour", min_value=1, value=6)
+        required = coverage_from_orders(db, shifts, orders_per_staff, max_staff=len(staff))
+
+    # Let the targets be adjusted per shift before generating
+    targets = st.data_editor(
+        pd.DataFrame({
+            'shift_id': shifts['shift_id'],
+            'day_of_week': shifts['day_of_week'],
+            'start_time': shifts['start_time'].astype(str),
+            'end_time': shifts['end_time'].astype(str),
+            'required': required.reindex(shifts['shift_id']).to_numpy()
+        }),
+        disabled=['shift_id', 'day_of_week', 'start_time', 'end_time'],
+        hide_index=True,
+        key="rota_targets"
+    )
+
+    days = 7 if period == "Week" else 28
+    dates = [start_date + datetime.timedelta(days=d) for d in range(days)]
+    end_date = dates[-1]
+
+    if st.button("Generate Preview"):
+        existing = db.fetch_data(
+            "SELECT row_id, date, shift_id, staff_id FROM rotation WHERE date >= %s AND date < %s",
+            [start_date, end_date + datetime.timedelta(days=1)], primary=True)
+        if existing.empty:
+            existing = pd.DataFrame(columns=['row_id', 'date', 'shift_id', 'staff_id'])
+        existing['date'] = pd.to_datetime(existing['date']).dt.date
+
+        plan, shortfall = generate_rotations(
+            dates, shifts, staff, availability,
+            targets.set_index('shift_id')['required'],
+            lead_positions, max_shifts,
+            existing=None if replace else existing
+        )
+        st.session_state.rota_preview = (diff_rotations(existing, plan), shortfall)
+
+    preview = st.session_state.get("rota_preview")
+    if preview is not None:
+        diff, shortfall = preview
+        names = dict(zip(staff['staff_id'], staff['name']))
+        counts = diff['change'].value_counts()
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Add", counts.get('add', 0))
+        col2.metric("Keep", counts.get('keep', 0))
+        col3.metric("Remove", counts.get('remove', 0))
+
+        if not shortfall.empty:
+            st.warning(f"{len(shortfall)} shift(s) could not be fully covered.")
+            st.dataframe(shortfall, hide_index=True)
+
+        view = diff.assign(staff_name=diff['staff_id'].map(names))
+        st.dataframe(view[view['change'] != 'keep'][['date', 'shift_id', 'staff_id', 'staff_name', 'change']], hide_index=True)
+
+        # Hours per person under the plan
+        planned = diff[diff['change'] != 'remove'].merge(shifts[['shift_id', 'hours']], on='shift_id')
+        st.bar_chart(planned.groupby(planned['staff_id'].map(names))['hours'].sum())
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Commit Rotations", type="primary"):
+                if apply_rotation_plan(db, diff):
+                    st.success(f"{counts.get('add', 0)} rotation(s) added and {counts.get('remove', 0)} removed.")
+                    del st.session_state.rota_preview
+                else:
+                    st.error("Failed to save rotations. Please try again.")
+        with col2:
+            if st.button("Discard Preview"):
+                del st.session_state.rota_preview
+                st.rerun()
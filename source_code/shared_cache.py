@@ -0,0 +1,135 @@
+import sqlite3
+import hashlib
+import pickle
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+
+class SharedCache:
+    """Query result cache shared by every app process on the host
+
+    Values live in a local SQLite file read through a memory map, so each
+    Streamlit process sees what the others cached. Keys carry the version of
+    every table a query reads; a write through Database bumps the version of
+    its table, which makes older entries unreachable until LRU eviction
+    removes them. The file is kept under max_bytes.
+    """
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={max_bytes * 2}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                cache_key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS versions (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        """)
+
+    def versions(self, tables):
+        """Get the current version of each table"""
+        tables = sorted(set(tables))
+        if not tables:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT table_name, version FROM versions WHERE table_name IN ({', '.join(['?'] * len(tables))})",
+                tables).fetchall()
+        found = dict(rows)
+        return {table: found.get(table, 0) for table in tables}
+
+    def bump(self, tables):
+        """Invalidate cached results that read any of the tables"""
+        with self._lock:
+            self._conn.executemany("""
+                INSERT INTO versions (table_name, version) VALUES (?, 1)
+                ON CONFLICT (table_name) DO UPDATE SET version = version + 1
+                """, [(table,) for table in set(tables)])
+
+    def key(self, query, params, tables, variant=""):
+        """Build the versioned key of a query result"""
+        versions = self.versions(tables)
+        text = repr((" ".join(query.split()), tuple(params or ()), variant, sorted(versions.items())))
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Get a cached value, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE cache_key = ?", (time.time(), key))
+        return self._deserialize(row[0])
+
+    def put(self, key, value):
+        """Cache a value, evicting the least recently used entries past max_bytes"""
+        blob = self._serialize(value)
+        if len(blob) > self.max_bytes // 4:
+            # One huge result would flush everything else
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (cache_key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(total - int(self.max_bytes * 0.9))
+
+    def _evict(self, excess):
+        """Delete least recently used entries until excess bytes are freed"""
+        freed = 0
+        doomed = []
+        for cache_key, size in self._conn.execute("SELECT cache_key, size FROM entries ORDER BY accessed_at"):
+            if freed >= excess:
+                break
+            doomed.append((cache_key,))
+            freed += size
+        self._conn.executemany("DELETE FROM entries WHERE cache_key = ?", doomed)
+
+    def clear(self):
+        """Drop every cached value"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        """Get the number of entries and bytes cached"""
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'entries': count, 'bytes': size}
+
+    def _serialize(self, value):
+        """Store DataFrames and Arrow tables as Arrow IPC, anything else pickled"""
+        try:
+            if isinstance(value, pd.DataFrame):
+                return b"D" + self._to_ipc(pa.Table.from_pandas(value, preserve_index=False))
+            if isinstance(value, pa.Table):
+                return b"T" + self._to_ipc(value)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+        return b"P" + pickle.dumps(value)
+
+    def _to_ipc(self, table):
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    def _deserialize(self, blob):
+        kind, data = blob[:1], blob[1:]
+        if kind == b"P":
+            return pickle.loads(data)
+        table = pa.ipc.open_stream(data).read_all()
+        return table.to_pandas() if kind == b"D" else table
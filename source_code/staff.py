@@ -1,12 +1,13 @@
 import streamlit as st
 import datetime
 from database import Database
+from rotation_generator import show_rotation_generator
 
-def show_staff_schedule(db):
+def show_staff_schedule(db, journal):
     """Display the staff schedule section"""
     st.header("Staff Schedule")
     
-    tab1, tab2 = st.tabs(["View Schedule", "Create Rotation"])
+    tab1, tab2, tab3 = st.tabs(["View Schedule", "Create Rotation", "Generate Rotations"])
     
     with tab1:
         st.subheader("Staff Schedule")
@@ -18,8 +19,8 @@ def show_staff_schedule(db):
         
         selected_staff = st.selectbox("Filter by Staff", options=list(staff_options.keys()), format_func=lambda x: staff_options.get(x, ""))
         
-        schedule = db.get_staff_schedule(selected_staff if selected_staff else None)
-        if not schedule.empty:
+        schedule = db.get_staff_schedule(selected_staff if selected_staff else None, arrow=True)
+        if schedule.num_rows > 0:
             st.dataframe(schedule)
         else:
             st.info("No schedule found for the selected criteria.")
@@ -33,26 +34,10 @@ def show_staff_schedule(db):
             staff_options = {row['staff_id']: row['name'] for _, row in staff.iterrows()}
             
             # Get shifts for dropdown
-            shifts = db.fetch_data("SELECT shift_id, CONCAT(day_of_week, ' (', start_time, ' - ', end_time, ')') as shift_desc FROM shift")
+            shifts = db.fetch_data("SELECT shift_id, CONCAT(day_of_week, ' (', start_time, ' - ', end_time, ')') as shift_desc FROM shift", cached=True)
             shift_options = {row['shift_id']: row['shift_desc'] for _, row in shifts.iterrows()}
             
             # Create form fields
-            # Get the next row_id
-            last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM rotation")
-            new_row_id = 1
-            if not last_row.empty and last_row.iloc[0]['max_id'] is not None:
-                new_row_id = last_row.iloc[0]['max_id'] + 1
-                
-            # Generate rotation ID
-            last_rota = db.fetch_data("SELECT rota_id FROM rotation ORDER BY row_id DESC LIMIT 1")
-            if not last_rota.empty:
-                last_id = last_rota.iloc[0]['rota_id']
-                # Extract the numeric part and increment
-                numeric_part = int(last_id.replace('ROT', '')) + 1
-                new_rota_id = f"ROT{numeric_part:04d}"
-            else:
-                new_rota_id = "ROT0001"
-            
             staff_id = st.selectbox("Staff", options=list(staff_options.keys()), format_func=lambda x: staff_options.get(x, ""))
             shift_id = st.selectbox("Shift", options=list(shift_options.keys()), format_func=lambda x: shift_options.get(x, ""))
             date = st.date_input("Date")
@@ -60,18 +45,13 @@ def show_staff_schedule(db):
             submit_button = st.form_submit_button(label="Create Rotation")
             
             if submit_button:
-                # Create new rotation
-                rotation_data = {
-                    'row_id': new_row_id,
-                    'rota_id': new_rota_id,
+                # Row and rotation IDs are assigned when the journal reaches the database
+                journal.submit('rotation', {
                     'date': date,
                     'shift_id': shift_id,
                     'staff_id': staff_id
-                }
-                
-                result = db.create_record('rotation', rotation_data)
-                
-                if result > 0:
-                    st.success(f"Rotation {new_rota_id} created successfully!")
-                else:
-                    st.error("Failed to create rotation. Please check your input.")
\ No newline at end of file
+                })
+                st.success("Rotation saved! It will appear in the schedule as soon as the database confirms it.")
+    
+    with tab3:
+        show_rotation_generator(db)
\ No newline at end of file
@@ -23,6 +23,10 @@ def show_table_operations(db, selected_table, crud_operation):
     elif crud_operation == "Edit":
         edit_record(db, selected_table, columns_info, primary_keys)
     
+    # Bulk edit operation
+    elif crud_operation == "Bulk Edit":
+        bulk_edit_records(db, selected_table, primary_keys)
+    
     # Delete operation
     elif crud_operation == "Delete":
         delete_record(db, selected_table, primary_keys)
@@ -35,9 +39,9 @@ def view_table(db, selected_table):
     """View all records in a table"""
     st.subheader(f"View {selected_table}")
     
-    # Show the data
-    data = db.read_records(selected_table)
-    if not data.empty:
+    # Show the data as an Arrow table straight from the cursor
+    data = db.read_records(selected_table, arrow=True)
+    if data.num_rows > 0:
         st.dataframe(data)
     else:
         st.info(f"No records found in {selected_table}")
@@ -147,9 +151,16 @@ def edit_record(db, selected_table, columns_info, primary_keys):
                 # Get the selected record
                 condition = f"{pk} = %s"
                 params = [selected_id]
-                selected_record = db.fetch_data(f"SELECT * FROM {selected_table} WHERE {condition}", params)
                 
-                if not selected_record.empty:
+                # Keep the row as it was first loaded so concurrent edits can be detected on submit
+                original_key = f"edit_original_{selected_table}_{selected_id}"
+                if original_key not in st.session_state:
+                    selected_record = db.get_record_by_pk(selected_table, pk, selected_id)
+                    if not selected_record.empty:
+                        st.session_state[original_key] = selected_record.iloc[0].to_dict()
+                original = st.session_state.get(original_key)
+                
+                if original is not None:
                     with st.form(key=f"edit_{selected_table}"):
                         # Create input fields for each column
                         form_data = {}
@@ -157,7 +168,7 @@ def edit_record(db, selected_table, columns_info, primary_keys):
                         for _, row in columns_info.iterrows():
                             field = row['Field']
                             field_type = row['Type']
-                            current_value = selected_record.iloc[0][field]
+                            current_value = original[field]
                             
                             # Skip primary key fields (usually not editable)
                             if field in primary_keys:
@@ -198,23 +209,32 @@ def edit_record(db, selected_table, columns_info, primary_keys):
                                     valid_input = False
                                     missing_fields.append(field)
                             
-                            if valid_input:
+                            # Only write the fields that were actually changed
+                            changes = db.get_changed_fields(original, form_data)
+                            
+                            if valid_input and not changes:
+                                st.info("No changes to save.")
+                            elif valid_input:
                                 # Process datetime fields
-                                for field, value in form_data.items():
+                                for field, value in changes.items():
                                     if isinstance(value, (datetime.date, datetime.time)) and not isinstance(value, datetime.datetime):
                                         if 'datetime' in columns_info[columns_info['Field'] == field]['Type'].iloc[0].lower():
                                             # Convert date to datetime
                                             if isinstance(value, datetime.date):
-                                                form_data[field] = datetime.datetime.combine(value, datetime.time())
+                                                changes[field] = datetime.datetime.combine(value, datetime.time())
                                             # Convert time to datetime (using today's date)
                                             elif isinstance(value, datetime.time):
-                                                form_data[field] = datetime.datetime.combine(datetime.date.today(), value)
+                                                changes[field] = datetime.datetime.combine(datetime.date.today(), value)
                                 
-                                # Update record in the database
-                                result = db.update_record(selected_table, form_data, condition)
+                                # Update record in the database, checking it was not changed since it was loaded
+                                result = db.update_record(selected_table, changes, condition, params, original=original)
                                 
                                 if result > 0:
+                                    del st.session_state[original_key]
                                     st.success(f"Record updated successfully in {selected_table}!")
+                                elif result == 0:
+                                    del st.session_state[original_key]
+                                    st.warning("This record was changed by someone else since you loaded it. Review the latest values and try again.")
                                 else:
                                     st.error("Failed to update record. Please check your input.")
                             else:
@@ -226,6 +246,68 @@ def edit_record(db, selected_table, columns_info, primary_keys):
     else:
         st.info(f"No records found in {selected_table}")
 
+def bulk_edit_records(db, selected_table, primary_keys):
+    """Edit many records at once in an editable grid"""
+    st.subheader(f"Bulk Edit {selected_table}")
+    
+    if primary_keys:
+        # Keep the rows as loaded so changed cells and concurrent edits can be detected
+        records_key = f"bulk_original_{selected_table}"
+        editor_key = f"bulk_editor_{selected_table}"
+        if records_key not in st.session_state:
+            st.session_state[records_key] = db.read_records(selected_table)
+            st.session_state[editor_key] = st.session_state.get(editor_key, 0) + 1
+        records = st.session_state[records_key]
+        
+        if not records.empty:
+            edited = st.data_editor(
+                records,
+                disabled=primary_keys,
+                hide_index=True,
+                key=f"{editor_key}_{st.session_state[editor_key]}"
+            )
+            
+            col1, col2 = st.columns(2)
+            save_button = col1.button("Save Changes", type="primary")
+            reload_button = col2.button("Reload")
+            
+            if save_button:
+                # Collect the changed cells of every row
+                changes = {}
+                originals = {}
+                for original, row in zip(records.to_dict('records'), edited.to_dict('records')):
+                    row_changes = db.get_changed_fields(original, row)
+                    if row_changes:
+                        key = tuple(original[pk] for pk in primary_keys)
+                        changes[key] = row_changes
+                        originals[key] = original
+                
+                if not changes:
+                    st.info("No changes to save.")
+                else:
+                    # Apply all changes in one transaction
+                    result = db.bulk_update_records(selected_table, primary_keys, changes, originals)
+                    del st.session_state[records_key]
+                    
+                    updated = (result['status'] == 'updated').sum()
+                    conflicts = result[result['status'] == 'conflict']
+                    failed = result[result['status'] == 'failed']
+                    if updated > 0:
+                        st.success(f"{updated} record(s) updated successfully in {selected_table}!")
+                    if not conflicts.empty:
+                        st.warning("These records were changed by someone else since you loaded them and were not updated:")
+                        st.dataframe(conflicts, hide_index=True)
+                    if not failed.empty:
+                        st.error("Failed to update records. Please check your input.")
+            
+            if reload_button:
+                del st.session_state[records_key]
+                st.rerun()
+        else:
+            st.info(f"No records found in {selected_table}")
+    else:
+        st.error(f"No primary key found for table {selected_table}. Cannot edit records.")
+
 def delete_record(db, selected_table, primary_keys):
     """Delete a record from a table"""
     st.subheader(f"Delete from {selected_table}")
@@ -234,56 +316,44 @@ def delete_record(db, selected_table, primary_keys):
     records = db.read_records(selected_table)
     
     if not records.empty:
-        # Create a selectbox to choose a record to delete
         if primary_keys:
-            # Create a display column for selection
-            if len(primary_keys) == 1:
-                pk = primary_keys[0]
-                display_col = pk
-                
-                # Try to get a more descriptive column if available
-                name_cols = [col for col in records.columns if 'name' in col.lower()]
-                if name_cols:
-                    records['_display_'] = records[pk].astype(str) + ' - ' + records[name_cols[0]].astype(str)
-                    display_col = '_display_'
-                
-                selected_record_display = st.selectbox(
-                    "Select a record to delete",
-                    options=records[display_col].tolist()
-                )
-                
-                # Get the selected record ID
-                if display_col == '_display_':
-                    selected_id = records.loc[records['_display_'] == selected_record_display, pk].iloc[0]
-                else:
-                    selected_id = selected_record_display
+            # Label each row by its key, plus a descriptive column if available
+            labels = records[primary_keys].astype(str).agg(' / '.join, axis=1)
+            name_cols = [col for col in records.columns if 'name' in col.lower() and col not in primary_keys]
+            if name_cols:
+                labels = labels + ' - ' + records[name_cols[0]].astype(str)
+            
+            selected_rows = st.multiselect(
+                "Select records to delete",
+                options=records.index.tolist(),
+                format_func=lambda i: labels[i]
+            )
+            
+            if selected_rows:
+                keys = [tuple(records.loc[i, pk] for pk in primary_keys) for i in selected_rows]
+                st.write("Records to delete:")
+                st.dataframe(records.loc[selected_rows])
                 
-                # Get the selected record
-                condition = f"{pk} = %s"
-                params = [selected_id]
-                selected_record = db.fetch_data(f"SELECT * FROM {selected_table} WHERE {condition}", params)
+                # Rows in other tables that reference the selection, counted before deleting
+                impact = db.get_delete_impact(selected_table, primary_keys, keys)
+                if not impact.empty and (impact['referencing_rows'] > 0).any():
+                    st.write("Rows referencing the selected records:")
+                    st.dataframe(impact[impact['referencing_rows'] > 0], hide_index=True)
+                blocking = impact[impact['blocks']] if not impact.empty else impact
                 
-                if not selected_record.empty:
-                    st.write("Record to delete:")
-                    st.dataframe(selected_record)
+                if not blocking.empty:
+                    st.error(f"{blocking['referencing_rows'].sum()} row(s) in {', '.join(blocking['referencing_table'].unique())} "
+                             "still reference the selected records. Delete or reassign them first.")
+                elif st.button("Delete Records", type="primary"):
+                    # All selected rows go in one batched DELETE
+                    result = db.delete_records(selected_table, primary_keys, keys)
                     
-                    # Confirm deletion
-                    if st.button("Delete Record", type="primary"):
-                        # Check for foreign key constraints
-                        confirm_delete = True
-                        
-                        if confirm_delete:
-                            # Delete record from the database
-                            result = db.delete_record(selected_table, condition, params)
-                            
-                            if result > 0:
-                                st.success(f"Record deleted successfully from {selected_table}!")
-                            else:
-                                st.error("Failed to delete record. This record might be referenced by other tables.")
-                    
-                    st.warning("⚠️ Warning: This action cannot be undone!")
-            else:
-                st.warning(f"Deleting records with composite primary keys is not supported in this version.")
+                    if result > 0:
+                        st.success(f"{result} record(s) deleted successfully from {selected_table}!")
+                    else:
+                        st.error("Failed to delete records. Please try again.")
+                
+                st.warning("⚠️ Warning: This action cannot be undone!")
         else:
             st.error(f"No primary key found for table {selected_table}. Cannot delete records.")
     else:
@@ -0,0 +1,296 @@
+import sqlite3
+import json
+import threading
+import time
+import uuid
+import datetime
+import numpy as np
+import pandas as pd
+from database import Database
+
+def _to_json(value):
+    """Serialize numpy scalars as plain values and anything else (dates, decimals) as text"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+class WriteJournal:
+    """Local write-behind journal for POS writes
+
+    Writes are acknowledged as soon as they are in a local SQLite file. A
+    background flusher applies them to MySQL in batched transactions. Every
+    entry carries an idempotency key that is recorded in MySQL in the same
+    transaction as the write, so an entry replayed after a crash is skipped.
+    Applied entries and their keys are purged once a day after retention_days.
+    """
+    def __init__(self, path, connection_settings, batch_size=50, interval=0.5, max_attempts=5, retention_days=7):
+        self.path = path
+        self.connection_settings = connection_settings
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.retention_days = retention_days
+        self._purged_at = 0
+        # None until the flusher has tried the database
+        self.connected = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL keeps submits from waiting on the flusher's reads
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                flushed_at TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_status ON journal (status, id)")
+        self._appliers = {
+            'order': self._apply_order,
+            'rotation': self._apply_rotation,
+            'stock_movements': self._apply_stock_movements
+        }
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Start the background flusher"""
+        self._thread.start()
+        return self
+
+    def submit(self, kind, payload, key=None):
+        """Record a write locally and return its idempotency key"""
+        if kind not in self._appliers:
+            raise ValueError(f"Unknown journal entry kind: {kind}")
+        key = key or uuid.uuid4().hex
+        with self._lock:
+            # A resubmitted key (e.g. a double-clicked form) is stored once
+            self._conn.execute(
+                "INSERT OR IGNORE INTO journal (idempotency_key, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+                (key, kind, json.dumps(payload, default=_to_json), datetime.datetime.now().isoformat(sep=' '))
+            )
+        self._wake.set()
+        return key
+
+    def get_entry(self, key):
+        """Get the status and result of a submitted write"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error FROM journal WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'result': json.loads(row[1]) if row[1] else None, 'error': row[2]}
+
+    def get_entries(self, limit=20):
+        """Get the most recent journal entries"""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT id, idempotency_key, kind, created_at, status, attempts, result, error, flushed_at "
+                "FROM journal ORDER BY id DESC LIMIT ?", self._conn, params=(limit,))
+
+    def pending_count(self):
+        """Count writes not yet applied to MySQL"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM journal WHERE status = 'pending'").fetchone()[0]
+
+    def retry_failed(self):
+        """Put failed entries back in the queue"""
+        with self._lock:
+            self._conn.execute("UPDATE journal SET status = 'pending', attempts = 0 WHERE status = 'failed'")
+        self._wake.set()
+
+    def purge_flushed(self, older_than_days=7, db=None, batch_size=1000):
+        """Delete applied entries older than the given number of days
+
+        With db given, their idempotency keys in MySQL are deleted too, in
+        small chunks. Keys applied after the oldest entry still waiting here
+        are kept, so that entry is skipped if it was applied just before a
+        crash. Returns False if the MySQL purge failed.
+        """
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+        with self._lock:
+            self._conn.execute("DELETE FROM journal WHERE status = 'flushed' AND flushed_at < ?",
+                               (cutoff.isoformat(sep=' '),))
+            oldest = self._conn.execute("SELECT MIN(created_at) FROM journal WHERE status != 'flushed'").fetchone()[0]
+        if db is None:
+            return True
+        if oldest is not None:
+            cutoff = min(cutoff, datetime.datetime.fromisoformat(oldest))
+        while True:
+            deleted = db.execute_query("DELETE FROM applied_writes WHERE applied_at < %s LIMIT %s", [cutoff, batch_size])
+            if deleted < 0:
+                return False
+            if deleted < batch_size:
+                return True
+
+    # Flusher
+    def _pending(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, idempotency_key, kind, payload FROM journal WHERE status = 'pending' ORDER BY id LIMIT ?",
+                (self.batch_size,)
+            ).fetchall()
+
+    def _mark(self, entry_id, status, result=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE journal SET status = ?, result = ?, error = ?, flushed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (status, json.dumps(result, default=_to_json) if result is not None else None, error,
+                 datetime.datetime.now().isoformat(sep=' ') if status == 'flushed' else None, entry_id)
+            )
+
+    def _apply(self, db, entry):
+        """Apply one entry unless its key was already applied; returns its result"""
+        entry_id, key, kind, payload = entry
+        claimed = db.execute_statement("claim_write", [key, kind, datetime.datetime.now()])
+        if claimed < 0:
+            return None
+        if claimed == 0:
+            applied = db.fetch_data("SELECT result FROM applied_writes WHERE idempotency_key = %s", [key], primary=True)
+            return json.loads(applied.iloc[0]['result']) if not applied.empty and applied.iloc[0]['result'] else {}
+        result = self._appliers[kind](db, json.loads(payload))
+        db.execute_statement("store_write_result", [json.dumps(result, default=_to_json), key])
+        return result
+
+    def _flush_batch(self, db, batch):
+        """Apply a batch in one transaction, falling back to one entry at a time on failure
+
+        An entry whose applier raises is rolled back and counted toward
+        max_attempts like a rejected one. Returns False only when the
+        database connection is gone.
+        """
+        results = []
+        tx = None
+        try:
+            with db.transaction() as tx:
+                for entry in batch:
+                    results.append(self._apply(db, entry))
+                    if tx.failed:
+                        break
+        except Exception as e:
+            print(f"Error applying journal batch: {e}")
+        if tx is not None and tx.committed:
+            for entry, result in zip(batch, results):
+                self._mark(entry[0], 'flushed', result)
+            return True
+        if not self._is_connected(db):
+            return False
+        # One bad entry must not hold back the rest, so isolate it
+        for entry in batch:
+            tx = None
+            error = "Rejected by the database"
+            try:
+                with db.transaction() as tx:
+                    result = self._apply(db, entry)
+            except Exception as e:
+                if not self._is_connected(db):
+                    return False
+                error = f"{type(e).__name__}: {e}"
+            if tx is not None and tx.committed:
+                self._mark(entry[0], 'flushed', result)
+            else:
+                with self._lock:
+                    attempts = self._conn.execute("SELECT attempts FROM journal WHERE id = ?", (entry[0],)).fetchone()[0]
+                status = 'failed' if attempts + 1 >= self.max_attempts else 'pending'
+                self._mark(entry[0], status, error=error)
+        return True
+
+    def _purge_if_due(self, db):
+        """Purge old entries and keys once a day"""
+        if time.time() - self._purged_at >= 86400 and self.purge_flushed(self.retention_days, db):
+            self._purged_at = time.time()
+
+    def _is_connected(self, db):
+        return db.connection is not None and db.connection.is_connected()
+
+    def _run(self):
+        db = None
+        backoff = self.interval
+        while True:
+            try:
+                if db is None:
+                    db = Database(**self.connection_settings)
+                if self.connected:
+                    self._purge_if_due(db)
+                batch = self._pending()
+                if batch:
+                    self.connected = self._flush_batch(db, batch)
+                    if self.connected:
+                        backoff = self.interval
+                        self.last_error = None
+                        continue
+                else:
+                    if not self._is_connected(db):
+                        db.connect()
+                    self.connected = self._is_connected(db)
+            except Exception as e:
+                print(f"Error flushing write journal: {e}")
+                self.last_error = str(e)
+                self.connected = False
+                db = None
+            # Back off while MySQL is unavailable, up to half a minute
+            if not self.connected:
+                backoff = min(backoff * 2, 30)
+            self._wake.wait(backoff if not self.connected else self.interval)
+            self._wake.clear()
+
+    # Writes, run by the flusher inside its transaction
+    def _apply_order(self, db, payload):
+        """Insert an order and its stock sale, numbering it at flush time"""
+        if not db.lock_numbering('order_numbering'):
+            raise RuntimeError("Could not lock order numbering")
+        last_row_id, last_id = db.get_last_order()
+        order_id = f"ORD{int(last_id.replace('ORD', '')) + 1:04d}" if last_id is not None else "ORD0001"
+        row_id = last_row_id + 1 if last_row_id is not None else 1
+        item_price = payload.get('item_price')
+        if item_price is None:
+            item_price = db.get_item_price(payload['item_id']) or 0
+        db.create_record('orders', {
+            'row_id': row_id,
+            'order_id': order_id,
+            'created_at': payload['created_at'],
+            'item_id': payload['item_id'],
+            'item_price': item_price,
+            'quantity': payload['quantity'],
+            'cust_id': payload['cust_id'],
+            'delivery': payload['delivery'],
+            'add_id': payload['add_id']
+        })
+        db.post_stock_movements([{
+            'item_id': payload['item_id'], 'movement_type': 'sale', 'quantity': payload['quantity'],
+            'note': order_id, 'created_at': payload['created_at']
+        }])
+        return {'order_id': order_id, 'row_id': row_id}
+
+    def _apply_rotation(self, db, payload):
+        """Insert a rotation, numbering it at flush time"""
+        if not db.lock_numbering('rotation_numbering'):
+            raise RuntimeError("Could not lock rotation numbering")
+        last_row = db.fetch_data("SELECT MAX(row_id) as max_id FROM rotation", primary=True)
+        row_id = 1
+        if not last_row.empty and pd.notna(last_row.iloc[0]['max_id']):
+            row_id = int(last_row.iloc[0]['max_id']) + 1
+        last_rota = db.fetch_data("SELECT rota_id FROM rotation ORDER BY row_id DESC LIMIT 1", primary=True)
+        rota_id = f"ROT{int(last_rota.iloc[0]['rota_id'].replace('ROT', '')) + 1:04d}" if not last_rota.empty else "ROT0001"
+        db.create_record('rotation', {
+            'row_id': row_id,
+            'rota_id': rota_id,
+            'date': payload['date'],
+            'shift_id': payload['shift_id'],
+            'staff_id': payload['staff_id']
+        })
+        return {'rota_id': rota_id, 'row_id': row_id}
+
+    def _apply_stock_movements(self, db, payload):
+        """Post a group of stock movements"""
+        return {'posted': db.post_stock_movements(payload['movements'])}